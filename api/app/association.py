@@ -0,0 +1,249 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+from db import get_db
+
+DEFAULT_READER = 'default'
+
+# Durée max d'attente d'un tag pour GET /tag/<id> (secondes)
+TAG_WAIT_TIMEOUT = float(os.environ.get('TAG_WAIT_TIMEOUT', 60))
+# Durée de validité d'un item ou cintre scanné en attente de son binôme (secondes)
+TAG_SCAN_TTL = float(os.environ.get('TAG_SCAN_TTL', 120))
+# Intervalle de relecture de la base par le scrutateur du worker, pour un tag lu par un autre worker (secondes)
+TAG_WAIT_POLL = float(os.environ.get('TAG_WAIT_POLL', 0.25))
+# Durée de conservation d'une association terminée, le temps que son attente en lise l'issue (secondes)
+TAG_RESULT_TTL = float(os.environ.get('TAG_RESULT_TTL', 600))
+
+
+class PendingAssociation:
+    """Item en attente d'un tag sur un lecteur donné (ligne de tag_associations)"""
+
+    def __init__(self, id, item_id, reader_id, status='pending', tag_id=None, created_at=None):
+        self.id = id
+        self.item_id = item_id
+        self.reader_id = reader_id
+        self.tag_id = tag_id
+        self.status = status
+        self.created_at = time.time() if created_at is None else created_at
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row['id'], row['item_id'], row['reader_id'], row['status'], row['tag_id'], row['created_at'])
+
+    @property
+    def done(self):
+        return self.status != 'pending'
+
+    def to_dict(self):
+        return {
+            'item_id': self.item_id,
+            'reader_id': self.reader_id,
+            'tag_id': self.tag_id,
+            'status': self.status,
+            'created_at': self.created_at,
+        }
+
+
+class AssociationEngine:
+    """Associations tag/item et item/cintre, indexées par lecteur.
+
+    Les attentes et les scans sont en base : n'importe quel worker gunicorn peut résoudre une
+    attente enregistrée par un autre. Chaque attente a son Event, que seule la résolution de son
+    association déclenche : directement si elle est faite par le même worker, sinon par l'unique
+    scrutateur du worker, qui relit en une requête toutes les attentes locales toutes les
+    TAG_WAIT_POLL secondes.
+    """
+
+    def __init__(self, scan_ttl=TAG_SCAN_TTL, poll_interval=TAG_WAIT_POLL, result_ttl=TAG_RESULT_TTL):
+        self.scan_ttl = scan_ttl
+        self.poll_interval = poll_interval
+        self.result_ttl = result_ttl
+        self._lock = threading.Lock()
+        # id d'association -> Events des attentes de ce processus
+        self._waiters = {}
+        self._poller = None
+
+    def notify(self, *ids):
+        """Réveille les attentes de ces associations dans ce processus, qui relisent leur ligne"""
+        with self._lock:
+            for id in ids:
+                for event in self._waiters.get(id, ()):
+                    event.set()
+
+    def _subscribe(self, id):
+        event = threading.Event()
+        with self._lock:
+            self._waiters.setdefault(id, set()).add(event)
+            # Un seul scrutateur par processus (relancé après un fork, qui n'emporte pas les threads)
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll, name='tag-associations', daemon=True)
+                self._poller.start()
+        return event
+
+    def _unsubscribe(self, id, event):
+        with self._lock:
+            events = self._waiters.get(id)
+            events.discard(event)
+            if not events:
+                del self._waiters[id]
+
+    def _poll(self):
+        """Réveille les attentes locales dont l'association a été résolue (ou supprimée) par un autre worker"""
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                ids = list(self._waiters)
+                if not ids:
+                    self._poller = None
+                    return
+            conn = get_db()
+            try:
+                rows = conn.execute(
+                    "SELECT value FROM json_each(?) WHERE value NOT IN "
+                    "(SELECT id FROM tag_associations WHERE status = 'pending')",
+                    (json.dumps(ids),)
+                ).fetchall()
+            finally:
+                conn.close()
+            self.notify(*(row[0] for row in rows))
+
+    def expect_tag(self, item_id, reader_id=DEFAULT_READER):
+        """Met un item en attente du prochain tag lu par le lecteur"""
+        now = time.time()
+        conn = get_db()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute("DELETE FROM tag_associations WHERE status != 'pending' AND resolved_at < ?",
+                         (now - self.result_ttl,))
+            current = conn.execute("SELECT * FROM tag_associations WHERE reader_id = ? AND status = 'pending'",
+                                   (reader_id,)).fetchone()
+            if current is not None and current['item_id'] == item_id:
+                conn.commit()
+                return PendingAssociation.from_row(current)
+            # Un seul item peut attendre sur un lecteur : l'attente précédente est annulée
+            if current is not None:
+                conn.execute("UPDATE tag_associations SET status = 'cancelled', resolved_at = ? WHERE id = ?",
+                             (now, current['id']))
+            pending = PendingAssociation(uuid.uuid4().hex, item_id, reader_id, created_at=now)
+            conn.execute(
+                'INSERT INTO tag_associations (id, reader_id, item_id, status, created_at) VALUES (?, ?, ?, ?, ?)',
+                (pending.id, reader_id, item_id, pending.status, now)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        if current is not None:
+            self.notify(current['id'])
+        return pending
+
+    def claim(self, conn, reader_id, tag_id):
+        """Résout l'attente du lecteur avec ce tag, dans la transaction de conn ; renvoie l'association ou None.
+
+        L'appelant enregistre le tag sur l'item, valide la transaction puis appelle notify(association.id).
+        """
+        # Lecture d'abord : un tag lu sans attente sur le lecteur ne prend pas le verrou d'écriture
+        row = conn.execute("SELECT id FROM tag_associations WHERE reader_id = ? AND status = 'pending'",
+                           (reader_id,)).fetchone()
+        if row is None:
+            return None
+        row = conn.execute(
+            "UPDATE tag_associations SET status = 'association_complete', tag_id = ?, resolved_at = ? "
+            "WHERE id = ? AND status = 'pending' RETURNING *",
+            (tag_id, time.time(), row['id'])
+        ).fetchone()
+        return PendingAssociation.from_row(row) if row is not None else None
+
+    def cancel(self, item_id=None, reader_id=DEFAULT_READER, status='cancelled'):
+        """Annule l'attente du lecteur (uniquement si elle concerne item_id quand il est fourni)"""
+        sql = "UPDATE tag_associations SET status = ?, resolved_at = ? WHERE reader_id = ? AND status = 'pending'"
+        params = [status, time.time(), reader_id]
+        if item_id is not None:
+            sql += ' AND item_id = ?'
+            params.append(item_id)
+        return self._resolve(sql + ' RETURNING *', params)
+
+    def wait(self, pending, timeout):
+        """Attend que l'association soit résolue, par ce worker ou un autre ; renvoie son état final.
+
+        À l'échéance, une association toujours en attente passe au statut 'timeout'.
+        """
+        deadline = time.monotonic() + timeout
+        event = self._subscribe(pending.id)
+        try:
+            while True:
+                # Effacé avant la lecture : une résolution qui suit la lecture redéclenche l'Event
+                event.clear()
+                current = self.get(pending.id)
+                if current is None or current.done:
+                    return current or PendingAssociation(pending.id, pending.item_id, pending.reader_id, 'cancelled')
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    expired = self._resolve(
+                        "UPDATE tag_associations SET status = 'timeout', resolved_at = ? "
+                        "WHERE id = ? AND status = 'pending' RETURNING *",
+                        (time.time(), pending.id)
+                    )
+                    # Résolue entre-temps : on relit son issue
+                    if expired is None:
+                        continue
+                    return expired
+                event.wait(remaining)
+        finally:
+            self._unsubscribe(pending.id, event)
+
+    def _resolve(self, sql, params):
+        conn = get_db()
+        try:
+            row = conn.execute(sql, params).fetchone()
+            conn.commit()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        self.notify(row['id'])
+        return PendingAssociation.from_row(row)
+
+    def get(self, id):
+        conn = get_db()
+        row = conn.execute('SELECT * FROM tag_associations WHERE id = ?', (id,)).fetchone()
+        conn.close()
+        return PendingAssociation.from_row(row) if row is not None else None
+
+    def record_scan(self, reader_id=DEFAULT_READER, item_id=None, hanger_id=None):
+        """Mémorise un item ou un cintre scanné ; renvoie (item_id, hanger_id) quand la paire est complète"""
+        # Horloge murale : le scan peut avoir été enregistré par un autre processus
+        now = time.time()
+        conn = get_db()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            scan = conn.execute('SELECT * FROM tag_scans WHERE reader_id = ?', (reader_id,)).fetchone()
+            if scan is None or now - scan['scanned_at'] > self.scan_ttl:
+                scan = {'item_id': None, 'hanger_id': None}
+            item_id = scan['item_id'] if item_id is None else item_id
+            hanger_id = scan['hanger_id'] if hanger_id is None else hanger_id
+            if item_id is not None and hanger_id is not None:
+                conn.execute('DELETE FROM tag_scans WHERE reader_id = ?', (reader_id,))
+                conn.commit()
+                return item_id, hanger_id
+            conn.execute(
+                'INSERT INTO tag_scans (reader_id, item_id, hanger_id, scanned_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (reader_id) DO UPDATE SET item_id = excluded.item_id, '
+                'hanger_id = excluded.hanger_id, scanned_at = excluded.scanned_at',
+                (reader_id, item_id, hanger_id, now)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        return None
+
+    def pending(self):
+        conn = get_db()
+        rows = conn.execute("SELECT * FROM tag_associations WHERE status = 'pending' ORDER BY created_at").fetchall()
+        conn.close()
+        return [PendingAssociation.from_row(row).to_dict() for row in rows]
+
+
+engine = AssociationEngine()
@@ -0,0 +1,125 @@
+import io
+import json
+import os
+import sqlite3
+
+from flask import request
+
+# Nombre maximal d'enregistrements par requête batch
+BATCH_MAX = int(os.environ.get('BATCH_MAX', 50000))
+
+READ_BUFFER = 64 * 1024
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+class BatchError(ValueError):
+    pass
+
+
+def read_records():
+    """Enregistrements du corps de la requête : tableau JSON, ou NDJSON lu ligne à ligne"""
+    if request.mimetype in NDJSON_TYPES:
+        records = []
+        # En mode ligne, request.stream lit octet par octet : on le bufferise
+        for number, line in enumerate(io.BufferedReader(request.stream, READ_BUFFER), 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                raise BatchError(f"Invalid JSON on line {number}")
+            if len(records) > BATCH_MAX:
+                raise BatchError(f"More than {BATCH_MAX} records")
+        return records
+    records = request.get_json(silent=True)
+    if not isinstance(records, list):
+        raise BatchError("Expected a JSON array or an NDJSON body")
+    if len(records) > BATCH_MAX:
+        raise BatchError(f"More than {BATCH_MAX} records")
+    return records
+
+
+def is_upsert():
+    return request.args.get('upsert', '').lower() in ('1', 'true', 'yes')
+
+
+def begin(conn):
+    # Verrou d'écriture pris dès le début : le lot ne peut pas échouer à mi-chemin sur SQLITE_BUSY
+    conn.execute('BEGIN IMMEDIATE')
+
+
+def existing_ids(conn, table, ids):
+    """Ids déjà présents dans la table, en une requête quel que soit leur nombre"""
+    cur = conn.execute(
+        f'SELECT id FROM {table} WHERE id IN (SELECT value FROM json_each(?))',
+        (json.dumps(list(ids)),)
+    )
+    return {row[0] for row in cur.fetchall()}
+
+
+def partial_update(table, fields):
+    """UPDATE d'un upsert partiel : seuls les champs présents dans l'enregistrement sont remplacés,
+    un null explicite vide le champ. Paramètres : update_params()"""
+    return (f'UPDATE {table} SET ' + ', '.join(f'{name} = CASE WHEN ? THEN ? ELSE {name} END' for name in fields)
+            + ' WHERE id = ?')
+
+
+def update_params(id, record, fields):
+    return (*(value for name in fields for value in (name in record, record.get(name))), id)
+
+
+def upsert_rows(conn, insert_sql, update_sql, rows, existing):
+    """Lignes (id, paramètres d'insertion, paramètres de mise à jour) : INSERT pour les nouveaux ids,
+    UPDATE pour ceux de existing (un INSERT ... ON CONFLICT vérifierait les NOT NULL des champs absents).
+    Renvoie {position de la ligne: message d'erreur}, comme execute_rows."""
+    inserts = [position for position, row in enumerate(rows) if row[0] not in existing]
+    updates = [position for position, row in enumerate(rows) if row[0] in existing]
+    errors = {}
+    for positions, sql, params in ((inserts, insert_sql, 1), (updates, update_sql, 2)):
+        failed = execute_rows(conn, sql, [rows[position][params] for position in positions])
+        errors.update({positions[i]: message for i, message in failed.items()})
+    return errors
+
+
+def execute_rows(conn, sql, rows):
+    """Exécute sql pour toutes les lignes avec executemany.
+
+    Si une ligne viole une contrainte, le lot est rejoué ligne par ligne dans la même
+    transaction pour isoler les erreurs. Renvoie {position de la ligne: message d'erreur}.
+    """
+    conn.execute('SAVEPOINT batch')
+    try:
+        conn.executemany(sql, rows)
+    except sqlite3.IntegrityError:
+        conn.execute('ROLLBACK TO batch')
+        errors = {}
+        for position, row in enumerate(rows):
+            try:
+                conn.execute(sql, row)
+            except sqlite3.IntegrityError as e:
+                errors[position] = str(e)
+        conn.execute('RELEASE batch')
+        return errors
+    conn.execute('RELEASE batch')
+    return {}
+
+
+def error(index, message, id=None):
+    result = {'index': index, 'status': 'error', 'error': message}
+    if id is not None:
+        result['id'] = id
+    return result
+
+
+def summary(results):
+    """Corps de réponse d'un batch : compteurs par statut et résultat de chaque enregistrement.
+
+    207 si au moins un enregistrement a échoué, 200 sinon.
+    """
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    code = 207 if counts.get('error') else 200
+    return {'total': len(results), 'counts': counts, 'results': results}, code
@@ -0,0 +1,86 @@
+import hashlib
+import re
+from functools import wraps
+
+from flask import Response, request
+
+from db import get_db
+
+# Collections : le navigateur garde la réponse mais la revalide à chaque fois (If-None-Match)
+COLLECTION_CACHE_CONTROL = 'private, no-cache'
+# Photos adressées par leur empreinte : leur contenu ne change jamais
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Anciennes photos nommées d'après l'item
+LEGACY_PHOTO_CACHE_CONTROL = 'public, max-age=3600'
+
+HASHED_PHOTO_RE = re.compile(r'^/photos/(originals|r)/[0-9a-f]{2}/[0-9a-f]{64}[./]')
+
+
+def table_versions(conn, tables):
+    placeholders = ', '.join('?' * len(tables))
+    rows = conn.execute(f'SELECT name, version FROM table_versions WHERE name IN ({placeholders})', tables)
+    versions = dict(rows.fetchall())
+    return [versions.get(table, 0) for table in tables]
+
+
+def collection_etag(tables, versions):
+    """ETag fort : versions des tables lues + paramètres qui changent la représentation"""
+    variant = hashlib.sha1(
+        f"{request.full_path}|{request.headers.get('X-Fields', '')}".encode()
+    ).hexdigest()[:16]
+    state = '.'.join(f'{table}{version}' for table, version in zip(tables, versions))
+    return f'{state}-{variant}'
+
+
+def requested_expansions():
+    """Relations demandées par ?expand=items,... (répétable ou séparé par des virgules)"""
+    return {name for value in request.args.getlist('expand') for name in value.split(',') if name}
+
+
+def conditional(*tables, expandable=()):
+    """Répond 304 sans lire les lignes quand les tables n'ont pas changé depuis l'ETag du client.
+
+    expandable : tables dont dépend aussi la réponse quand ?expand= les demande.
+    À placer au-dessus des décorateurs de marshalling pour court-circuiter le handler.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            read = list(tables) + sorted(requested_expansions() & set(expandable))
+            conn = get_db()
+            versions = table_versions(conn, read)
+            conn.close()
+            etag = collection_etag(read, versions)
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = COLLECTION_CACHE_CONTROL
+                return response
+
+            result = fn(*args, **kwargs)
+            if isinstance(result, Response):
+                return result
+            if not isinstance(result, tuple):
+                result = (result,)
+            data = result[0]
+            code = result[1] if len(result) > 1 else 200
+            headers = dict(result[2]) if len(result) > 2 and result[2] else {}
+            if code != 200:
+                return result
+            # Les versions ont été lues avant les lignes : au pire l'ETag est plus ancien que les données
+            headers['ETag'] = f'"{etag}"'
+            headers['Cache-Control'] = COLLECTION_CACHE_CONTROL
+            return data, code, headers
+        return wrapper
+    return decorator
+
+
+def photo_cache_headers(response):
+    """after_request : en-têtes de cache des fichiers servis sous /photos"""
+    if not request.path.startswith('/photos/') or response.status_code not in (200, 206, 304):
+        return response
+    if HASHED_PHOTO_RE.match(request.path):
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response.headers['Cache-Control'] = LEGACY_PHOTO_CACHE_CONTROL
+    return response
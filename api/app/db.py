@@ -0,0 +1,236 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    from gevent import get_hub
+    from gevent.monkey import is_module_patched
+except ImportError:
+    get_hub = None
+
+DB_PATH = os.environ.get('DB_PATH', os.path.join(os.path.dirname(__file__), '..', 'database.sqlite3'))
+
+# Pragmas appliqués à chaque nouvelle connexion (surchargeables par variables d'environnement)
+DEFAULT_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -16000)),  # négatif = en Kio
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),  # en ms
+    'foreign_keys': 'ON',
+    'temp_store': 'MEMORY',
+}
+
+POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 8))
+STATEMENT_CACHE_SIZE = int(os.environ.get('SQLITE_STATEMENT_CACHE', 256))
+
+
+def run_native(function, *args):
+    """Exécute un appel bloquant sur un vrai thread, y compris sous le worker gevent"""
+    # Sous gevent, un appel SQLite (ou Pillow) bloquerait toutes les requêtes du worker, y compris
+    # pendant l'attente d'un verrou (busy_timeout). Le pool natif du hub les sort de la boucle.
+    if get_hub is not None and is_module_patched('threading'):
+        return get_hub().threadpool.apply(function, args)
+    return function(*args)
+
+
+# Temps cumulé passé dans SQLite par chaque thread (lu par metrics, avant et après chaque requête)
+_timing = threading.local()
+
+
+def query_time():
+    """Secondes passées dans SQLite par le thread courant depuis son démarrage"""
+    return getattr(_timing, 'elapsed', 0.0)
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Curseur dont les lectures comptent dans query_time() et sortent de la boucle gevent.
+
+    L'itération directe (for row in cursor) n'est ni mesurée ni déportée : elle est réservée
+    aux lectures déjà exécutées dont chaque ligne suivante est immédiate.
+    """
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return run_native(super().fetchone)
+        finally:
+            _timing.elapsed = query_time() + time.perf_counter() - start
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        try:
+            return run_native(super().fetchmany, self.arraysize if size is None else size)
+        finally:
+            _timing.elapsed = query_time() + time.perf_counter() - start
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return run_native(super().fetchall)
+        finally:
+            _timing.elapsed = query_time() + time.perf_counter() - start
+
+
+class PooledConnection(sqlite3.Connection):
+    """Connexion SQLite dont close() la rend au pool au lieu de la fermer.
+
+    Les appels qui exécutent du SQL passent par run_native : sous gevent, une requête lente ou
+    une attente de verrou n'arrête pas les autres greenlets du worker.
+    """
+
+    pool = None
+    # Processus qui a ouvert la connexion : elle ne doit être ni utilisée ni fermée ailleurs
+    pid = None
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # Comme sqlite3.Connection.execute(), mais le curseur renvoyé mesure aussi ses lectures
+    def execute(self, *args):
+        start = time.perf_counter()
+        try:
+            return run_native(self.cursor().execute, *args)
+        finally:
+            _timing.elapsed = query_time() + time.perf_counter() - start
+
+    def executemany(self, *args):
+        start = time.perf_counter()
+        try:
+            return run_native(self.cursor().executemany, *args)
+        finally:
+            _timing.elapsed = query_time() + time.perf_counter() - start
+
+    def executescript(self, *args):
+        start = time.perf_counter()
+        try:
+            return run_native(super().executescript, *args)
+        finally:
+            _timing.elapsed = query_time() + time.perf_counter() - start
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return run_native(super().commit)
+        finally:
+            _timing.elapsed = query_time() + time.perf_counter() - start
+
+    def rollback(self):
+        return run_native(super().rollback)
+
+    def close(self):
+        if self.pool is None:
+            return super().close()
+        self.pool.release(self)
+
+    def really_close(self):
+        super().close()
+
+
+class ConnectionPool:
+    """Pool de connexions SQLite longue durée, propre à chaque processus (worker gunicorn ou serveur de dev)"""
+
+    def __init__(self, path=DB_PATH, size=POOL_SIZE, pragmas=None, cached_statements=STATEMENT_CACHE_SIZE):
+        self.path = path
+        self.size = size
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.cached_statements = cached_statements
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Appelé à la création et après un fork : les connexions du parent ne sont pas réutilisables.
+        # Elles devraient avoir été fermées avant le fork (hook pre_fork de gunicorn.conf.py) ; à défaut,
+        # elles sont gardées sans jamais être fermées : sqlite3_close dans l'enfant libérerait les
+        # verrous et descripteurs du parent (SQLite déconseille tout usage d'une connexion après fork)
+        self._inherited = getattr(self, '_inherited', []) + getattr(self, '_idle', [])
+        self._pid = os.getpid()
+        self._idle = []
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.pragmas.get('busy_timeout', 5000) / 1000,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            factory=PooledConnection,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        conn.pool = self
+        conn.pid = os.getpid()
+        return conn
+
+    def acquire(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            if self._idle:
+                self.hits += 1
+                return self._idle.pop()
+            self.misses += 1
+        return self._connect()
+
+    def release(self, conn):
+        with self._lock:
+            if conn.pid != os.getpid():
+                # Connexion empruntée avant le fork : voir _reset()
+                self._inherited.append(conn)
+                return
+        # Une transaction laissée ouverte par un handler ne doit pas fuiter vers la requête suivante
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if self._pid == os.getpid() and len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+            self.discarded += 1
+        conn.really_close()
+
+    def close_all(self):
+        """Ferme les connexions inactives ; à appeler dans le maître gunicorn avant chaque fork"""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.really_close()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'pid': self._pid,
+                'size': self.size,
+                'idle': len(self._idle),
+                'hits': self.hits,
+                'misses': self.misses,
+                'discarded': self.discarded,
+                'inherited': len(self._inherited),
+                'hit_rate': round(self.hits / total, 4) if total else None,
+                'statement_cache_size': self.cached_statements,
+                'pragmas': self.pragmas,
+            }
+
+
+pool = ConnectionPool()
+# Fermer proprement les connexions déclenche le checkpoint du WAL dans la base principale
+atexit.register(pool.close_all)
+
+
+def get_db():
+    return pool.acquire()
+
+
+def add_missing_columns(conn, table, columns):
+    """Ajoute à une table existante les colonnes (nom -> type) qui lui manquent"""
+    existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    for name, definition in columns.items():
+        if name not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
@@ -0,0 +1,200 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from db import get_db
+
+# Nombre d'événements conservés pour permettre la reprise après reconnexion
+EVENT_HISTORY = int(os.environ.get('EVENT_HISTORY', 1000))
+# Intervalle des commentaires keep-alive envoyés aux abonnés inactifs (secondes)
+EVENT_HEARTBEAT = float(os.environ.get('EVENT_HEARTBEAT', 15))
+# Intervalle de relecture de la table events, pour les événements publiés par un autre worker (secondes)
+EVENT_POLL = float(os.environ.get('EVENT_POLL', 0.1))
+
+INSERT_SQL = 'INSERT INTO events (type, timestamp, data) VALUES (?, ?, ?)'
+
+
+def _event(row):
+    return {'seq': row['seq'], 'type': row['type'], 'timestamp': row['timestamp'], 'data': json.loads(row['data'])}
+
+
+class EventBus:
+    """Diffusion des changements de l'API vers les abonnés SSE de tous les workers.
+
+    Les événements sont écrits dans la table events, dont le numéro (seq) est commun à tous
+    les workers. Dans chaque worker, un unique scrutateur lit les nouvelles lignes et les range
+    dans un tampon circulaire. Un abonné ne possède pas de file : il attend sur une condition
+    partagée puis relit le tampon à partir de son dernier numéro, ce qui rend la publication
+    indépendante du nombre d'abonnés.
+    """
+
+    def __init__(self, history=EVENT_HISTORY, poll_interval=EVENT_POLL):
+        self.history = history
+        self.poll_interval = poll_interval
+        self.reset()
+
+    def reset(self):
+        """Repart d'un tampon vide ; appelé dans chaque worker gunicorn après le fork"""
+        self._cond = threading.Condition()
+        # Réveil immédiat du scrutateur après une publication de ce worker
+        self._published = threading.Event()
+        self._poller = None
+        self._seq = None
+        self._history = deque(maxlen=self.history)
+        self.subscribers = 0
+
+    @property
+    def last_seq(self):
+        conn = get_db()
+        try:
+            # Dernier numéro attribué, même si la table est vide ou purgée
+            return conn.execute("SELECT coalesce(max(seq), 0) FROM sqlite_sequence WHERE name = 'events'").fetchone()[0]
+        finally:
+            conn.close()
+
+    def record(self, conn, type, **data):
+        """Écrit un événement dans la transaction de conn ; l'appelant valide puis appelle wake()"""
+        timestamp = time.time()
+        seq = conn.execute(INSERT_SQL, (type, timestamp, json.dumps(data))).lastrowid
+        conn.execute('DELETE FROM events WHERE seq <= ?', (seq - self.history,))
+        return {'seq': seq, 'type': type, 'timestamp': timestamp, 'data': data}
+
+    def record_many(self, conn, events):
+        """Écrit des événements [(type, data)] dans la transaction de conn, en une requête"""
+        timestamp = time.time()
+        conn.executemany(INSERT_SQL, [(type, timestamp, json.dumps(data)) for type, data in events])
+        conn.execute('DELETE FROM events WHERE seq <= (SELECT max(seq) FROM events) - ?', (self.history,))
+
+    def wake(self):
+        """Réveille le scrutateur de ce worker après la validation d'une écriture"""
+        self._published.set()
+
+    def publish(self, type, **data):
+        conn = get_db()
+        try:
+            event = self.record(conn, type, **data)
+            conn.commit()
+        finally:
+            conn.close()
+        self.wake()
+        return event
+
+    def _start(self):
+        # Appelé sous le verrou : un seul scrutateur par processus (relancé après un fork)
+        if self._seq is None:
+            self._seq = self.last_seq
+        if self._poller is None or not self._poller.is_alive():
+            self._poller = threading.Thread(target=self._poll, name='events', daemon=True)
+            self._poller.start()
+
+    def _poll(self):
+        """Range dans le tampon les événements écrits par tous les workers, tant qu'il y a des abonnés"""
+        while True:
+            self._published.wait(self.poll_interval)
+            self._published.clear()
+            with self._cond:
+                if not self.subscribers:
+                    self._poller = None
+                    return
+                seq = self._seq
+            conn = get_db()
+            try:
+                rows = conn.execute('SELECT * FROM events WHERE seq > ? ORDER BY seq', (seq,)).fetchall()
+            finally:
+                conn.close()
+            if rows:
+                with self._cond:
+                    self._history.extend(_event(row) for row in rows)
+                    self._seq = rows[-1]['seq']
+                    self._cond.notify_all()
+
+    def _after(self, seq):
+        # Appelé sous le verrou ; None si les événements demandés ne sont plus dans le tampon
+        if seq >= self._seq:
+            return []
+        if not self._history or seq < self._history[0]['seq'] - 1:
+            return None
+        # Les abonnés sont presque toujours en fin de tampon : on le parcourt depuis la fin
+        events = []
+        for event in reversed(self._history):
+            if event['seq'] <= seq:
+                break
+            events.append(event)
+        events.reverse()
+        return events
+
+    def _load(self, seq):
+        """Événements postérieurs à seq relus en base (reprise antérieure au tampon du worker)"""
+        conn = get_db()
+        try:
+            first = conn.execute('SELECT min(seq) FROM events').fetchone()[0]
+            if first is not None and seq < first - 1:
+                return None
+            rows = conn.execute('SELECT * FROM events WHERE seq > ? ORDER BY seq', (seq,)).fetchall()
+        finally:
+            conn.close()
+        return [_event(row) for row in rows]
+
+    def wait(self, seq, timeout=None):
+        """Renvoie les événements postérieurs à seq, en attendant au plus timeout secondes"""
+        with self._cond:
+            if seq >= self._seq:
+                self._cond.wait(timeout)
+            events = self._after(seq)
+        if events is None:
+            events = self._load(seq)
+        return events
+
+    def parse_event_id(self, event_id):
+        """Convertit un Last-Event-ID en numéro, ou None s'il n'est pas reprenable"""
+        if not event_id:
+            return self._seq
+        # Numéro au-delà de la base : il vient d'une autre base (recréée ou restaurée)
+        if not event_id.isdigit() or int(event_id) > self.last_seq:
+            return None
+        return int(event_id)
+
+    def format(self, event):
+        return (
+            f"id: {event['seq']}\n"
+            f"event: {event['type']}\n"
+            f"data: {json.dumps(event)}\n\n"
+        )
+
+    def stream(self, last_event_id=None, types=None, heartbeat=EVENT_HEARTBEAT):
+        """Générateur SSE : rejoue les événements manqués puis pousse les nouveaux"""
+        with self._cond:
+            self.subscribers += 1
+            self._start()
+        try:
+            seq = self.parse_event_id(last_event_id)
+            yield "retry: 3000\n\n"
+            if seq is None:
+                # Reprise impossible : le client doit recharger ses collections
+                seq = self._seq
+                yield self.format({'seq': seq, 'type': 'reset', 'timestamp': time.time(), 'data': {}})
+            while True:
+                events = self.wait(seq, heartbeat)
+                if events is None:
+                    seq = self._seq
+                    yield self.format({'seq': seq, 'type': 'reset', 'timestamp': time.time(), 'data': {}})
+                    continue
+                if not events:
+                    yield ": keep-alive\n\n"
+                    continue
+                for event in events:
+                    seq = event['seq']
+                    if types is None or event['type'] in types:
+                        yield self.format(event)
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+
+
+bus = EventBus()
+
+
+def publish(type, **data):
+    return bus.publish(type, **data)
@@ -0,0 +1,61 @@
+import time
+
+from db import DB_PATH
+from migrations import LATEST_VERSION, current_version
+from models import (
+    event_db_init, item_model_db_init, order_items_db_columns, reader_inventory_db_init, tag_association_db_init,
+    versioned_tables,
+)
+
+
+def _columns(create_statement):
+    """Noms des colonnes d'un CREATE TABLE simple (une colonne par ligne)"""
+    body = create_statement[create_statement.index('(') + 1:create_statement.rindex(')')]
+    return [line.split()[0] for line in body.splitlines() if line.strip() and not line.strip().startswith(('PRIMARY', 'UNIQUE'))]
+
+
+# Tables et colonnes attendues par l'API
+REQUIRED_SCHEMA = {
+    'items': _columns(item_model_db_init),
+    **{table: [] for table in versioned_tables},
+    'order_items': list(order_items_db_columns),
+    'table_versions': ['name', 'version'],
+    'tag_associations': _columns(tag_association_db_init[0]),
+    'tag_scans': _columns(tag_association_db_init[2]),
+    'events': _columns(event_db_init[0]),
+    'reader_inventories': _columns(reader_inventory_db_init),
+}
+
+
+def check_schema(conn):
+    """Liste des problèmes de schéma (vide si la base est utilisable)"""
+    problems = []
+    for table, columns in REQUIRED_SCHEMA.items():
+        existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        if not existing:
+            problems.append(f"missing table {table}")
+            continue
+        problems.extend(f"missing column {table}.{column}" for column in columns if column not in existing)
+    version = current_version(conn)
+    if version < LATEST_VERSION:
+        problems.append(f"schema version {version} < {LATEST_VERSION}")
+    return problems
+
+
+def check(conn):
+    """État de la base : joignable, en écriture et au bon schéma"""
+    start = time.perf_counter()
+    status = {'db_path': DB_PATH, 'schema_version': None}
+    try:
+        status['schema_version'] = current_version(conn)
+        problems = check_schema(conn)
+        # Le compteur de versions est lu à chaque requête de collection : il doit répondre vite
+        conn.execute('SELECT count(*) FROM table_versions').fetchone()
+        status['journal_mode'] = conn.execute('PRAGMA journal_mode').fetchone()[0]
+        status['read_only'] = bool(conn.execute('PRAGMA query_only').fetchone()[0])
+    except Exception as e:
+        problems = [f"{type(e).__name__}: {e}"]
+    status['problems'] = problems
+    status['status'] = 'ok' if not problems else 'error'
+    status['latency_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    return status
@@ -0,0 +1,196 @@
+import json
+import os
+import time
+from datetime import datetime
+
+from association import DEFAULT_READER
+from db import get_db
+
+# Deux lectures d'un même tag par un même lecteur espacées de moins de ce délai n'en font qu'une (secondes)
+TAG_DEDUP_WINDOW = float(os.environ.get('TAG_DEDUP_WINDOW', 2))
+
+# Tous les tags d'un lot en une requête ; un tag porté par un item et un cintre désigne l'item
+RESOLVE_MANY_SQL = '''SELECT t.value, 'item', i.id, i.hanger_id FROM json_each(?) t JOIN items i ON i.tag_id = t.value
+    UNION ALL
+    SELECT t.value, 'hanger', h.id, NULL FROM json_each(?) t JOIN hangers h ON h.tag_id = t.value'''
+
+
+def parse_timestamp(value, default):
+    """Horodatage d'une lecture : secondes ou millisecondes depuis l'epoch, ou date ISO 8601"""
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        raise ValueError("Invalid timestamp")
+    if isinstance(value, (int, float)):
+        # Les lecteurs envoient souvent des millisecondes
+        return value / 1000 if value > 1e11 else float(value)
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    raise ValueError("Invalid timestamp")
+
+
+def parse_reads(records):
+    """(index, lecteur, tag, horodatage) des lectures valides et liste des erreurs"""
+    now = time.time()
+    reads, errors = [], []
+    for index, record in enumerate(records):
+        if not isinstance(record, dict) or not isinstance(record.get('tag_id'), str) or not record['tag_id']:
+            errors.append({'index': index, 'error': "tag_id is required"})
+            continue
+        try:
+            timestamp = parse_timestamp(record.get('timestamp'), now)
+        except ValueError:
+            errors.append({'index': index, 'error': "Invalid timestamp", 'tag_id': record['tag_id']})
+            continue
+        reads.append((index, record.get('reader_id') or DEFAULT_READER, record['tag_id'], timestamp))
+    return reads, errors
+
+
+def deduplicate(reads, window=TAG_DEDUP_WINDOW):
+    """Regroupe les lectures répétées : une observation par (lecteur, tag) et par rafale.
+
+    Une lecture à moins de window secondes de la précédente du même tag sur le même
+    lecteur prolonge l'observation en cours au lieu d'en ouvrir une nouvelle.
+    """
+    sightings = []
+    current = {}
+    for _, reader_id, tag_id, timestamp in sorted(reads, key=lambda read: read[3]):
+        sighting = current.get((reader_id, tag_id))
+        if sighting is not None and timestamp - sighting['last_seen'] <= window:
+            sighting['last_seen'] = timestamp
+            sighting['reads'] += 1
+            continue
+        sighting = {'reader_id': reader_id, 'tag_id': tag_id, 'first_seen': timestamp, 'last_seen': timestamp, 'reads': 1}
+        current[(reader_id, tag_id)] = sighting
+        sightings.append(sighting)
+    return sightings
+
+
+def resolve_tags(conn, tag_ids):
+    """{tag: (type, id, hanger_id de l'item)} pour les tags connus, en une seule requête"""
+    encoded = json.dumps(list(tag_ids))
+    owners = {}
+    for tag_id, kind, owner_id, hanger_id in conn.execute(RESOLVE_MANY_SQL, (encoded, encoded)):
+        if kind == 'item' or tag_id not in owners:
+            owners[tag_id] = (kind, owner_id, hanger_id)
+    return owners
+
+
+def _by_hanger(items):
+    """[{hanger_id, items}] à partir de {item_id: hanger_id}, cintres triés (sans cintre en dernier)"""
+    groups = {}
+    for item_id, hanger_id in items.items():
+        groups.setdefault(hanger_id, []).append(item_id)
+    return [
+        {'hanger_id': hanger_id, 'items': sorted(groups[hanger_id])}
+        for hanger_id in sorted(groups, key=lambda hanger_id: (hanger_id is None, hanger_id or ''))
+    ]
+
+
+class InventoryTracker:
+    """Dernier inventaire vu par chaque lecteur (items et cintres), en base : partagé par les workers.
+
+    Chaque lot de lectures d'un lecteur est un tour d'inventaire complet : il remplace
+    l'inventaire précédent, et la différence donne les items apparus ou disparus.
+    """
+
+    def update(self, conn, reader_id, items, hangers, taken_at):
+        """Enregistre l'inventaire {item_id: hanger_id} du lecteur (dans la transaction de conn) ;
+        renvoie la différence avec le précédent"""
+        hangers = set(hangers)
+        previous = conn.execute('SELECT items, hangers FROM reader_inventories WHERE reader_id = ?', (reader_id,)).fetchone()
+        conn.execute(
+            'INSERT INTO reader_inventories (reader_id, items, hangers, taken_at) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (reader_id) DO UPDATE SET items = excluded.items, hangers = excluded.hangers, '
+            'taken_at = excluded.taken_at',
+            (reader_id, json.dumps(items), json.dumps(sorted(hangers)), taken_at)
+        )
+        if previous is None:
+            return {
+                'first_round': True,
+                'appeared': _by_hanger(items),
+                'disappeared': [],
+                'hangers_appeared': sorted(hangers),
+                'hangers_disappeared': [],
+            }
+        before = json.loads(previous['items'])
+        before_hangers = set(json.loads(previous['hangers']))
+        return {
+            'first_round': False,
+            'appeared': _by_hanger({item_id: hanger_id for item_id, hanger_id in items.items() if item_id not in before}),
+            'disappeared': _by_hanger({item_id: hanger_id for item_id, hanger_id in before.items() if item_id not in items}),
+            'hangers_appeared': sorted(hangers - before_hangers),
+            'hangers_disappeared': sorted(before_hangers - hangers),
+        }
+
+    def snapshot(self, reader_id):
+        conn = get_db()
+        row = conn.execute('SELECT * FROM reader_inventories WHERE reader_id = ?', (reader_id,)).fetchone()
+        conn.close()
+        if row is None:
+            return None
+        return {
+            'reader_id': reader_id,
+            'taken_at': row['taken_at'],
+            'items': _by_hanger(json.loads(row['items'])),
+            'hangers': json.loads(row['hangers']),
+        }
+
+    def readers(self):
+        conn = get_db()
+        rows = conn.execute('SELECT reader_id FROM reader_inventories ORDER BY reader_id').fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+    def forget(self, reader_id):
+        conn = get_db()
+        deleted = conn.execute('DELETE FROM reader_inventories WHERE reader_id = ?', (reader_id,)).rowcount
+        conn.commit()
+        conn.close()
+        return deleted > 0
+
+
+tracker = InventoryTracker()
+
+
+def ingest(conn, records, window=TAG_DEDUP_WINDOW):
+    """Traite un lot de lectures : dédoublonnage, résolution des tags et inventaire de chaque lecteur"""
+    reads, errors = parse_reads(records)
+    sightings = deduplicate(reads, window)
+    owners = resolve_tags(conn, {sighting['tag_id'] for sighting in sightings})
+
+    rounds = {}
+    for sighting in sightings:
+        reader = rounds.setdefault(sighting['reader_id'], {'tags': set(), 'items': {}, 'hangers': set(), 'unknown': set(), 'taken_at': 0})
+        reader['tags'].add(sighting['tag_id'])
+        reader['taken_at'] = max(reader['taken_at'], sighting['last_seen'])
+        owner = owners.get(sighting['tag_id'])
+        if owner is None:
+            reader['unknown'].add(sighting['tag_id'])
+        elif owner[0] == 'item':
+            reader['items'][owner[1]] = owner[2]
+        else:
+            reader['hangers'].add(owner[1])
+
+    readers = []
+    # Lecture et remplacement de l'inventaire précédent sans qu'un autre worker s'intercale
+    conn.execute('BEGIN IMMEDIATE')
+    for reader_id, reader in rounds.items():
+        changes = tracker.update(conn, reader_id, reader['items'], reader['hangers'], reader['taken_at'])
+        readers.append({
+            'reader_id': reader_id,
+            'tags': len(reader['tags']),
+            'items': len(reader['items']),
+            'hangers': len(reader['hangers']),
+            'unknown_tags': sorted(reader['unknown']),
+            **changes,
+        })
+    conn.commit()
+    return {
+        'received': len(records),
+        'reads': len(reads),
+        'sightings': len(sightings),
+        'duplicates': len(reads) - len(sightings),
+        'readers': readers,
+        'errors': errors,
+    }
@@ -1,27 +1,30 @@
-from flask import Flask, request
+from flask import Flask, Response, current_app, request
 from flask_cors import CORS
-from flask_restx import Api, Resource, fields
+from flask_restx import Api, Resource, fields, marshal
 from datetime import datetime
-import uuid
-import sqlite3
+from urllib.parse import urlencode
 import json
 import os
-import time
 
-from models import item_model_def, item_model_db_init, order_model_def, order_model_db_init, hanger_model_def, hanger_model_db_init, outfit_model_def, outfit_model_db_init
+from models import item_model_def, order_model_def, hanger_model_def, outfit_model_def
+from db import DB_PATH, get_db, pool
+from association import engine as associations, DEFAULT_READER, TAG_WAIT_TIMEOUT
+from events import bus, publish
+import search
+import photos
+from photos import PHOTOS_DIR
+from caching import conditional, photo_cache_headers, requested_expansions
+import batch
+from relations import save_orders_items, load_orders, load_outfits
+from repository import new_id, open_repository
+import health
+from tag_index import tags
+import inventory
+import metrics
+import migrations
 
-# Dossier photos accessible en static
-PHOTOS_DIR = os.path.join(os.path.dirname(__file__), '..', 'photos')
-app = Flask(__name__, static_url_path='/photos', static_folder=PHOTOS_DIR)
-CORS(app)
-api = Api(app, title='Le Dressing de Laurianne API', description='API locale avec Swagger/OpenAPI', doc='/swagger/')
-
-DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'database.sqlite3')
-
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+# Les routes sont déclarées sur l'Api ; l'application Flask est créée par create_app()
+api = Api(title='Le Dressing de Laurianne API', description='API locale avec Swagger/OpenAPI', doc='/swagger/')
 
 item_model = api.model('Item', item_model_def)
 order_model = api.model('Order', order_model_def)
@@ -29,91 +32,288 @@ hanger_model = api.model('Hanger', hanger_model_def)
 outfit_model = api.model('Outfit', outfit_model_def)
 
 tag_input_model = api.model('TagInput', {
-    'tag_id': fields.String(example="Identifiant NFC/RFID", description="Identifiant du tag lu")
+    'tag_id': fields.String(example="Identifiant NFC/RFID", description="Identifiant du tag lu"),
+    'reader_id': fields.String(example="lecteur-entree", description="Identifiant du lecteur (optionnel)")
 })
 tag_add_model = api.model('TagAdd', {
     'item_id': fields.String(example="Identifiant d'un Item", description="Identifiant de l'item à associer à un tag")
 })
 
+ITEM_COLUMNS = list(item_model_def.keys())
+ITEM_FILTERS = ('category', 'color', 'size', 'hanger_id')
+ITEMS_PAGE_MAX = int(os.environ.get('ITEMS_PAGE_MAX', 1000))
+PHOTO_COLUMNS = ('photo', 'photo_hash', 'photo_thumb', 'photo_medium', 'photo_full')
+# Champs des articles renvoyés par ?expand=items sur les tenues (surchargeables par item_fields)
+OUTFIT_ITEM_FIELDS = ['id', 'name', 'category', 'color', 'size', 'photo', 'photo_thumb']
+
+# Lectures et écritures par enregistrement : le dépôt SQLite partagé avec la Lambda (repository/).
+# Les listes filtrées, la recherche et les lots gardent leurs requêtes SQL dédiées.
+repo = open_repository('sqlite', connect=get_db)
+
+def photo_fields(photo, current=None):
+    """Colonnes photo d'un item à partir de la valeur reçue (data URL base64, URL ou null)"""
+    if photo and photo.startswith('data:image'):
+        return photos.ingest_data_url(photo)
+    if current is not None and photo == current['photo']:
+        return {name: current[name] for name in PHOTO_COLUMNS}
+    columns = {name: None for name in PHOTO_COLUMNS}
+    columns['photo'] = photo
+    return columns
 
-# Variables globales pour la gestion des associations
-TAG_WAIT_ITEM_ID = None
-TAG_FOUND_ID = None
-ITEM_FOUND_ID = None
-HANGER_FOUND_ID = None
+def get_multi_arg(name):
+    """Valeurs d'un paramètre répété (?color=Rouge&color=Noir) ou séparé par des virgules"""
+    values = []
+    for value in request.args.getlist(name):
+        values.extend(v.strip() for v in value.split(',') if v.strip())
+    return values
+
+def build_item_filters(args):
+    """Construit la clause WHERE des filtres d'items à partir des paramètres de requête"""
+    clauses = []
+    params = []
+    for name in ITEM_FILTERS:
+        values = get_multi_arg(name)
+        if not values:
+            continue
+        # hanger_id=none sélectionne les items qui ne sont sur aucun cintre
+        if name == 'hanger_id' and values == ['none']:
+            clauses.append('hanger_id IS NULL')
+            continue
+        clauses.append(f"{name} IN ({', '.join('?' * len(values))})")
+        params.extend(values)
+    q = args.get('q', '').strip()
+    if q and search.enabled and search.match_query(q):
+        clauses.append('rowid IN (SELECT rowid FROM items_fts WHERE items_fts MATCH ?)')
+        params.append(search.match_query(q))
+    elif q:
+        clauses.append("(name LIKE ? OR category LIKE ? OR color LIKE ?)")
+        params.extend([f'%{q}%'] * 3)
+    return clauses, params
 
 @api.route('/items')
 class ItemList(Resource):
-    @api.marshal_list_with(item_model)
+    @api.doc(params={
+        'category': "Filtre par catégorie (répétable ou séparé par des virgules)",
+        'color': "Filtre par couleur (répétable ou séparé par des virgules)",
+        'size': "Filtre par taille (répétable ou séparé par des virgules)",
+        'hanger_id': "Filtre par cintre ('none' : items sans cintre)",
+        'q': "Recherche plein texte (préfixes, sans accents) dans le nom, la catégorie et la couleur",
+        'fields': "Champs à renvoyer, séparés par des virgules (ex. id,name,category)",
+        'limit': f"Taille de page (max {ITEMS_PAGE_MAX}) ; sans limit, tous les items sont renvoyés",
+        'after': "Curseur : id du dernier item de la page précédente (en-tête X-Next-Cursor)"
+    })
+    @api.response(200, 'Liste des items', [item_model])
+    @api.response(304, 'Items inchangés depuis l\'ETag envoyé en If-None-Match')
+    @conditional('items')
     def get(self):
-        """Récupère tous les items"""
+        """Récupère les items (filtrés, paginés par curseur et projetés)"""
+        requested = get_multi_arg('fields')
+        unknown = [name for name in requested if name not in ITEM_COLUMNS]
+        if unknown:
+            return {'error': f"Unknown fields: {', '.join(unknown)}"}, 400
+        projection = requested or ITEM_COLUMNS
+        # L'id est toujours lu : il sert de curseur
+        columns = ['id'] + [name for name in projection if name != 'id']
+
+        clauses, params = build_item_filters(request.args)
+        after = request.args.get('after')
+        if after:
+            clauses.append('id > ?')
+            params.append(after)
+        limit = request.args.get('limit', type=int)
+        if limit is not None:
+            limit = max(1, min(limit, ITEMS_PAGE_MAX))
+
+        sql = f"SELECT {', '.join(columns)} FROM items"
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        if limit is not None or after:
+            # Sans pagination, on garde l'ordre d'insertion historique
+            sql += ' ORDER BY id'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
         conn = get_db()
-        cur = conn.execute('SELECT * FROM items')
+        cur = conn.execute(sql, params)
         items = [dict(row) for row in cur.fetchall()]
         conn.close()
-        return items, 200
+
+        headers = {}
+        if limit is not None and len(items) == limit:
+            next_cursor = items[-1]['id']
+            headers['X-Next-Cursor'] = next_cursor
+            next_args = request.args.to_dict(flat=False)
+            next_args['after'] = [next_cursor]
+            headers['Link'] = f'<{request.base_url}?{urlencode(next_args, doseq=True)}>; rel="next"'
+        return marshal(items, item_model, mask=','.join(projection)), 200, headers
 
     @api.expect(item_model)
     @api.marshal_with(item_model, code=201)
     def post(self):
-        """Crée un nouvel item (supporte l'upload de photo en base64 ou lien direct)"""
+        """Crée un nouvel item (photo en base64 ou lien direct ; préférer POST /items/<id>/photo)"""
         data = api.payload
-        item_id = "item_" + str(uuid.uuid4())
-        photo_url = data.get('photo')
+        item_id = new_id('items')
         tag_id = data.get('tag_id')
         hanger_id = data.get('hanger_id')
 
-        # Si la photo est en base64, on la sauvegarde localement
-        if photo_url and photo_url.startswith('data:image'):
-            import base64
-            header, encoded = photo_url.split(',', 1)
-            ext = header.split('/')[1].split(';')[0]
-            filename = f"{item_id}.{ext}"
-            photo_path = os.path.join(os.path.dirname(__file__), '..', 'photos', filename)
-            os.makedirs(os.path.dirname(photo_path), exist_ok=True)
-            with open(photo_path, 'wb') as f:
-                f.write(base64.b64decode(encoded))
-            # On stocke le lien local
-            photo_url = f"/photos/{filename}"
+        # Si la photo est en base64, elle rejoint le stockage par empreinte
+        try:
+            photo = photo_fields(data.get('photo'))
+        except photos.PhotoError as e:
+            api.abort(400, str(e))
 
-        conn = get_db()
-        conn.execute(
-            'INSERT INTO items (id, name, category, color, size, photo, tag_id, hanger_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
-            (item_id, data.get('name'), data.get('category'), data.get('color'), data.get('size'), photo_url, tag_id, hanger_id)
-        )
-        conn.commit()
         item = {
             'id': item_id,
             'name': data.get('name'),
             'category': data.get('category'),
             'color': data.get('color'),
             'size': data.get('size'),
-            'photo': photo_url,
             'tag_id': tag_id,
-            'hanger_id': hanger_id
+            'hanger_id': hanger_id,
+            **photo
         }
-        conn.close()
+        repo.items.put(item)
+        tags.invalidate(tag_id)
+        photos.schedule(photo)
+        publish('item_created', item=item)
         return item, 201
 
 
+item_search_model = api.clone('ItemSearchResult', item_model, {
+    'score': fields.Float(description="Score BM25 (plus il est bas, plus l'item est pertinent)")
+})
+
+@api.route('/items/search')
+class ItemSearch(Resource):
+    @api.doc(params={
+        'q': "Texte recherché ; chaque mot est cherché comme préfixe, accents ignorés",
+        'limit': f"Nombre maximal de résultats (max {ITEMS_PAGE_MAX}, défaut 50)",
+        'fields': "Champs à renvoyer, séparés par des virgules"
+    })
+    @api.response(200, 'Items classés par pertinence', [item_search_model])
+    @conditional('items')
+    def get(self):
+        """Recherche plein texte dans les items, classée par pertinence (BM25)"""
+        if not search.enabled:
+            return {'error': 'Full-text search is not available'}, 503
+        requested = get_multi_arg('fields')
+        unknown = [name for name in requested if name not in ITEM_COLUMNS]
+        if unknown:
+            return {'error': f"Unknown fields: {', '.join(unknown)}"}, 400
+        projection = requested or ITEM_COLUMNS
+        limit = max(1, min(request.args.get('limit', 50, type=int), ITEMS_PAGE_MAX))
+        conn = get_db()
+        items = search.search_items(conn, request.args.get('q', ''), projection, limit)
+        conn.close()
+        return marshal(items, item_search_model, mask=','.join(projection + ['score'])), 200
+
+
+ITEM_BATCH_FIELDS = ('name', 'category', 'color', 'size', 'tag_id', 'hanger_id')
+# Colonnes calculées à partir de la photo : en upsert, une photo inchangée garde son empreinte et ses déclinaisons
+PHOTO_DERIVED_COLUMNS = ('photo_hash', 'photo_thumb', 'photo_medium', 'photo_full')
+ITEM_UPSERT_SET = ', '.join(
+    [f'{name} = excluded.{name}' for name in ITEM_COLUMNS if name != 'id' and name not in PHOTO_DERIVED_COLUMNS]
+    + [f'{name} = CASE WHEN excluded.photo_hash IS NULL AND excluded.photo IS items.photo THEN items.{name} ELSE excluded.{name} END'
+       for name in PHOTO_DERIVED_COLUMNS]
+)
+
+batch_params = {
+    'upsert': "1 : met à jour les enregistrements dont l'id existe déjà au lieu de les rejeter"
+}
+batch_doc = "Corps : tableau JSON ou NDJSON (Content-Type: application/x-ndjson), un enregistrement par élément"
+
+@api.route('/items:batch')
+class ItemBatch(Resource):
+    @api.doc(params=batch_params, description=batch_doc)
+    @api.expect([item_model])
+    @api.response(200, 'Tous les items ont été enregistrés')
+    @api.response(207, 'Certains items ont été rejetés (voir results)')
+    def post(self):
+        """Crée (ou met à jour avec upsert=1) des items en une seule transaction"""
+        try:
+            records = batch.read_records()
+        except batch.BatchError as e:
+            return {'error': str(e)}, 400
+        upsert = batch.is_upsert()
+
+        results = [None] * len(records)
+        items = []
+        for index, record in enumerate(records):
+            if not isinstance(record, dict):
+                results[index] = batch.error(index, 'Expected an object')
+                continue
+            try:
+                photo = photo_fields(record.get('photo'))
+            except photos.PhotoError as e:
+                results[index] = batch.error(index, str(e), record.get('id'))
+                continue
+            item = {'id': record.get('id') or new_id('items')}
+            item.update({name: record.get(name) for name in ITEM_BATCH_FIELDS})
+            item.update(photo)
+            items.append((index, item))
+
+        sql = f"INSERT INTO items ({', '.join(ITEM_COLUMNS)}) VALUES ({', '.join('?' * len(ITEM_COLUMNS))})"
+        if upsert:
+            sql += f' ON CONFLICT (id) DO UPDATE SET {ITEM_UPSERT_SET}'
+        conn = get_db()
+        batch.begin(conn)
+        existing = batch.existing_ids(conn, 'items', [item['id'] for _, item in items]) if upsert else set()
+        errors = batch.execute_rows(conn, sql, [tuple(item[name] for name in ITEM_COLUMNS) for _, item in items])
+        # Un événement par item enregistré, tel qu'en base, écrit dans la transaction du lot
+        saved_ids = [item['id'] for position, (_, item) in enumerate(items) if position not in errors]
+        rows = conn.execute(
+            f'''SELECT {', '.join(f'items.{name}' for name in ITEM_COLUMNS)}
+                FROM json_each(?) AS saved JOIN items ON items.id = saved.value ORDER BY saved.key''',
+            (json.dumps(saved_ids),)
+        ).fetchall()
+        bus.record_many(conn, [
+            ('item_updated' if row['id'] in existing else 'item_created', {'item': dict(row)}) for row in rows
+        ])
+        conn.commit()
+        conn.close()
+        bus.wake()
+
+        for position, (index, item) in enumerate(items):
+            if position in errors:
+                results[index] = batch.error(index, errors[position], item['id'])
+                continue
+            status = 'updated' if item['id'] in existing else 'created'
+            results[index] = {'index': index, 'id': item['id'], 'status': status}
+            photos.schedule(item)
+        if saved_ids:
+            tags.clear()
+        return batch.summary(results)
+
+
 @api.route('/items/<string:id>')
 class Item(Resource):
     @api.expect(item_model)
     def put(self, id):
         """Met à jour un item"""
         data = api.payload
-        conn = get_db()
-        cur = conn.execute('SELECT * FROM items WHERE id = ?', (id,))
-        if cur.fetchone() is None:
-            conn.close()
+        current = repo.items.get(id)
+        if current is None:
             return {'error': 'Item not found'}, 404
-        conn.execute(
-            'UPDATE items SET name = ?, category = ?, color = ?, size = ?, photo = ?, tag_id = ?, hanger_id = ? WHERE id = ?',
-            (data.get('name'), data.get('category'), data.get('color'), data.get('size'), data.get('photo'), data.get('tag_id'), data.get('hanger_id'), id)
-        )
-        conn.commit()
-        conn.close()
-        
+        try:
+            photo = photo_fields(data.get('photo'), current)
+        except photos.PhotoError as e:
+            return {'error': str(e)}, 400
+        item = repo.items.update(id, {
+            'name': data.get('name'),
+            'category': data.get('category'),
+            'color': data.get('color'),
+            'size': data.get('size'),
+            'tag_id': data.get('tag_id'),
+            'hanger_id': data.get('hanger_id'),
+            **photo
+        })
+        if item is None:
+            return {'error': 'Item not found'}, 404
+        tags.invalidate(current['tag_id'], data.get('tag_id'))
+        photos.schedule(photo)
+        publish('item_updated', item=item)
+
         message = {
             "status": "item_updated",
             "item_id": id
@@ -122,11 +322,10 @@ class Item(Resource):
 
     def delete(self, id):
         """Supprime un item"""
-        conn = get_db()
-        conn.execute('DELETE FROM items WHERE id = ?', (id,))
-        conn.commit()
-        conn.close()
-        
+        repo.items.delete(id)
+        tags.forget('item', id)
+        publish('item_deleted', item_id=id)
+
         message = {
             "status": "item_deleted",
             "item_id": id
@@ -134,54 +333,151 @@ class Item(Resource):
         return message, 200
 
 
+@api.route('/items/<string:id>/photo')
+class ItemPhoto(Resource):
+    @api.doc(
+        consumes=['multipart/form-data', 'image/jpeg', 'image/png', 'image/webp'],
+        params={'photo': {'in': 'formData', 'type': 'file', 'description': "Fichier image (multipart/form-data)"}}
+    )
+    def post(self, id):
+        """Téléverse la photo d'un item : champ multipart 'photo' ou corps binaire image/*"""
+        conn = get_db()
+        exists = conn.execute('SELECT 1 FROM items WHERE id = ?', (id,)).fetchone() is not None
+        conn.close()
+        if not exists:
+            return {'error': 'Item not found'}, 404
+
+        # Le fichier est lu par blocs et écrit sur disque au fil de l'eau, sans base64
+        try:
+            if request.mimetype == 'multipart/form-data':
+                upload = request.files.get('photo')
+                if upload is None:
+                    return {'error': "Missing 'photo' file field"}, 400
+                photo = photos.ingest(upload.stream, upload.mimetype, upload.filename)
+            else:
+                photo = photos.ingest(request.stream, request.mimetype)
+        except photos.PhotoError as e:
+            return {'error': str(e)}, 400
+
+        conn = get_db()
+        conn.execute(
+            'UPDATE items SET photo = ?, photo_hash = ?, photo_thumb = ?, photo_medium = ?, photo_full = ? WHERE id = ?',
+            (photo['photo'], photo['photo_hash'], photo['photo_thumb'], photo['photo_medium'], photo['photo_full'], id)
+        )
+        conn.commit()
+        item = dict(conn.execute('SELECT * FROM items WHERE id = ?', (id,)).fetchone())
+        conn.close()
+        photos.schedule(photo)
+        publish('item_updated', item=item)
+        # 202 tant que les déclinaisons sont en cours de génération (un item_updated suivra)
+        return marshal(item, item_model), 202 if photo['photo_thumb'] is None else 200
+
+
 @api.route('/hangers')
 class HangerList(Resource):
+    @conditional('hangers')
     @api.marshal_list_with(hanger_model)
     def get(self):
         """Récupère tous les cintres"""
-        conn = get_db()
-        cur = conn.execute('SELECT * FROM hangers')
-        hangers = [dict(row) for row in cur.fetchall()]
-        conn.close()
-        return hangers, 200
+        return repo.hangers.export(), 200
 
     @api.expect(hanger_model)
     @api.marshal_with(hanger_model, code=201)
     def post(self):
         """Crée un nouveau cintre"""
         data = api.payload
-        hanger_id = "hanger_" + str(uuid.uuid4())
-        conn = get_db()
-        conn.execute(
-            'INSERT INTO hangers (id, tag_id, mqtt_topic) VALUES (?, ?, ?)',
-            (hanger_id, data.get('tag_id'), data.get('mqtt_topic'))
-        )
-        conn.commit()
         hanger = {
-            'id': hanger_id,
+            'id': new_id('hangers'),
             'tag_id': data.get('tag_id'),
             'mqtt_topic': data.get('mqtt_topic')
         }
-        conn.close()
+        repo.hangers.put(hanger)
+        tags.invalidate(data.get('tag_id'))
         return hanger, 201
 
+HANGER_BATCH_FIELDS = ('tag_id', 'mqtt_topic', 'last_seen', 'status')
+
+@api.route('/hangers:batch')
+class HangerBatch(Resource):
+    @api.doc(params=batch_params, description=batch_doc)
+    @api.expect([hanger_model])
+    @api.response(200, 'Tous les cintres ont été enregistrés')
+    @api.response(207, 'Certains cintres ont été rejetés (voir results)')
+    def post(self):
+        """Crée (ou met à jour avec upsert=1) des cintres en une seule transaction"""
+        try:
+            records = batch.read_records()
+        except batch.BatchError as e:
+            return {'error': str(e)}, 400
+        upsert = batch.is_upsert()
+
+        results = [None] * len(records)
+        hangers = []
+        tags_changed = False
+        for index, record in enumerate(records):
+            if not isinstance(record, dict):
+                results[index] = batch.error(index, 'Expected an object')
+                continue
+            tags_changed = tags_changed or 'tag_id' in record
+            id = record.get('id') or new_id('hangers')
+            hangers.append((index, (id, (id, *(record.get(name) for name in HANGER_BATCH_FIELDS)),
+                                    batch.update_params(id, record, HANGER_BATCH_FIELDS))))
+
+        sql = f"INSERT INTO hangers (id, {', '.join(HANGER_BATCH_FIELDS)}) VALUES (?, {', '.join('?' * len(HANGER_BATCH_FIELDS))})"
+        # En upsert, un champ absent garde sa valeur (le registre MQTT n'envoie que la présence) ; null le vide
+        update_sql = batch.partial_update('hangers', HANGER_BATCH_FIELDS)
+        conn = get_db()
+        batch.begin(conn)
+        existing = batch.existing_ids(conn, 'hangers', [row[0] for _, row in hangers]) if upsert else set()
+        errors = batch.upsert_rows(conn, sql, update_sql, [row for _, row in hangers], existing)
+        conn.commit()
+        conn.close()
+
+        for position, (index, row) in enumerate(hangers):
+            if position in errors:
+                results[index] = batch.error(index, errors[position], row[0])
+            else:
+                results[index] = {'index': index, 'id': row[0], 'status': 'updated' if row[0] in existing else 'created'}
+        # Les lots de présence (sans tag) ne vident pas le cache des tags
+        if tags_changed:
+            tags.clear()
+        return batch.summary(results)
+
+    @api.doc(description="Corps : tableau JSON d'ids (ou d'objets avec un id), ou NDJSON")
+    @api.response(200, 'Résultat de la suppression de chaque cintre')
+    def delete(self):
+        """Supprime des cintres en une seule transaction"""
+        try:
+            records = batch.read_records()
+        except batch.BatchError as e:
+            return {'error': str(e)}, 400
+        ids = [record.get('id') if isinstance(record, dict) else record for record in records]
+
+        conn = get_db()
+        batch.begin(conn)
+        existing = batch.existing_ids(conn, 'hangers', ids)
+        conn.executemany('DELETE FROM hangers WHERE id = ?', [(hanger_id,) for hanger_id in existing])
+        conn.commit()
+        conn.close()
+        for hanger_id in existing:
+            tags.forget('hanger', hanger_id)
+
+        results = [
+            {'index': index, 'id': hanger_id, 'status': 'deleted' if hanger_id in existing else 'not_found'}
+            for index, hanger_id in enumerate(ids)
+        ]
+        return batch.summary(results)
+
 @api.route('/hangers/<string:id>')
 class Hanger(Resource):
     @api.expect(hanger_model)
     def put(self, id):
         """Met à jour un cintre"""
         data = api.payload
-        conn = get_db()
-        cur = conn.execute('SELECT * FROM hangers WHERE id = ?', (id,))
-        if cur.fetchone() is None:
-            conn.close()
+        current = repo.hangers.get(id)
+        if current is None or repo.hangers.update(id, {'tag_id': data.get('tag_id'), 'mqtt_topic': data.get('mqtt_topic')}) is None:
             return {'error': 'Hanger not found'}, 404
-        conn.execute(
-            'UPDATE hangers SET tag_id = ?, mqtt_topic = ? WHERE id = ?',
-            (data.get('tag_id'), data.get('mqtt_topic'), id)
-        )
-        conn.commit()
-        conn.close()
+        tags.invalidate(current['tag_id'], data.get('tag_id'))
         message = {
             "status": "hanger_updated",
             "hanger_id": id
@@ -190,10 +486,8 @@ class Hanger(Resource):
 
     def delete(self, id):
         """Supprime un cintre"""
-        conn = get_db()
-        conn.execute('DELETE FROM hangers WHERE id = ?', (id,))
-        conn.commit()
-        conn.close()
+        repo.hangers.delete(id)
+        tags.forget('hanger', id)
         message = {
             "status": "hanger_deleted",
             "hanger_id": id
@@ -205,122 +499,185 @@ class TagReader(Resource):
     @api.expect(tag_input_model)
     def post(self):
         """Reçoit un tag lu par un lecteur externe"""
-        global TAG_WAIT_ITEM_ID
-        global TAG_FOUND_ID
-        global ITEM_FOUND_ID
-        global HANGER_FOUND_ID
-
         data = api.payload
         tag_id = data.get('tag_id')
-        app.logger.info(f"Tag reçu : {tag_id}")
+        reader_id = data.get('reader_id') or DEFAULT_READER
+        current_app.logger.info(f"Tag reçu : {tag_id} (lecteur {reader_id})")
 
-        TAG_FOUND_ID = tag_id
-        message = ''
-        if TAG_WAIT_ITEM_ID is not None:
-            conn = get_db()
-            conn.execute('UPDATE items SET tag_id = ? WHERE id = ?', (tag_id, TAG_WAIT_ITEM_ID))
+        message = {
+            "status": "unknown_tag",
+            "tag_id": tag_id
+        }
+        # L'attente a pu être enregistrée par un autre worker : elle est résolue en base
+        conn = get_db()
+        pending = associations.claim(conn, reader_id, tag_id)
+        if pending is not None:
+            conn.execute('UPDATE items SET tag_id = ? WHERE id = ?', (tag_id, pending.item_id))
             conn.commit()
-            conn.close()
-            app.logger.info(f"Tag {tag_id} associé à l'item {TAG_WAIT_ITEM_ID}")
+        conn.close()
+        if pending is not None:
+            tags.forget('item', pending.item_id, tag_id)
+            # Réveille immédiatement une attente GET /tag/<id> de ce worker ; celle d'un autre worker l'est par son scrutateur
+            associations.notify(pending.id)
+            current_app.logger.info(f"Tag {tag_id} associé à l'item {pending.item_id}")
             message = {
                 "status": "association_complete",
                 "tag_id": tag_id,
-                "item_id": TAG_WAIT_ITEM_ID
+                "item_id": pending.item_id
             }
-            TAG_WAIT_ITEM_ID = None
-        else:
+            publish('association_complete', reader_id=reader_id, **message)
+            return message, 200
+
+        # Résolution en mémoire : la base n'est lue que pour un tag absent du cache
+        owner = tags.lookup(get_db, tag_id)
+        pair = None
+        if owner is not None and owner[0] == 'item':
+            item_id = owner[1]
+            current_app.logger.info(f"Tag {tag_id} trouvé dans items, id: {item_id}")
+            message = {
+                "status": "wait_hanger",
+                "item_id": item_id
+            }
+            pair = associations.record_scan(reader_id, item_id=item_id)
+        elif owner is not None:
+            hanger_id = owner[1]
+            current_app.logger.info(f"Tag {tag_id} trouvé dans hangers, id: {hanger_id}")
+            message = {
+                "status": "wait_item",
+                "hanger_id": hanger_id
+            }
+            pair = associations.record_scan(reader_id, hanger_id=hanger_id)
+        if pair is not None:
+            item_id, hanger_id = pair
             conn = get_db()
-            cur = conn.execute('SELECT id FROM items WHERE tag_id = ?', (tag_id,))
-            item_row = cur.fetchone()
-            if item_row:
-                ITEM_FOUND_ID = item_row['id']
-                app.logger.info(f"Tag {tag_id} trouvé dans items, id: {ITEM_FOUND_ID}")
-                message = {
-                    "status": "wait_hanger",
-                    "item_id": ITEM_FOUND_ID
-                }
-            else:
-                cur = conn.execute('SELECT id FROM hangers WHERE tag_id = ?', (tag_id,))
-                hanger_row = cur.fetchone()
-                if hanger_row:
-                    HANGER_FOUND_ID = hanger_row['id']
-                    app.logger.info(f"Tag {tag_id} trouvé dans hangers, id: {HANGER_FOUND_ID}")
-                    message = {
-                        "status": "wait_item",
-                        "hanger_id": HANGER_FOUND_ID
-                    }
+            conn.execute('UPDATE items SET hanger_id = ? WHERE id = ?', (hanger_id, item_id))
             conn.commit()
             conn.close()
-            if ITEM_FOUND_ID is not None and HANGER_FOUND_ID is not None:
-                conn = get_db()
-                conn.execute('UPDATE items SET hanger_id = ? WHERE id = ?', (HANGER_FOUND_ID, ITEM_FOUND_ID))
-                conn.commit()
-                conn.close()
-                ITEM_FOUND_ID = None
-                HANGER_FOUND_ID = None
-                message = {
-                    "status": "association_complete",
-                    "item_id": ITEM_FOUND_ID,
-                    "hanger_id": HANGER_FOUND_ID
-                }
+            message = {
+                "status": "association_complete",
+                "item_id": item_id,
+                "hanger_id": hanger_id
+            }
+        if message['status'] != 'unknown_tag':
+            publish(message['status'], reader_id=reader_id, **message)
         return message, 200
 
-# Nouvelle route GET /tag/<string:id>
 @api.route('/tag/<string:id>')
 class TagWait(Resource):
+    @api.doc(params={
+        'reader': "Identifiant du lecteur qui lira le tag",
+        'timeout': "Attente maximale en secondes (0 : enregistre l'attente et répond immédiatement)"
+    })
     def get(self, id):
-        """Reçoit un id d'item dans l'URL, le stocke en variable globale, et attend que la variable soit remise à null avant de répondre"""
-        global TAG_WAIT_ITEM_ID
-        TAG_WAIT_ITEM_ID = id
-        app.logger.info(f"Item en attente de tag (GET /tag/<id>): {TAG_WAIT_ITEM_ID}")
-        # Attente active jusqu'à ce que TAG_WAIT_ITEM_ID soit remis à None
-        while TAG_WAIT_ITEM_ID is not None:
-            time.sleep(0.5)
+        """Met l'item en attente du prochain tag lu et répond dès que l'association est faite"""
+        reader_id = request.args.get('reader', DEFAULT_READER)
+        timeout = min(request.args.get('timeout', TAG_WAIT_TIMEOUT, type=float), TAG_WAIT_TIMEOUT)
+        pending = associations.expect_tag(id, reader_id)
+        current_app.logger.info(f"Item en attente de tag (GET /tag/<id>): {id} (lecteur {reader_id})")
+        publish('wait_tag', item_id=id, reader_id=reader_id)
+        if timeout <= 0:
+            return {"status": "wait_tag", "item_id": id, "reader_id": reader_id}, 202
+        # Attente sans thread dédié sous le worker gevent ; le tag peut être lu par n'importe quel worker
+        pending = associations.wait(pending, timeout)
+        if pending.status == 'timeout':
+            publish('association_cancelled', status='timeout', item_id=id, reader_id=reader_id)
+        if pending.status != 'association_complete':
+            return {"status": pending.status, "item_id": id, "reader_id": reader_id}, 408
         message = {
             "status": "association_complete",
             "item_id": id,
-            "tag_id": TAG_FOUND_ID
+            "tag_id": pending.tag_id
         }
         return message, 200
 
+    @api.doc(params={'reader': "Identifiant du lecteur"})
+    def delete(self, id):
+        """Annule l'attente de tag pour cet item"""
+        reader_id = request.args.get('reader', DEFAULT_READER)
+        pending = associations.cancel(id, reader_id)
+        if pending is None:
+            return {'error': 'No pending association'}, 404
+        publish('association_cancelled', status='cancelled', item_id=id, reader_id=reader_id)
+        return {"status": "cancelled", "item_id": id, "reader_id": reader_id}, 200
+
+@api.route('/tag/cache')
+class TagCache(Resource):
+    def get(self):
+        """Statistiques du cache des tags du worker courant (taille, taux de succès)"""
+        return tags.stats(), 200
+
+@api.route('/tag/pending')
+class TagPending(Resource):
+    def get(self):
+        """Liste les associations en attente, par lecteur"""
+        return associations.pending(), 200
+
+@api.route('/tags:batch')
+class TagBatch(Resource):
+    @api.doc(params={'window': "Fenêtre de dédoublonnage en secondes (défaut : TAG_DEDUP_WINDOW)"}, description=(
+        "Corps : tableau JSON ou NDJSON de lectures {tag_id, reader_id, timestamp}. "
+        "Chaque lot d'un lecteur est un tour d'inventaire complet, comparé au précédent."))
+    def post(self):
+        """Reçoit un tour d'inventaire d'un ou plusieurs lecteurs RFID (plusieurs tags par requête)"""
+        try:
+            records = batch.read_records()
+        except batch.BatchError as e:
+            return {'error': str(e)}, 400
+        window = request.args.get('window', inventory.TAG_DEDUP_WINDOW, type=float)
+        conn = get_db()
+        result = inventory.ingest(conn, records, window)
+        conn.close()
+        for reader in result['readers']:
+            if reader['appeared'] or reader['disappeared'] or reader['hangers_appeared'] or reader['hangers_disappeared']:
+                publish('inventory_changed', **{key: reader[key] for key in (
+                    'reader_id', 'appeared', 'disappeared', 'hangers_appeared', 'hangers_disappeared')})
+        return result, 207 if result['errors'] else 200
+
+@api.route('/tags/inventory')
+class TagInventoryList(Resource):
+    def get(self):
+        """Lecteurs dont un inventaire est connu"""
+        return inventory.tracker.readers(), 200
+
+@api.route('/tags/inventory/<string:reader_id>')
+class TagInventory(Resource):
+    def get(self, reader_id):
+        """Dernier inventaire du lecteur, items groupés par cintre"""
+        snapshot = inventory.tracker.snapshot(reader_id)
+        if snapshot is None:
+            return {'error': 'No inventory for this reader'}, 404
+        return snapshot, 200
+
+    def delete(self, reader_id):
+        """Oublie l'inventaire du lecteur : le prochain tour repart de zéro"""
+        if not inventory.tracker.forget(reader_id):
+            return {'error': 'No inventory for this reader'}, 404
+        return {'status': 'deleted', 'reader_id': reader_id}, 200
+
 @api.route('/orders')
 class OrderList(Resource):
+    @conditional('orders')
     @api.marshal_list_with(order_model)
     def get(self):
         """Récupère toutes les commandes"""
         conn = get_db()
-        cur = conn.execute('SELECT * FROM orders')
-        orders = []
-        for row in cur.fetchall():
-            order = dict(row)
-            order['items'] = json.loads(order['items']) if order['items'] else []
-            orders.append(order)
+        orders = load_orders(conn)
         conn.close()
-        sorted_orders = sorted(orders, key=lambda x: x.get('timestamp', ''), reverse=True)
-        return sorted_orders, 200
+        return orders, 200
 
     @api.expect(order_model)
     @api.marshal_with(order_model, code=201)
     def post(self):
         """Crée une nouvelle commande (items est une liste JSON)"""
         data = api.payload
-        order_id = "order_" + str(uuid.uuid4())
-        items_list = data.get('items', [])
-        timestamp = datetime.now().isoformat() + 'Z'
-        status = 'En cours'
-        conn = get_db()
-        conn.execute(
-            'INSERT INTO orders (id, items, timestamp, status) VALUES (?, ?, ?, ?)',
-            (order_id, json.dumps(items_list), timestamp, status)
-        )
-        conn.commit()
         order = {
-            'id': order_id,
-            'items': items_list,
-            'timestamp': timestamp,
-            'status': status
+            'id': new_id('orders'),
+            'items': data.get('items', []),
+            'timestamp': datetime.now().isoformat() + 'Z',
+            'status': 'En cours'
         }
-        conn.close()
+        repo.orders.put(order)
+        publish('order_created', order=order)
         return order, 201
 
 @api.route('/orders/<string:id>')
@@ -329,104 +686,278 @@ class OrderUpdate(Resource):
     def put(self, id):
         """Met à jour une commande existante (id passé dans l'URL)"""
         data = api.payload
-        conn = get_db()
-        cur = conn.execute('SELECT * FROM orders WHERE id = ?', (id,))
-        if cur.fetchone() is None:
-            conn.close()
-            return {'error': 'Order not found'}, 404
         items_list = data.get('items', [])
         timestamp = data.get('timestamp')
         status = data.get('status')
+        if repo.orders.update(id, {'timestamp': timestamp, 'status': status, 'items': items_list}) is None:
+            return {'error': 'Order not found'}, 404
+        current_app.logger.info(f"Commande mise à jour : {id} (statut {status})")
+        publish('order_updated', order={
+            'id': id,
+            'items': items_list,
+            'timestamp': timestamp,
+            'status': status
+        })
+        return {'message': 'Order updated successfully', 'order_id': id}, 200
+    
+outfit_expanded_model = api.clone('OutfitExpanded', outfit_model, {
+    'items': fields.List(fields.Nested(item_model), description="Articles de la tenue (champs choisis par item_fields)"),
+    'missing_items': fields.List(fields.String, description="IDs d'articles de la tenue qui n'existent plus")
+})
+
+outfit_get_params = {
+    'expand': "'items' : renvoie les articles au lieu de leurs IDs",
+    'item_fields': f"Champs des articles avec expand=items (défaut : {','.join(OUTFIT_ITEM_FIELDS)})"
+}
+
+
+def get_outfits(where='', params=()):
+    """Tenues marshallées, avec leurs articles résolus si ?expand=items"""
+    unknown = requested_expansions() - {'items'}
+    if unknown:
+        return {'error': f"Unknown expansions: {', '.join(sorted(unknown))}"}, 400
+    if 'items' not in requested_expansions():
+        conn = get_db()
+        outfits = load_outfits(conn, where, params)
+        conn.close()
+        return marshal(outfits, outfit_model), 200
+
+    item_fields = get_multi_arg('item_fields') or OUTFIT_ITEM_FIELDS
+    unknown = [name for name in item_fields if name not in ITEM_COLUMNS]
+    if unknown:
+        return {'error': f"Unknown fields: {', '.join(unknown)}"}, 400
+    conn = get_db()
+    outfits = load_outfits(conn, where, params, item_columns=item_fields)
+    conn.close()
+    mask = ','.join(list(outfit_model_def) + ['missing_items', f"items{{{','.join(item_fields)}}}"])
+    return marshal(outfits, outfit_expanded_model, mask=mask), 200
+
+
+ORDER_BATCH_FIELDS = ('timestamp', 'status')
+
+@api.route('/orders:batch')
+class OrderBatch(Resource):
+    @api.doc(params=batch_params, description=batch_doc)
+    @api.expect([order_model])
+    @api.response(200, 'Toutes les commandes ont été enregistrées')
+    @api.response(207, 'Certaines commandes ont été rejetées (voir results)')
+    def post(self):
+        """Crée (ou met à jour avec upsert=1) des commandes en une seule transaction"""
+        try:
+            records = batch.read_records()
+        except batch.BatchError as e:
+            return {'error': str(e)}, 400
+        upsert = batch.is_upsert()
+
+        results = [None] * len(records)
+        orders = []
+        for index, record in enumerate(records):
+            if not isinstance(record, dict) or not isinstance(record.get('items', []), list):
+                results[index] = batch.error(index, 'Expected an object with an items list')
+                continue
+            # Les imports gardent l'id et l'horodatage d'origine quand ils sont fournis ;
+            # items absent (None) : une commande existante garde ses articles
+            orders.append((index, {
+                'id': record.get('id') or new_id('orders'),
+                'timestamp': record.get('timestamp'),
+                'status': record.get('status'),
+                'items': record.get('items'),
+                'update': record,
+            }))
+
+        sql = 'INSERT INTO orders (id, timestamp, status) VALUES (?, ?, ?)'
+        # En upsert, un champ absent garde sa valeur actuelle ; null le vide
+        update_sql = batch.partial_update('orders', ORDER_BATCH_FIELDS)
+        conn = get_db()
+        batch.begin(conn)
+        existing = batch.existing_ids(conn, 'orders', [order['id'] for _, order in orders]) if upsert else set()
+        errors = batch.upsert_rows(conn, sql, update_sql, [
+            (order['id'], (order['id'], order['timestamp'], order['status']),
+             batch.update_params(order['id'], order.pop('update'), ORDER_BATCH_FIELDS))
+            for _, order in orders], existing)
+        saved = [order for position, (_, order) in enumerate(orders) if position not in errors]
+        # Valeurs par défaut des nouvelles commandes, comme POST /orders
         conn.execute(
-            'UPDATE orders SET items = ?, timestamp = ?, status = ? WHERE id = ?',
-            (json.dumps(items_list), timestamp, status, id)
+            'UPDATE orders SET timestamp = coalesce(timestamp, ?), status = coalesce(status, ?) '
+            'WHERE (timestamp IS NULL OR status IS NULL) AND id IN (SELECT value FROM json_each(?))',
+            (datetime.now().isoformat() + 'Z', 'En cours',
+             json.dumps([order['id'] for order in saved if order['id'] not in existing]))
         )
-        app.logger.error(f"Order updated: id={id}, status={status}")
+        with_items = [(order['id'], order['items']) for order in saved if order['items'] is not None]
+        # Seules les commandes existantes dont le lot fournit les articles voient les leurs remplacés
+        conn.executemany('DELETE FROM order_items WHERE order_id = ?',
+                         [(order_id,) for order_id, _ in with_items if order_id in existing])
+        save_orders_items(conn, with_items, replace=False)
+        # Un événement par commande enregistrée, relue avec ses articles, dans la transaction du lot
+        saved_orders = load_orders(conn, 'WHERE orders.id IN (SELECT value FROM json_each(?))',
+                                   (json.dumps([order['id'] for order in saved]),))
+        bus.record_many(conn, [
+            ('order_updated' if order['id'] in existing else 'order_created', {'order': order}) for order in saved_orders
+        ])
         conn.commit()
         conn.close()
-        return {'message': 'Order updated successfully', 'order_id': id}, 200
-    
+        bus.wake()
+
+        for position, (index, order) in enumerate(orders):
+            if position in errors:
+                results[index] = batch.error(index, errors[position], order['id'])
+            else:
+                results[index] = {'index': index, 'id': order['id'], 'status': 'updated' if order['id'] in existing else 'created'}
+        return batch.summary(results)
+
 @api.route('/outfits')
 class OutfitList(Resource):
-    @api.marshal_list_with(outfit_model)
+    @api.doc(params=outfit_get_params)
+    @api.response(200, 'Liste des tenues', [outfit_model])
+    @api.response(304, 'Tenues inchangées depuis l\'ETag envoyé en If-None-Match')
+    @conditional('outfits', expandable=('items',))
     def get(self):
-        """Récupère toutes les tenues"""
-        conn = get_db()
-        cur = conn.execute('SELECT * FROM outfits')
-        outfits = []
-        for row in cur.fetchall():
-            outfit = dict(row)
-            outfit['items'] = json.loads(outfit['items']) if outfit['items'] else []
-            outfits.append(outfit)
-        conn.close()
-        return outfits, 200
+        """Récupère toutes les tenues (avec expand=items, leurs articles en une seule requête)"""
+        return get_outfits()
 
     @api.expect(outfit_model)
     @api.marshal_with(outfit_model, code=201)
     def post(self):
         """Crée une nouvelle tenue"""
         data = api.payload
-        outfit_id = "outfit_" + str(uuid.uuid4())
-        item_ids = data.get('items', [])
-        conn = get_db()
-        conn.execute(
-            'INSERT INTO outfits (id, name, description, items) VALUES (?, ?, ?, ?)',
-            (outfit_id, data.get('name'), data.get('description'), json.dumps(item_ids))
-        )
-        conn.commit()
         outfit = {
-            'id': outfit_id,
+            'id': new_id('outfits'),
             'name': data.get('name'),
             'description': data.get('description'),
-            'items': item_ids
+            'items': data.get('items', []),
+            'date': data.get('date')
         }
-        conn.close()
+        repo.outfits.put(outfit)
         return outfit, 201
 
 @api.route('/outfits/<string:id>')
 class Outfit(Resource):
+    @api.doc(params=outfit_get_params)
+    @api.response(200, 'Tenue', outfit_expanded_model)
+    @api.response(404, 'Tenue introuvable')
+    @conditional('outfits', expandable=('items',))
+    def get(self, id):
+        """Récupère une tenue (avec expand=items, ses articles résolus)"""
+        result, code = get_outfits('WHERE outfits.id = ?', (id,))
+        if code != 200:
+            return result, code
+        if not result:
+            return {'error': 'Outfit not found'}, 404
+        return result[0], 200
+
     @api.expect(outfit_model)
     def put(self, id):
         """Met à jour une tenue"""
         data = api.payload
-        conn = get_db()
-        cur = conn.execute('SELECT * FROM outfits WHERE id = ?', (id,))
-        if cur.fetchone() is None:
-            conn.close()
+        changes = {'name': data.get('name'), 'description': data.get('description'), 'items': data.get('items', [])}
+        # Sans date, la tenue garde la sienne
+        if data.get('date') is not None:
+            changes['date'] = data['date']
+        if repo.outfits.update(id, changes) is None:
             return {'error': 'Outfit not found'}, 404
-        
-        item_ids = data.get('items', [])
-        conn.execute(
-            'UPDATE outfits SET name = ?, description = ?, items = ? WHERE id = ?',
-            (data.get('name'), data.get('description'), json.dumps(item_ids), id)
-        )
-        conn.commit()
-        conn.close()
         return {'message': 'Outfit updated successfully'}, 200
     
     def delete(self, id):
         """Supprime une tenue"""
-        conn = get_db()
-        conn.execute('DELETE FROM outfits WHERE id = ?', (id,))
-        conn.commit()
-        conn.close()
+        repo.outfits.delete(id)
         message = {
             "status": "item_deleted",
             "item_id": id
         }
         return message, 200
 
+@api.route('/events')
+class EventStream(Resource):
+    @api.doc(params={
+        'types': "Types d'événements à recevoir, séparés par des virgules (tous par défaut)",
+        'last_event_id': "Dernier id reçu, si l'en-tête Last-Event-ID ne peut pas être envoyé"
+    })
+    def get(self):
+        """Flux Server-Sent Events des changements (items, associations de tags, commandes)"""
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        types = request.args.get('types')
+        types = set(types.split(',')) if types else None
+        return Response(
+            bus.stream(last_event_id, types),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no',
+            }
+        )
+
+@api.route('/events/stats')
+class EventStats(Resource):
+    def get(self):
+        """Dernier numéro d'événement et abonnés du worker courant"""
+        return {
+            'last_seq': bus.last_seq,
+            'subscribers': bus.subscribers
+        }, 200
+
+@api.route('/health')
+class Health(Resource):
+    @api.response(200, 'Base joignable et schéma à jour')
+    @api.response(503, 'Base injoignable ou schéma incomplet')
+    def get(self):
+        """État de santé de l'API (base SQLite et schéma)"""
+        conn = get_db()
+        status = health.check(conn)
+        conn.close()
+        return status, 200 if status['status'] == 'ok' else 503
+
+@api.route('/db/stats')
+class DbStats(Resource):
+    def get(self):
+        """Statistiques du pool de connexions SQLite du worker courant"""
+        return pool.stats(), 200
+
+@api.route('/metrics')
+class Metrics(Resource):
+    @api.produces([metrics.CONTENT_TYPE])
+    def get(self):
+        """Métriques par route et méthode au format texte Prometheus (tous les workers)"""
+        return Response(metrics.exposition(), content_type=metrics.CONTENT_TYPE)
+
 def init_db():
+    """Crée ou met à jour le schéma (migrations versionnées) ; sans effet sur une base à jour"""
     if not os.path.exists(DB_PATH):
         open(DB_PATH, 'a').close()
-    conn = sqlite3.connect(DB_PATH)
-    conn.execute(item_model_db_init)
-    conn.execute(order_model_db_init)
-    conn.execute(hanger_model_db_init)
-    conn.execute(outfit_model_db_init)
+    conn = get_db()
+    applied = migrations.migrate(conn)
+    if applied:
+        current_app.logger.info("Schéma migré en version %d", applied[-1])
+    # L'index plein texte reste hors migrations : il dépend de la présence de FTS5 dans SQLite
+    if not search.init_search_index(conn):
+        current_app.logger.warning("FTS5 indisponible : la recherche d'items utilisera LIKE")
     conn.commit()
     conn.close()
 
+def create_app():
+    """Crée l'application : point d'entrée de gunicorn (gunicorn.conf.py) et du serveur de dev"""
+    # Dossier photos accessible en static (Range et requêtes conditionnelles gérés par Flask,
+    # fichier transmis via wsgi.file_wrapper, donc sendfile sous gunicorn)
+    app = Flask(__name__, static_url_path='/photos', static_folder=PHOTOS_DIR)
+    # Derrière un nginx configuré pour, délègue l'envoi des photos via X-Sendfile
+    app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE') == '1'
+    app.after_request(photo_cache_headers)
+    metrics.instrument(app, api)
+    CORS(app, expose_headers=['X-Next-Cursor', 'Link', 'ETag'])
+    api.init_app(app)
+
+    with app.app_context():
+        init_db()
+    # Vérification au démarrage : mieux vaut refuser de démarrer que servir des 500
+    conn = get_db()
+    status = health.check(conn)
+    if status['status'] != 'ok':
+        conn.close()
+        raise RuntimeError(f"Base de données inutilisable ({DB_PATH}) : {'; '.join(status['problems'])}")
+    # Les premières lectures de tags n'attendent pas la base
+    app.logger.info("Cache des tags : %d tags préchargés", tags.warm(conn))
+    conn.close()
+    return app
+
 if __name__ == '__main__':
-    init_db()
-    app.run(debug=True, host='0.0.0.0')
+    # Serveur de développement ; en production : gunicorn -c gunicorn.conf.py
+    create_app().run(debug=os.environ.get('FLASK_DEBUG') == '1', host='0.0.0.0', threaded=True)
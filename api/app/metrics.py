@@ -0,0 +1,356 @@
+"""Métriques des requêtes de l'API, exposées au format texte Prometheus sur GET /metrics.
+
+Pour chaque route (règle Flask, ex. /items/<string:id>) et méthode : durée de la requête,
+temps passé dans SQLite, temps de sérialisation JSON, tailles du corps reçu et de la réponse.
+
+Chaque thread incrémente ses propres compteurs (pas de verrou sur le chemin des requêtes) ;
+ils ne sont additionnés qu'à la lecture. Sous gunicorn (METRICS_DIR défini par gunicorn.conf.py),
+chaque worker écrit régulièrement ses totaux dans METRICS_DIR/worker_<pid>.json et /metrics
+additionne ceux de tous les workers, y compris ceux déjà arrêtés (dead.json).
+
+    python metrics.py bench
+"""
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from flask import request
+
+import db
+
+try:
+    from gevent.monkey import get_original
+except ImportError:
+    thread_local = threading.local
+else:
+    # Worker gevent : threading.local y est propre à chaque greenlet, soit un jeu de séries par
+    # requête jamais libéré. Les séries restent par vrai thread ; les greenlets d'un même thread
+    # ne s'interrompent pas au milieu d'un incrément.
+    thread_local = get_original('threading', 'local')
+
+METRICS_DIR = os.environ.get('METRICS_DIR')
+# Intervalle d'écriture des totaux d'un worker dans METRICS_DIR (secondes)
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = {
+    'api_request_duration_seconds': ("Durée des requêtes, du routage à la réponse", DURATION_BUCKETS),
+    'api_request_db_seconds': ("Temps passé dans SQLite pendant la requête", DURATION_BUCKETS),
+    'api_request_serialization_seconds': ("Temps de sérialisation JSON de la réponse", DURATION_BUCKETS),
+    'api_request_size_bytes': ("Taille du corps des requêtes", SIZE_BUCKETS),
+    'api_response_size_bytes': ("Taille des réponses (hors flux)", SIZE_BUCKETS),
+}
+COUNTERS = {
+    'api_requests_total': "Requêtes traitées, par code de réponse",
+}
+
+# Requêtes qui ne correspondent à aucune route : une seule série, quelle que soit l'URL
+UNMATCHED_ROUTE = '<unmatched>'
+
+DEAD_FILE = 'dead.json'
+
+
+def _merge(into, series):
+    for key, values in series:
+        current = into.get(key)
+        if current is None:
+            into[key] = list(values)
+        else:
+            for i, value in enumerate(values):
+                current[i] += value
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        # Worker fusionné dans dead.json entre-temps, ou fichier en cours de remplacement
+        return None
+
+
+def _decode(series):
+    return [((name, tuple(tuple(label) for label in labels)), values) for name, labels, values in series]
+
+
+def _encode(series):
+    return [[name, labels, values] for (name, labels), values in series.items()]
+
+
+def _write_json(path, data):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class Registry:
+    """Histogrammes et compteurs du processus, répartis en un jeu de séries par thread"""
+
+    def __init__(self, directory=METRICS_DIR, flush_interval=METRICS_FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # Appelé à la création et après un fork : les séries du parent ne sont pas celles du worker
+        self._pid = os.getpid()
+        self._local = thread_local()
+        self._shards = []
+        self._flusher = None
+
+    def _shard(self):
+        try:
+            return self._local.series
+        except AttributeError:
+            pass
+        # Premier passage du thread : seul moment où le verrou est pris
+        series = self._local.series = {}
+        with self._lock:
+            self._shards.append(series)
+            if self.directory and self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+                self._flusher.start()
+        return series
+
+    def observe(self, name, labels, value):
+        series = self._shard()
+        key = (name, labels)
+        values = series.get(key)
+        if values is None:
+            # Un compte par intervalle (le dernier pour +Inf), puis la somme
+            values = series[key] = [0] * (len(HISTOGRAMS[name][1]) + 2)
+        values[bisect_left(HISTOGRAMS[name][1], value)] += 1
+        values[-1] += value
+
+    def inc(self, name, labels, amount=1):
+        series = self._shard()
+        key = (name, labels)
+        values = series.get(key)
+        if values is None:
+            values = series[key] = [0]
+        values[0] += amount
+
+    def collect(self):
+        """Totaux du processus : somme des séries de tous ses threads"""
+        with self._lock:
+            shards = list(self._shards)
+        totals = {}
+        for shard in shards:
+            # copy() est atomique sous le GIL, contrairement à une itération directe
+            _merge(totals, shard.copy().items())
+        return totals
+
+    def flush(self):
+        """Écrit les totaux du worker dans METRICS_DIR/worker_<pid>.json"""
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        _write_json(os.path.join(self.directory, f'worker_{os.getpid()}.json'),
+                    {'pid': os.getpid(), 'series': _encode(self.collect())})
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def aggregate(self):
+        """Totaux de tous les workers : ceux de ce processus en direct, les autres depuis METRICS_DIR"""
+        totals = self.collect()
+        if not self.directory:
+            return totals
+        # Les fichiers des workers avant dead.json : un worker fusionné entre les deux lectures
+        # est alors compté une seule fois (son pid figure dans dead.json)
+        workers = {}
+        for path in glob.glob(os.path.join(self.directory, 'worker_*.json')):
+            data = _read_json(path)
+            if data is not None and data['pid'] != os.getpid():
+                workers[data['pid']] = data['series']
+        dead = _read_json(os.path.join(self.directory, DEAD_FILE)) or {'pids': [], 'series': []}
+        merged = set(dead['pids'])
+        for pid, series in workers.items():
+            if pid not in merged:
+                _merge(totals, _decode(series))
+        _merge(totals, _decode(dead['series']))
+        return totals
+
+
+registry = Registry()
+
+
+def merge_dead(pid, directory=METRICS_DIR):
+    """Fusionne les totaux d'un worker arrêté dans dead.json (appelé par le maître gunicorn)"""
+    if not directory:
+        return
+    path = os.path.join(directory, f'worker_{pid}.json')
+    data = _read_json(path)
+    if data is None:
+        return
+    dead_path = os.path.join(directory, DEAD_FILE)
+    dead = _read_json(dead_path) or {'pids': [], 'series': []}
+    totals = {}
+    _merge(totals, _decode(dead['series']))
+    _merge(totals, _decode(data['series']))
+    _write_json(dead_path, {'pids': dead['pids'] + [pid], 'series': _encode(totals)})
+    os.remove(path)
+
+
+def clear(directory=METRICS_DIR):
+    """Supprime les totaux d'une exécution précédente (démarrage du maître gunicorn)"""
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        os.remove(path)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=''):
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def exposition(totals=None):
+    """Texte Prometheus (version 0.0.4) des totaux"""
+    totals = registry.aggregate() if totals is None else totals
+    by_name = {}
+    for (name, labels), values in sorted(totals.items()):
+        by_name.setdefault(name, []).append((labels, values))
+    lines = []
+    for name, help_text in COUNTERS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for labels, values in by_name.get(name, ()):
+            lines.append(f'{name}{_labels(labels)} {_number(values[0])}')
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for labels, values in by_name.get(name, ()):
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), values):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f'{name}_bucket{_labels(labels, le)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(values[-1])}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+# Mesures de la requête en cours, propres au thread qui la traite
+_current = threading.local()
+
+
+def _before_request():
+    _current.start = time.perf_counter()
+    _current.db_start = db.query_time()
+    _current.serialization = None
+
+
+def _after_request(response):
+    start = getattr(_current, 'start', None)
+    if start is None:
+        return response
+    _current.start = None
+    rule = request.url_rule
+    labels = (('route', rule.rule if rule is not None else UNMATCHED_ROUTE), ('method', request.method))
+    registry.observe('api_request_duration_seconds', labels, time.perf_counter() - start)
+    registry.observe('api_request_db_seconds', labels, db.query_time() - _current.db_start)
+    if _current.serialization is not None:
+        registry.observe('api_request_serialization_seconds', labels, _current.serialization)
+    if request.content_length:
+        registry.observe('api_request_size_bytes', labels, request.content_length)
+    # Flux (SSE) et fichiers envoyés par morceaux : taille inconnue à ce stade
+    if response.content_length is not None:
+        registry.observe('api_response_size_bytes', labels, response.content_length)
+    registry.inc('api_requests_total', labels + (('status', response.status_code),))
+    return response
+
+
+def timed_representation(output):
+    """Enveloppe une représentation flask-restx pour mesurer la sérialisation de la réponse"""
+    @wraps(output)
+    def wrapper(data, code, headers=None):
+        start = time.perf_counter()
+        try:
+            return output(data, code, headers)
+        finally:
+            _current.serialization = (getattr(_current, 'serialization', None) or 0) + time.perf_counter() - start
+    wrapper.timed = True
+    return wrapper
+
+
+def instrument(app, api):
+    """Branche les mesures sur l'application et sur les représentations de l'Api flask-restx"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    for mediatype, output in list(api.representations.items()):
+        if not getattr(output, 'timed', False):
+            api.representations[mediatype] = timed_representation(output)
+
+
+def benchmark(requests_count, threads):
+    """Coût des mesures d'une requête (5 histogrammes + 1 compteur), réparties sur plusieurs threads"""
+    bench = Registry(directory=None)
+    routes = [(('route', f'/route/{i}'), ('method', method)) for i in range(20) for method in ('GET', 'POST')]
+
+    def work():
+        for i in range(requests_count):
+            labels = routes[i % len(routes)]
+            for name in HISTOGRAMS:
+                bench.observe(name, labels, 0.003 if name.endswith('seconds') else 2000)
+            bench.inc('api_requests_total', labels + (('status', 200),))
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    total = requests_count * threads
+    count = sum(values[0] for (name, _), values in bench.collect().items() if name == 'api_requests_total')
+    assert count == total, f"{count} requêtes comptées sur {total}"
+    print(f"{total} requêtes sur {threads} threads : {elapsed / total * 1e6:.2f} µs de mesures par requête, aucun comptage perdu")
+    start = time.perf_counter()
+    text = exposition(bench.collect())
+    print(f"Exposition : {len(text.splitlines())} lignes en {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Métriques des requêtes de l'API")
+    sub = parser.add_subparsers(dest='command', required=True)
+    bench = sub.add_parser('bench', help="Mesure le coût des mesures par requête")
+    bench.add_argument('--requests', type=int, default=100000)
+    bench.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+    benchmark(args.requests, args.threads)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+from db import add_missing_columns
+from models import (
+    item_model_db_init, item_model_db_columns, item_model_db_indexes, lookup_db_indexes,
+    order_model_db_init, order_items_db_init, order_items_db_columns, hanger_model_db_init, hanger_presence_db_init,
+    outfit_model_db_init, outfit_items_db_init, table_versions_db_init, tag_association_db_init,
+    tag_version_db_init, event_db_init, reader_inventory_db_init,
+)
+from relations import migrate_json_columns
+
+logger = logging.getLogger(__name__)
+
+schema_version_db_init = '''CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TEXT NOT NULL
+)'''
+
+
+def _initial_schema(conn):
+    for statement in (item_model_db_init, order_model_db_init, hanger_model_db_init, outfit_model_db_init):
+        conn.execute(statement)
+    # Bases créées avant l'ajout des colonnes photo
+    add_missing_columns(conn, 'items', item_model_db_columns)
+
+
+def _join_tables(conn):
+    for statement in order_items_db_init + outfit_items_db_init:
+        conn.execute(statement)
+    add_missing_columns(conn, 'order_items', order_items_db_columns)
+    orders, outfits = migrate_json_columns(conn)
+    if orders or outfits:
+        logger.info("Migration JSON : %d commandes et %d tenues déplacées dans les tables de liaison", orders, outfits)
+
+
+def _hanger_presence(conn):
+    for statement in hanger_presence_db_init:
+        conn.execute(statement)
+    # DROP TABLE a emporté l'index des tags et les triggers de version des cintres
+    for statement in lookup_db_indexes + table_versions_db_init:
+        if ' ON hangers ' in statement:
+            conn.execute(statement)
+    conn.execute("UPDATE table_versions SET version = version + 1 WHERE name = 'hangers'")
+
+
+def _order_item_snapshots(conn):
+    # Les articles migrés avant cette colonne ont déjà perdu leurs champs hors colonnes
+    add_missing_columns(conn, 'order_items', order_items_db_columns)
+
+
+def _statements(statements):
+    def apply(conn):
+        for statement in statements:
+            conn.execute(statement)
+    return apply
+
+
+# Migrations dans l'ordre ; une migration publiée ne se modifie plus, on en ajoute une nouvelle.
+# Toutes sont idempotentes (IF NOT EXISTS) : une base antérieure au versionnage les rejoue sans risque.
+MIGRATIONS = [
+    (1, 'tables items, orders, hangers, outfits', _initial_schema),
+    (2, 'tables de liaison order_items et outfit_items', _join_tables),
+    (3, 'index des filtres de GET /items', _statements(item_model_db_indexes)),
+    (4, 'compteurs de versions (ETag)', _statements(table_versions_db_init)),
+    (5, 'index des tags, catégorie + couleur et date des commandes', _statements(lookup_db_indexes)),
+    (6, 'présence des cintres (last_seen, status) et tag facultatif', _hanger_presence),
+    (7, 'associations de tags en attente, partagées entre workers', _statements(tag_association_db_init)),
+    (8, "JSON d'origine des articles de commande", _order_item_snapshots),
+    (9, 'compteur de version des tags (cache des tags partagé entre workers)', _statements(tag_version_db_init)),
+    (10, "événements du flux /events, partagés entre workers", _statements(event_db_init)),
+    (11, 'inventaires des lecteurs RFID, partagés entre workers', _statements([reader_inventory_db_init])),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).fetchone()
+    if exists is None:
+        return 0
+    return conn.execute('SELECT coalesce(max(version), 0) FROM schema_version').fetchone()[0]
+
+
+def migrate(conn):
+    """Applique les migrations manquantes ; renvoie la liste des versions appliquées.
+
+    BEGIN IMMEDIATE prend le verrou d'écriture avant de lire la version : deux conteneurs
+    ou workers qui démarrent ensemble n'appliquent pas deux fois la même migration.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute(schema_version_db_init)
+        version = current_version(conn)
+        applied = []
+        for number, name, apply in MIGRATIONS:
+            if number <= version:
+                continue
+            start = time.perf_counter()
+            apply(conn)
+            conn.execute(
+                'INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)',
+                (number, name, datetime.now().isoformat() + 'Z')
+            )
+            logger.info("Migration %d appliquée (%s) en %.2f s", number, name, time.perf_counter() - start)
+            applied.append(number)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    if applied:
+        # Statistiques à jour pour que le planificateur choisisse les nouveaux index
+        conn.execute('ANALYZE')
+    else:
+        conn.execute('PRAGMA optimize')
+    conn.commit()
+    return applied
+
+
+def backup(conn, path):
+    """Copie cohérente et compactée de la base, sans bloquer les écritures (VACUUM INTO)"""
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    start = time.perf_counter()
+    conn.execute('VACUUM INTO ?', (path,))
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    from db import DB_PATH, get_db
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    parser = argparse.ArgumentParser(description="Migrations et maintenance de la base SQLite")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('status', help="Version du schéma et migrations en attente")
+    sub.add_parser('migrate', help="Applique les migrations en attente")
+    sub.add_parser('analyze', help="Recalcule les statistiques du planificateur (ANALYZE)")
+    backup_parser = sub.add_parser('backup', help="Sauvegarde à chaud avec VACUUM INTO")
+    backup_parser.add_argument('path', nargs='?', help="Fichier de destination (défaut : database-<date>.sqlite3)")
+    args = parser.parse_args()
+
+    conn = get_db()
+    if args.command == 'status':
+        version = current_version(conn)
+        print(f"{DB_PATH} : schéma en version {version} (dernière : {LATEST_VERSION})")
+        for number, name, _ in MIGRATIONS:
+            print(f"  [{'x' if number <= version else ' '}] {number} {name}")
+    elif args.command == 'migrate':
+        applied = migrate(conn)
+        print(f"Migrations appliquées : {applied}" if applied else "Schéma déjà à jour")
+    elif args.command == 'analyze':
+        conn.execute('ANALYZE')
+        conn.commit()
+        print("Statistiques recalculées")
+    else:
+        path = args.path or os.path.join(os.path.dirname(DB_PATH), f"database-{datetime.now():%Y%m%d-%H%M%S}.sqlite3")
+        try:
+            elapsed = backup(conn, path)
+        except FileExistsError:
+            sys.exit(f"{path} existe déjà")
+        print(f"Sauvegarde écrite dans {path} en {elapsed:.2f} s ({os.path.getsize(path) / 1e6:.1f} Mo)")
+    conn.close()
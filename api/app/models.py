@@ -6,7 +6,11 @@ item_model_def = {
     'category': fields.String(example="Chemises", description="Catégorie de l'article"),
     'color': fields.String(example="Bleu", description="Couleur de l'article"),
     'size': fields.String(example="L", description="Taille de l'article"),
-    'photo': fields.String(example="data:image/webp;base64,...", description="Photo encodée en base64"),
+    'photo': fields.String(example="data:image/webp;base64,...", description="Photo encodée en base64 (à l'envoi) ou URL de l'original"),
+    'photo_hash': fields.String(description="Empreinte SHA-256 de la photo originale"),
+    'photo_thumb': fields.String(example="/photos/r/ab/abcd.../thumb.webp", description="URL de la miniature WebP (160 px)"),
+    'photo_medium': fields.String(description="URL de la photo WebP moyenne (640 px)"),
+    'photo_full': fields.String(description="URL de la photo WebP pleine taille (2048 px max)"),
     'tag_id': fields.String(example="Identifiant NFC/RFID", description="Identifiant du tag NFC/RFID"),
     'hanger_id': fields.String(example="cintre-uuid", description="Identifiant du cintre associé (unique, nullable)")
 }
@@ -20,9 +24,59 @@ item_model_db_init = '''CREATE TABLE IF NOT EXISTS items (
         size TEXT,
         photo TEXT,
         tag_id TEXT,
-        hanger_id TEXT UNIQUE
+        hanger_id TEXT UNIQUE,
+        photo_hash TEXT,
+        photo_thumb TEXT,
+        photo_medium TEXT,
+        photo_full TEXT
     )'''
 
+# Colonnes ajoutées après la première version de la table, à créer sur les bases existantes
+item_model_db_columns = {
+    'photo_hash': 'TEXT',
+    'photo_thumb': 'TEXT',
+    'photo_medium': 'TEXT',
+    'photo_full': 'TEXT',
+}
+
+# Index des filtres de GET /items ; l'id en second permet la pagination par curseur sans tri
+item_model_db_indexes = [
+    'CREATE INDEX IF NOT EXISTS idx_items_category ON items (category, id)',
+    'CREATE INDEX IF NOT EXISTS idx_items_color ON items (color, id)',
+    'CREATE INDEX IF NOT EXISTS idx_items_size ON items (size, id)',
+    'CREATE INDEX IF NOT EXISTS idx_items_photo_hash ON items (photo_hash)',
+]
+
+# Index des recherches de tags (POST /tag, chemin le plus sollicité par les lecteurs),
+# des filtres combinés catégorie + couleur et du tri des commandes par date
+lookup_db_indexes = [
+    'CREATE INDEX IF NOT EXISTS idx_items_tag ON items (tag_id)',
+    'CREATE INDEX IF NOT EXISTS idx_hangers_tag ON hangers (tag_id)',
+    'CREATE INDEX IF NOT EXISTS idx_items_category_color ON items (category, color)',
+    'CREATE INDEX IF NOT EXISTS idx_orders_timestamp ON orders (timestamp)',
+]
+
+# Index plein texte (FTS5) sur le nom, la catégorie et la couleur, sans accents ("évasée" = "evasee").
+# Les triggers le tiennent à jour quelle que soit la requête qui modifie items.
+item_search_db_init = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+        name, category, color,
+        content='items', content_rowid='rowid',
+        tokenize="unicode61 remove_diacritics 2",
+        prefix='2 3'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items BEGIN
+        INSERT INTO items_fts (rowid, name, category, color) VALUES (new.rowid, new.name, new.category, new.color);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items BEGIN
+        INSERT INTO items_fts (items_fts, rowid, name, category, color) VALUES ('delete', old.rowid, old.name, old.category, old.color);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS items_fts_update AFTER UPDATE OF name, category, color ON items BEGIN
+        INSERT INTO items_fts (items_fts, rowid, name, category, color) VALUES ('delete', old.rowid, old.name, old.category, old.color);
+        INSERT INTO items_fts (rowid, name, category, color) VALUES (new.rowid, new.name, new.category, new.color);
+    END''',
+]
+
 order_model_def = {
     'id': fields.String,
     'items': fields.List(fields.Raw, example=[{ "id": "d49f25b2-865b-4368-8e45-9ca486914eaa",
@@ -42,19 +96,69 @@ order_model_db_init = '''CREATE TABLE IF NOT EXISTS orders (
         items TEXT
     )'''
 
+# Articles d'une commande : copie des champs de l'item au moment de la commande.
+# La colonne orders.items (JSON) n'est plus écrite, son contenu est migré dans cette table.
+order_item_fields = ['name', 'category', 'color', 'size', 'photo', 'photo_hash',
+                     'photo_thumb', 'photo_medium', 'photo_full', 'tag_id', 'hanger_id']
+
+order_items_db_init = [
+    '''CREATE TABLE IF NOT EXISTS order_items (
+        order_id TEXT NOT NULL REFERENCES orders (id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        item_id TEXT,
+        name TEXT,
+        category TEXT,
+        color TEXT,
+        size TEXT,
+        photo TEXT,
+        photo_hash TEXT,
+        photo_thumb TEXT,
+        photo_medium TEXT,
+        photo_full TEXT,
+        tag_id TEXT,
+        hanger_id TEXT,
+        PRIMARY KEY (order_id, position)
+    ) WITHOUT ROWID''',
+    'CREATE INDEX IF NOT EXISTS idx_order_items_item ON order_items (item_id)',
+]
+
+# JSON de l'article tel que reçu (champs hors colonnes, valeurs null, id seul) : la réponse reste celle d'origine
+order_items_db_columns = {
+    'snapshot': 'TEXT',
+}
+
 
 hanger_model_def = {
     'id': fields.String,
     'tag_id': fields.String(example="Identifiant NFC/RFID", description="Identifiant du tag NFC/RFID du cintre"),
-    'mqtt_topic': fields.String(example="topic/cintre/123", description="Nom du topic MQTT associé au cintre")
+    'mqtt_topic': fields.String(example="topic/cintre/123", description="Nom du topic MQTT associé au cintre"),
+    'last_seen': fields.String(example="2025-10-09T10:00:00Z", description="Dernière annonce MQTT du cintre (Create ou Alive)"),
+    'status': fields.String(example="online", description="online ou offline, tenu à jour par hanger/registrar.py")
 }
 
+# Schéma d'origine (migration 1) ; la migration 6 recrée la table avec hanger_presence_db_init
 hanger_model_db_init = '''CREATE TABLE IF NOT EXISTS hangers (
     id TEXT PRIMARY KEY,
     tag_id TEXT NOT NULL,
     mqtt_topic TEXT NOT NULL
 )'''
 
+# Un cintre enregistré par son annonce MQTT n'a pas encore de tag : tag_id devient facultatif.
+# SQLite ne sait pas retirer un NOT NULL, la table est recopiée.
+hanger_presence_db_init = [
+    '''CREATE TABLE hangers_presence (
+    id TEXT PRIMARY KEY,
+    tag_id TEXT,
+    mqtt_topic TEXT NOT NULL,
+    last_seen TEXT,
+    status TEXT
+)''',
+    'INSERT INTO hangers_presence (id, tag_id, mqtt_topic) SELECT id, tag_id, mqtt_topic FROM hangers',
+    'DROP TABLE hangers',
+    'ALTER TABLE hangers_presence RENAME TO hangers',
+    'CREATE INDEX IF NOT EXISTS idx_hangers_topic ON hangers (mqtt_topic)',
+]
+
 outfit_model_def = {
     'id': fields.String(description="Identifiant unique de la tenue"),
     'name': fields.String(example="Tenue décontractée", description="Nom de la tenue"),
@@ -69,4 +173,103 @@ outfit_model_db_init = '''CREATE TABLE IF NOT EXISTS outfits (
     description TEXT,
     items TEXT,
     date TEXT
-)'''
\ No newline at end of file
+)'''
+
+# Articles d'une tenue ; pas de clé étrangère vers items pour pouvoir signaler les items supprimés
+outfit_items_db_init = [
+    '''CREATE TABLE IF NOT EXISTS outfit_items (
+        outfit_id TEXT NOT NULL REFERENCES outfits (id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        item_id TEXT NOT NULL,
+        PRIMARY KEY (outfit_id, position)
+    ) WITHOUT ROWID''',
+    'CREATE INDEX IF NOT EXISTS idx_outfit_items_item ON outfit_items (item_id)',
+]
+
+# Compteur de changements par table, incrémenté par des triggers : sert d'ETag aux collections.
+# Une table de liaison incrémente le compteur de sa collection.
+versioned_tables = {
+    'items': 'items',
+    'orders': 'orders',
+    'order_items': 'orders',
+    'hangers': 'hangers',
+    'outfits': 'outfits',
+    'outfit_items': 'outfits',
+}
+
+table_versions_db_init = [
+    '''CREATE TABLE IF NOT EXISTS table_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )''',
+    # Départ aléatoire : une base recréée ne renvoie pas les ETags d'une ancienne base
+    *(f"INSERT OR IGNORE INTO table_versions (name, version) VALUES ('{name}', abs(random() % 1000000000))" for name in set(versioned_tables.values())),
+    *(
+        f'''CREATE TRIGGER IF NOT EXISTS {table}_version_{action.lower()} AFTER {action} ON {table} BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = '{name}';
+        END'''
+        for table, name in versioned_tables.items()
+        for action in ('INSERT', 'UPDATE', 'DELETE')
+    ),
+]
+
+# Compteur 'tags' : ne bouge que quand le tag d'un item ou d'un cintre change, quel que soit le
+# processus qui écrit. Le cache des tags de chaque worker le relit avant de servir une entrée.
+tag_version_db_init = [
+    "INSERT OR IGNORE INTO table_versions (name, version) VALUES ('tags', abs(random() % 1000000000))",
+    *(
+        f'''CREATE TRIGGER IF NOT EXISTS {table}_tag_version_{action.lower()} AFTER {action}{columns} ON {table}
+            WHEN {condition} BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'tags';
+        END'''
+        for table in ('items', 'hangers')
+        for action, columns, condition in (
+            ('INSERT', '', 'new.tag_id IS NOT NULL'),
+            ('UPDATE', ' OF id, tag_id', 'new.tag_id IS NOT old.tag_id OR new.id IS NOT old.id'),
+            ('DELETE', '', 'old.tag_id IS NOT NULL'),
+        )
+    ),
+]
+
+# Événements du flux /events, lus par tous les workers ; seuls les EVENT_HISTORY derniers sont gardés.
+# AUTOINCREMENT : un numéro n'est jamais réutilisé, même après la purge des plus anciens.
+event_db_init = [
+    '''CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    data TEXT NOT NULL
+)''',
+    # Départ aléatoire : une base recréée ne reprend pas les Last-Event-ID d'une ancienne base
+    "INSERT INTO sqlite_sequence (name, seq) SELECT 'events', abs(random() % 1000000000) "
+    "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'events')",
+]
+
+# Dernier tour d'inventaire de chaque lecteur RFID : items ({item_id: hanger_id}) et cintres en JSON
+reader_inventory_db_init = '''CREATE TABLE IF NOT EXISTS reader_inventories (
+    reader_id TEXT PRIMARY KEY,
+    items TEXT NOT NULL,
+    hangers TEXT NOT NULL,
+    taken_at REAL NOT NULL
+)'''
+
+# Associations de tags en attente (une seule par lecteur) et scans item/cintre en attente de leur
+# binôme : en base pour qu'un lecteur et l'attente d'un même tag puissent passer par deux workers.
+tag_association_db_init = [
+    '''CREATE TABLE IF NOT EXISTS tag_associations (
+    id TEXT PRIMARY KEY,
+    reader_id TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    tag_id TEXT,
+    created_at REAL NOT NULL,
+    resolved_at REAL
+)''',
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_tag_associations_pending ON tag_associations (reader_id) WHERE status = 'pending'",
+    '''CREATE TABLE IF NOT EXISTS tag_scans (
+    reader_id TEXT PRIMARY KEY,
+    item_id TEXT,
+    hanger_id TEXT,
+    scanned_at REAL NOT NULL
+)''',
+]
@@ -0,0 +1,230 @@
+import base64
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from db import get_db, run_native
+from events import publish
+
+logger = logging.getLogger(__name__)
+
+PHOTOS_DIR = os.path.join(os.path.dirname(__file__), '..', 'photos')
+PHOTOS_URL = '/photos'
+
+CHUNK_SIZE = 64 * 1024
+PHOTO_MAX_BYTES = int(os.environ.get('PHOTO_MAX_BYTES', 20 * 1024 * 1024))
+PHOTO_WORKERS = int(os.environ.get('PHOTO_WORKERS', 2))
+
+# Déclinaisons WebP générées pour chaque photo : nom -> (côté max en px, qualité)
+RENDITIONS = {
+    'thumb': (160, 70),
+    'medium': (640, 80),
+    'full': (2048, 85),
+}
+
+EXTENSIONS = {
+    'image/jpeg': 'jpeg',
+    'image/jpg': 'jpeg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'image/gif': 'gif',
+}
+
+
+class PhotoError(ValueError):
+    pass
+
+
+def _original_path(digest, ext):
+    return os.path.join(PHOTOS_DIR, 'originals', digest[:2], f'{digest}.{ext}')
+
+
+def _rendition_path(digest, name):
+    return os.path.join(PHOTOS_DIR, 'r', digest[:2], digest, f'{name}.webp')
+
+
+def rendition_urls(digest):
+    """URLs des déclinaisons d'une photo ; le hash dans le chemin les rend immuables"""
+    return {
+        f'photo_{name}': f'{PHOTOS_URL}/r/{digest[:2]}/{digest}/{name}.webp'
+        for name in RENDITIONS
+    }
+
+
+def renditions_ready(digest):
+    return all(os.path.exists(_rendition_path(digest, name)) for name in RENDITIONS)
+
+
+def extension_for(content_type, filename=None):
+    if content_type:
+        ext = EXTENSIONS.get(content_type.split(';')[0].strip().lower())
+        if ext:
+            return ext
+    if filename and '.' in filename:
+        ext = filename.rsplit('.', 1)[1].lower()
+        if ext in EXTENSIONS.values() or ext == 'jpg':
+            return 'jpeg' if ext == 'jpg' else ext
+    raise PhotoError(f"Unsupported image type: {content_type or filename}")
+
+
+def store_stream(stream, ext):
+    """Écrit un flux sur disque par blocs en le hachant ; renvoie (hash, url de l'original).
+
+    Les originaux sont adressés par leur contenu : une photo déjà connue n'est pas réécrite.
+    """
+    tmp_dir = os.path.join(PHOTOS_DIR, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    sha = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > PHOTO_MAX_BYTES:
+                    raise PhotoError(f"Photo larger than {PHOTO_MAX_BYTES} bytes")
+                sha.update(chunk)
+                f.write(chunk)
+        if size == 0:
+            raise PhotoError("Empty photo")
+        try:
+            with Image.open(tmp_path) as image:
+                image.verify()
+        except (UnidentifiedImageError, OSError, SyntaxError):
+            raise PhotoError("Invalid image")
+        digest = sha.hexdigest()
+        path = _original_path(digest, ext)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return digest, f'{PHOTOS_URL}/originals/{digest[:2]}/{digest}.{ext}'
+
+
+def store_bytes(data, ext):
+    return store_stream(io.BytesIO(data), ext)
+
+
+def _render(digest, source):
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+        for name, (max_side, quality) in RENDITIONS.items():
+            path = _rendition_path(digest, name)
+            if os.path.exists(path):
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            rendition = image.copy()
+            rendition.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+            # Écriture atomique : une URL publiée ne pointe jamais vers un fichier partiel
+            tmp_path = f'{path}.tmp'
+            rendition.save(tmp_path, 'WEBP', quality=quality, method=4)
+            os.replace(tmp_path, path)
+
+
+def _attach(digest):
+    """Renseigne les URLs des déclinaisons sur tous les items qui utilisent cette photo"""
+    urls = rendition_urls(digest)
+    conn = get_db()
+    conn.execute(
+        'UPDATE items SET photo_thumb = ?, photo_medium = ?, photo_full = ? WHERE photo_hash = ?',
+        (urls['photo_thumb'], urls['photo_medium'], urls['photo_full'], digest)
+    )
+    rows = conn.execute('SELECT * FROM items WHERE photo_hash = ?', (digest,)).fetchall()
+    conn.commit()
+    conn.close()
+    for row in rows:
+        publish('item_updated', item=dict(row))
+
+
+class RenditionWorker:
+    """Pool de threads de fond qui génère les déclinaisons, une seule fois par photo"""
+
+    def __init__(self, workers=PHOTO_WORKERS):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+        self._inflight = {}
+
+    def _get_executor(self):
+        # Créé à la demande : les threads ne survivent pas au fork des workers gunicorn
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='photos')
+            self._inflight = {}
+        return self._executor
+
+    def submit(self, digest, source):
+        with self._lock:
+            future = self._inflight.get(digest)
+            if future is not None:
+                return future
+            future = self._get_executor().submit(self._run, digest, source)
+            self._inflight[digest] = future
+            return future
+
+    def _run(self, digest, source):
+        try:
+            run_native(_render, digest, source)
+            _attach(digest)
+        except Exception:
+            logger.exception("Échec de la génération des déclinaisons de %s", digest)
+        finally:
+            with self._lock:
+                self._inflight.pop(digest, None)
+
+    def pending(self):
+        with self._lock:
+            return len(self._inflight)
+
+
+worker = RenditionWorker()
+
+
+def ingest(stream, content_type=None, filename=None):
+    """Stocke une photo ; renvoie les colonnes photo de l'item (déclinaisons à lancer avec schedule())"""
+    ext = extension_for(content_type, filename)
+    digest, url = store_stream(stream, ext)
+    return photo_columns(digest, url)
+
+
+def photo_columns(digest, url):
+    columns = {'photo': url, 'photo_hash': digest}
+    if renditions_ready(digest):
+        columns.update(rendition_urls(digest))
+    else:
+        columns.update({f'photo_{name}': None for name in RENDITIONS})
+    return columns
+
+
+def schedule(columns):
+    """À appeler après le commit de l'item : génère les déclinaisons manquantes en tâche de fond"""
+    digest = columns.get('photo_hash')
+    if digest and columns.get('photo_thumb') is None:
+        source = os.path.join(PHOTOS_DIR, os.path.relpath(columns['photo'], PHOTOS_URL))
+        worker.submit(digest, source)
+
+
+def ingest_data_url(data_url):
+    """Photo envoyée en data URL base64 (ancien format JSON)"""
+    header, encoded = data_url.split(',', 1)
+    content_type = header[len('data:'):].split(';')[0]
+    ext = extension_for(content_type)
+    digest, url = store_bytes(base64.b64decode(encoded), ext)
+    return photo_columns(digest, url)
@@ -0,0 +1,143 @@
+import json
+from itertools import groupby
+
+from models import order_item_fields
+
+ORDER_ITEM_COLUMNS = ['item_id', *order_item_fields, 'snapshot']
+
+
+def _order_item_row(order_id, position, item):
+    snapshot = json.dumps(item)
+    # Les anciennes commandes peuvent ne contenir que des ids
+    if not isinstance(item, dict):
+        item = {'id': item}
+    return (order_id, position, item.get('id'), *(item.get(field) for field in order_item_fields), snapshot)
+
+
+def save_orders_items(conn, orders, replace=True):
+    """Enregistre les articles de plusieurs commandes [(order_id, items)] en quelques requêtes"""
+    order_ids = [order_id for order_id, _ in orders]
+    if replace:
+        conn.executemany('DELETE FROM order_items WHERE order_id = ?', [(order_id,) for order_id in order_ids])
+    placeholders = ', '.join('?' * (len(ORDER_ITEM_COLUMNS) + 2))
+    conn.executemany(
+        f"INSERT INTO order_items (order_id, position, {', '.join(ORDER_ITEM_COLUMNS)}) VALUES ({placeholders})",
+        [
+            _order_item_row(order_id, position, item)
+            for order_id, items in orders
+            for position, item in enumerate(items)
+        ]
+    )
+    # Un article réduit à son id est complété depuis la table items (UPDATE ... FROM : SQLite >= 3.33)
+    conn.execute(
+        f'''UPDATE order_items SET {', '.join(f'{field} = items.{field}' for field in order_item_fields)}
+            FROM items
+            WHERE order_items.order_id IN (SELECT value FROM json_each(?))
+              AND order_items.name IS NULL AND items.id = order_items.item_id''',
+        (json.dumps(order_ids),)
+    )
+
+
+def save_outfit_items(conn, outfit_id, item_ids):
+    """Remplace les articles d'une tenue (dans la transaction en cours)"""
+    conn.execute('DELETE FROM outfit_items WHERE outfit_id = ?', (outfit_id,))
+    conn.executemany(
+        'INSERT INTO outfit_items (outfit_id, position, item_id) VALUES (?, ?, ?)',
+        [(outfit_id, position, item_id) for position, item_id in enumerate(item_ids)]
+    )
+
+
+def _order_item(row):
+    """Article tel qu'envoyé, complété des champs copiés depuis items"""
+    if row['snapshot'] is None:
+        item = {'id': row['item_id']}
+    else:
+        item = json.loads(row['snapshot'])
+        # Id seul : rendu tel quel, comme avant la table de liaison
+        if not isinstance(item, dict):
+            return item
+    for field in order_item_fields:
+        if field not in item and row[field] is not None:
+            item[field] = row[field]
+    return item
+
+
+def load_orders(conn, where='', params=()):
+    """Commandes avec leurs articles, de la plus récente à la plus ancienne, en une seule requête"""
+    cur = conn.execute(
+        f'''SELECT orders.id, orders.timestamp, orders.status, order_items.position,
+                   {', '.join(f'order_items.{column}' for column in ORDER_ITEM_COLUMNS)}
+            FROM orders LEFT JOIN order_items ON order_items.order_id = orders.id
+            {where}
+            ORDER BY orders.timestamp DESC, orders.id, order_items.position''',
+        params
+    )
+    orders = []
+    for _, rows in groupby(cur, key=lambda row: row['id']):
+        rows = list(rows)
+        orders.append({
+            'id': rows[0]['id'],
+            'timestamp': rows[0]['timestamp'],
+            'status': rows[0]['status'],
+            'items': [_order_item(row) for row in rows if row['position'] is not None],
+        })
+    return orders
+
+
+def load_outfits(conn, where='', params=(), item_columns=None):
+    """Tenues avec leurs articles, dans l'ordre de création, en une seule requête.
+
+    Sans item_columns, items est la liste des ids. Avec, chaque article est résolu par
+    jointure sur items (colonnes projetées) et les ids sans item sont listés dans missing_items.
+    """
+    expand = item_columns is not None
+    joined = ''
+    if expand:
+        joined = ''.join(f', items.{column} AS item_{column}' for column in item_columns)
+        joined += ', items.id IS NOT NULL AS item_found'
+    cur = conn.execute(
+        f'''SELECT outfits.rowid AS outfit_rowid, outfits.id, outfits.name, outfits.description, outfits.date,
+                   outfit_items.position, outfit_items.item_id{joined}
+            FROM outfits LEFT JOIN outfit_items ON outfit_items.outfit_id = outfits.id
+            {'LEFT JOIN items ON items.id = outfit_items.item_id' if expand else ''}
+            {where}
+            ORDER BY outfits.rowid, outfit_items.position''',
+        params
+    )
+    outfits = []
+    for _, rows in groupby(cur, key=lambda row: row['outfit_rowid']):
+        rows = list(rows)
+        outfit = {
+            'id': rows[0]['id'],
+            'name': rows[0]['name'],
+            'description': rows[0]['description'],
+            'date': rows[0]['date'],
+        }
+        members = [row for row in rows if row['position'] is not None]
+        if expand:
+            outfit['items'] = [
+                {column: row[f'item_{column}'] for column in item_columns}
+                for row in members if row['item_found']
+            ]
+            outfit['missing_items'] = [row['item_id'] for row in members if not row['item_found']]
+        else:
+            outfit['items'] = [row['item_id'] for row in members]
+        outfits.append(outfit)
+    return outfits
+
+
+def migrate_json_columns(conn):
+    """Déplace le JSON de orders.items et outfits.items dans les tables de liaison.
+
+    Les lignes migrées passent à items = NULL : la migration peut être relancée sans doublon.
+    """
+    orders = conn.execute('SELECT id, items FROM orders WHERE items IS NOT NULL').fetchall()
+    if orders:
+        save_orders_items(conn, [(order['id'], json.loads(order['items'] or '[]')) for order in orders])
+    conn.execute('UPDATE orders SET items = NULL WHERE items IS NOT NULL')
+
+    outfits = conn.execute('SELECT id, items FROM outfits WHERE items IS NOT NULL').fetchall()
+    for outfit in outfits:
+        save_outfit_items(conn, outfit['id'], json.loads(outfit['items'] or '[]'))
+    conn.execute('UPDATE outfits SET items = NULL WHERE items IS NOT NULL')
+    return len(orders), len(outfits)
@@ -0,0 +1,28 @@
+"""Dépôts de données : la même interface (base.py) sur SQLite et sur DynamoDB.
+
+    repo = open_repository()              # STORAGE_BACKEND : sqlite (défaut) ou dynamodb
+    repo.items.put_many(records)
+    page = repo.orders.page(limit=50, cursor=previous.cursor)
+
+Les implémentations sont importées à la demande : la Lambda n'embarque ni db.py ni relations.py,
+et l'API n'a besoin de boto3 que pour STORAGE_BACKEND=dynamodb.
+"""
+import os
+
+from .base import (
+    FIELDS, PAGE_DEFAULT, PAGE_MAX, Collection, InvalidCursor, Page, Repository, RepositoryError, new_id,
+)
+
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'sqlite')
+BACKENDS = ('sqlite', 'dynamodb')
+
+
+def open_repository(backend=None, **options):
+    backend = backend or STORAGE_BACKEND
+    if backend == 'sqlite':
+        from .sqlite import SQLiteRepository
+        return SQLiteRepository(**options)
+    if backend == 'dynamodb':
+        from .dynamodb import DynamoRepository
+        return DynamoRepository(**options)
+    raise RepositoryError(f"Unknown storage backend {backend!r} (expected one of {', '.join(BACKENDS)})")
@@ -0,0 +1,172 @@
+"""Interface commune des dépôts : items, commandes, cintres et tenues, quel que soit le stockage.
+
+Chaque collection sait lire, écrire et supprimer par lots, et se parcourir par pages. Le curseur
+d'une page est opaque : il ne se lit ni ne se construit côté client, il se renvoie tel quel.
+Ce module ne dépend ni de Flask ni de boto3 : il est aussi embarqué dans la Lambda.
+"""
+import base64
+import json
+import uuid
+from collections import namedtuple
+
+PAGE_DEFAULT = 100
+PAGE_MAX = 1000
+
+ITEM_FIELDS = ('id', 'name', 'category', 'color', 'size', 'photo', 'photo_hash', 'photo_thumb',
+               'photo_medium', 'photo_full', 'tag_id', 'hanger_id')
+ORDER_FIELDS = ('id', 'timestamp', 'status', 'items')
+HANGER_FIELDS = ('id', 'tag_id', 'mqtt_topic', 'last_seen', 'status')
+OUTFIT_FIELDS = ('id', 'name', 'description', 'date', 'items')
+
+FIELDS = {
+    'items': ITEM_FIELDS,
+    'orders': ORDER_FIELDS,
+    'hangers': HANGER_FIELDS,
+    'outfits': OUTFIT_FIELDS,
+}
+
+# Préfixe des ids générés : le même pour l'API Flask et la Lambda
+ID_PREFIXES = {
+    'items': 'item',
+    'orders': 'order',
+    'hangers': 'hanger',
+    'outfits': 'outfit',
+}
+
+Page = namedtuple('Page', ['records', 'cursor'])
+
+
+class RepositoryError(Exception):
+    pass
+
+
+class InvalidCursor(RepositoryError, ValueError):
+    pass
+
+
+def new_id(collection):
+    return f'{ID_PREFIXES[collection]}_{uuid.uuid4()}'
+
+
+def encode_cursor(position):
+    """Curseur opaque (base64 url) d'une position de parcours propre au stockage"""
+    if position is None:
+        return None
+    raw = json.dumps(position, separators=(',', ':'), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        position = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+    if not isinstance(position, dict):
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+    return position
+
+
+def page_limit(limit):
+    return PAGE_DEFAULT if limit is None else max(1, min(int(limit), PAGE_MAX))
+
+
+def normalize(collection, record):
+    """Enregistrement réduit aux champs de la collection, champs absents à None"""
+    if not isinstance(record, dict) or not record.get('id'):
+        raise RepositoryError(f"{collection}: record without id")
+    normalized = {field: record.get(field) for field in FIELDS[collection]}
+    if collection == 'orders':
+        normalized['items'] = [order_item(item) for item in normalized['items'] or []]
+    elif collection == 'outfits':
+        normalized['items'] = list(normalized['items'] or [])
+    return normalized
+
+
+def order_item(item):
+    """Article d'une commande tel qu'envoyé : champs null compris, ou id seul pour les anciennes commandes"""
+    return dict(item) if isinstance(item, dict) else item
+
+
+def unique_ids(ids):
+    return list(dict.fromkeys(ids))
+
+
+class Collection:
+    """Une collection d'enregistrements identifiés par leur id"""
+
+    name = None
+
+    def get(self, id):
+        return self.get_many([id]).get(id)
+
+    def get_many(self, ids):
+        """Enregistrements trouvés, par id (les ids inconnus sont absents du résultat)"""
+        raise NotImplementedError
+
+    def put(self, record):
+        self.put_many([record])
+
+    def put_many(self, records):
+        """Crée ou remplace les enregistrements (en entier)"""
+        raise NotImplementedError
+
+    def update(self, id, changes):
+        """Modifie quelques champs ; renvoie l'enregistrement à jour, ou None s'il n'existe pas"""
+        raise NotImplementedError
+
+    def delete(self, id):
+        self.delete_many([id])
+
+    def delete_many(self, ids):
+        raise NotImplementedError
+
+    def page(self, limit=None, cursor=None):
+        """Une page d'enregistrements et le curseur de la suivante (None à la fin)"""
+        raise NotImplementedError
+
+    def scan(self, page_size=PAGE_MAX):
+        """Tous les enregistrements, page par page"""
+        cursor = None
+        while True:
+            page = self.page(page_size, cursor)
+            yield from page.records
+            cursor = page.cursor
+            if cursor is None:
+                return
+
+    def export(self, segments=None):
+        """Tous les enregistrements (export complet), lus en parallèle si le stockage le permet"""
+        return list(self.scan())
+
+    def latest(self, limit=None, cursor=None):
+        """Page d'enregistrements du plus récent au plus ancien (commandes : par timestamp, celles sans timestamp exclues)"""
+        raise NotImplementedError(f"{self.name}: no time ordering")
+
+    def _changes(self, changes):
+        unknown = [field for field in changes if field not in FIELDS[self.name] or field == 'id']
+        if unknown:
+            raise RepositoryError(f"{self.name}: unknown or read-only fields {', '.join(unknown)}")
+        return changes
+
+
+class Repository:
+    """Les quatre collections d'un même stockage"""
+
+    backend = None
+
+    def __init__(self, items, orders, hangers, outfits):
+        self.items = items
+        self.orders = orders
+        self.hangers = hangers
+        self.outfits = outfits
+
+    def collection(self, name):
+        if name not in FIELDS:
+            raise RepositoryError(f"Unknown collection {name!r}")
+        return getattr(self, name)
+
+    def close(self):
+        pass
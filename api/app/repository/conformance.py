@@ -0,0 +1,282 @@
+"""Conformité et débit des dépôts : les mêmes vérifications sur chaque stockage.
+
+    cd api/app
+    python -m repository.conformance                                   # SQLite et DynamoDB (moto)
+    python -m repository.conformance --backend sqlite --records 20000
+    python -m repository.conformance --backend dynamodb --endpoint-url http://localhost:8000   # DynamoDB Local
+
+SQLite tourne sur une base temporaire migrée. DynamoDB tourne sur moto (pip install "moto[dynamodb]"),
+ou sur DynamoDB Local avec --endpoint-url (tables temporaires, supprimées à la fin).
+Les débits mesurés sur moto ne disent rien d'AWS : ils servent à comparer deux versions du code.
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+from . import BACKENDS, InvalidCursor, RepositoryError, open_repository
+from .base import normalize
+
+
+def sample_item(id, i=0):
+    return {'id': id, 'name': f'Jupe évasée {i}', 'category': 'Jupes', 'color': 'Rouge', 'size': 'M',
+            'photo': f'/photos/{id}.jpg', 'tag_id': f'tag-{id}'}
+
+
+def sample_order(id, item_ids):
+    return {'id': id, 'timestamp': '2025-10-09T10:00:00Z', 'status': 'En cours',
+            'items': [{'id': item_id, 'name': f'Article {item_id}', 'size': 'M'} for item_id in item_ids]}
+
+
+def check_roundtrip(repo, prefix):
+    records = {
+        'items': sample_item(f'{prefix}_item'),
+        'orders': sample_order(f'{prefix}_order', [f'{prefix}_a', f'{prefix}_b']),
+        'hangers': {'id': f'{prefix}_hanger', 'tag_id': 'tag-h', 'mqtt_topic': f'hanger_{prefix}/leds', 'status': 'online'},
+        'outfits': {'id': f'{prefix}_outfit', 'name': 'Tenue', 'description': 'Été', 'date': '2025-10-01',
+                    'items': [f'{prefix}_b', f'{prefix}_a', f'{prefix}_c']},
+    }
+    for collection, record in records.items():
+        repo.collection(collection).put(record)
+        stored = repo.collection(collection).get(record['id'])
+        assert stored == normalize(collection, record), f"{collection} : {stored!r}"
+        assert repo.collection(collection).get(f'{prefix}_unknown') is None, f"{collection} : id inconnu trouvé"
+    return "un enregistrement par collection, relu à l'identique (articles de commande et ordre des tenues compris)"
+
+
+def check_batches(repo, prefix):
+    records = [sample_item(f'{prefix}_{i:04d}', i) for i in range(250)]
+    repo.items.put_many(records)
+    ids = [record['id'] for record in records]
+    # Doublons et ids inconnus dans la demande
+    found = repo.items.get_many(ids + ids[:10] + [f'{prefix}_missing_{i}' for i in range(10)])
+    assert len(found) == 250, f"{len(found)} items relus sur 250"
+    assert found[ids[123]] == normalize('items', records[123])
+    assert repo.items.get_many([]) == {}
+    return "250 items écrits et relus par lots (au-delà de 25 et 100 par appel), doublons et ids inconnus ignorés"
+
+
+def check_upsert(repo, prefix):
+    id = f'{prefix}_item'
+    repo.items.put(sample_item(id))
+    repo.items.put({'id': id, 'name': 'Remplacé'})
+    stored = repo.items.get(id)
+    assert stored['name'] == 'Remplacé' and stored['category'] is None, f"remplacement partiel : {stored!r}"
+    # Même id deux fois dans un lot : la dernière version gagne
+    repo.items.put_many([{'id': id, 'name': 'v1'}, {'id': id, 'name': 'v2'}])
+    assert repo.items.get(id)['name'] == 'v2'
+    return "put remplace l'enregistrement entier, la dernière version d'un lot gagne"
+
+
+def check_update(repo, prefix):
+    id = f'{prefix}_item'
+    repo.items.put(sample_item(id))
+    updated = repo.items.update(id, {'name': 'Nouveau nom', 'photo': None})
+    assert updated['name'] == 'Nouveau nom' and updated['photo'] is None and updated['color'] == 'Rouge', repr(updated)
+    assert repo.items.get(id) == updated
+    assert repo.items.update(f'{prefix}_unknown', {'name': 'x'}) is None, "update d'un id inconnu"
+    order_id = f'{prefix}_order'
+    repo.orders.put(sample_order(order_id, ['a', 'b']))
+    order = repo.orders.update(order_id, {'status': 'Livrée', 'items': [{'id': 'c', 'name': 'C'}]})
+    assert order['status'] == 'Livrée' and order['items'] == [{'id': 'c', 'name': 'C'}], repr(order)
+    try:
+        repo.items.update(id, {'unknown_field': 1})
+    except RepositoryError:
+        pass
+    else:
+        raise AssertionError("champ inconnu accepté")
+    return "update partiel (valeur None comprise), id inconnu, articles d'une commande"
+
+
+def check_pagination(repo, prefix):
+    ids = {f'{prefix}_{i:03d}' for i in range(53)}
+    repo.hangers.put_many([{'id': id, 'mqtt_topic': f'{id}/leds'} for id in ids])
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        page = repo.hangers.page(limit=7, cursor=cursor)
+        assert len(page.records) <= 7, f"page de {len(page.records)}"
+        assert page.cursor is None or isinstance(page.cursor, str)
+        seen.extend(record['id'] for record in page.records)
+        pages += 1
+        cursor = page.cursor
+        if cursor is None:
+            break
+        assert pages < 1000, "pagination sans fin"
+    mine = [id for id in seen if id.startswith(prefix)]
+    assert len(mine) == len(set(mine)), "enregistrements répétés entre les pages"
+    assert set(mine) == ids, f"{len(ids - set(mine))} enregistrements jamais renvoyés"
+    assert len(list(repo.hangers.scan(page_size=10))) == len(seen)
+    try:
+        repo.hangers.page(cursor='pas-un-curseur')
+    except InvalidCursor:
+        pass
+    else:
+        raise AssertionError("curseur invalide accepté")
+    return f"53 cintres en {pages} pages de 7, sans doublon ni oubli ; curseur invalide refusé"
+
+
+def check_delete(repo, prefix):
+    ids = [f'{prefix}_{i:03d}' for i in range(60)]
+    repo.items.put_many([sample_item(id) for id in ids])
+    repo.items.delete_many(ids[:40] + [f'{prefix}_unknown'])
+    assert set(repo.items.get_many(ids)) == set(ids[40:])
+    repo.orders.put(sample_order(f'{prefix}_order', ids[:2]))
+    repo.orders.delete(f'{prefix}_order')
+    assert repo.orders.get(f'{prefix}_order') is None
+    return "suppression par lot (id inconnu ignoré), commande supprimée avec ses articles"
+
+
+def check_latest(repo, prefix):
+    # Timestamps dans le futur : les commandes du test passent avant celles des autres vérifications
+    orders = [dict(sample_order(f'{prefix}_{i:03d}', ['a']), timestamp=f'2999-01-01T00:00:{i % 30:02d}.{i:03d}Z')
+              for i in range(45)]
+    repo.orders.put_many(orders + [dict(sample_order(f'{prefix}_undated', ['a']), timestamp=None)])
+    repo.orders.update(orders[0]['id'], {'timestamp': None})
+    expected = [order['id'] for order in sorted(orders[1:], key=lambda order: order['timestamp'], reverse=True)]
+    seen = []
+    cursor = None
+    while True:
+        page = repo.orders.latest(limit=10, cursor=cursor)
+        assert len(page.records) <= 10, f"page de {len(page.records)}"
+        seen.extend(page.records)
+        cursor = page.cursor
+        if cursor is None:
+            break
+    timestamps = [order['timestamp'] for order in seen]
+    assert timestamps == sorted(timestamps, reverse=True), "commandes hors de l'ordre chronologique inverse"
+    mine = [order['id'] for order in seen if order['id'].startswith(prefix)]
+    assert mine == expected, f"{len(mine)} commandes renvoyées, {len(expected)} attendues"
+    return "45 commandes de la plus récente à la plus ancienne, par pages de 10 ; sans timestamp : exclues"
+
+
+def check_export(repo, prefix):
+    ids = {f'{prefix}_{i:04d}' for i in range(300)}
+    repo.items.put_many([sample_item(id) for id in ids])
+    exported = repo.items.export(segments=4)
+    mine = [record['id'] for record in exported if record['id'].startswith(prefix)]
+    assert len(mine) == len(set(mine)), "enregistrements exportés deux fois"
+    assert set(mine) == ids, f"{len(ids - set(mine))} enregistrements absents de l'export"
+    assert len(exported) == len(list(repo.items.scan())), "export et scan diffèrent"
+    return "300 items exportés en 4 segments, sans doublon ni oubli"
+
+
+def check_order_items(repo, prefix):
+    order = {'id': f'{prefix}_order', 'timestamp': '2025-10-09T10:00:00Z', 'status': 'En cours',
+             'items': [{'id': f'{prefix}_a', 'name': 'Jupe', 'color': None, 'price': 12.5}, f'{prefix}_b']}
+    repo.orders.put(order)
+    stored = repo.orders.get(order['id'])
+    assert stored['items'] == order['items'], repr(stored['items'])
+    return "articles de commande relus tels qu'envoyés : champ null, champ hors schéma, id seul"
+
+
+CHECKS = (check_roundtrip, check_batches, check_upsert, check_update, check_pagination, check_delete,
+          check_latest, check_export, check_order_items)
+
+
+def throughput(repo, count, page_size):
+    """Débits (enregistrements/s) des opérations par lot, et d'une lecture unitaire pour comparaison"""
+    prefix = f'bench_{uuid.uuid4().hex[:8]}'
+    records = [sample_item(f'{prefix}_{i:07d}', i) for i in range(count)]
+    ids = [record['id'] for record in records]
+    results = []
+
+    def timed(label, operation, volume):
+        start = time.perf_counter()
+        operation()
+        elapsed = time.perf_counter() - start
+        results.append((label, volume, elapsed))
+
+    timed('put_many', lambda: repo.items.put_many(records), count)
+    timed('get_many', lambda: repo.items.get_many(ids), count)
+    single = ids[:min(count, 200)]
+    timed('get (un par un)', lambda: [repo.items.get(id) for id in single], len(single))
+    timed(f'pages de {page_size}', lambda: sum(1 for _ in repo.items.scan(page_size)), count)
+    timed('export', lambda: repo.items.export(), count)
+    timed('delete_many', lambda: repo.items.delete_many(ids), count)
+    return results
+
+
+@contextlib.contextmanager
+def sqlite_repository():
+    import migrations
+    from db import ConnectionPool
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(path=os.path.join(tmp, 'conformance.sqlite3'))
+        conn = pool.acquire()
+        migrations.migrate(conn)
+        conn.close()
+        try:
+            yield open_repository('sqlite', connect=pool.acquire)
+        finally:
+            pool.close_all()
+
+
+@contextlib.contextmanager
+def dynamodb_repository(endpoint_url=None):
+    # Identifiants factices : ni moto ni DynamoDB Local ne les vérifient
+    for name, value in (('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'),
+                        ('AWS_DEFAULT_REGION', 'eu-west-1')):
+        os.environ.setdefault(name, value)
+    if endpoint_url:
+        mock = contextlib.nullcontext()
+    else:
+        try:
+            from moto import mock_aws
+        except ImportError:
+            raise RuntimeError('moto introuvable : pip install "moto[dynamodb]", ou --endpoint-url vers DynamoDB Local')
+        mock = mock_aws()
+    prefix = f'conformance-{uuid.uuid4().hex[:8]}'
+    from .dynamodb import table_names
+    with mock:
+        repo = open_repository('dynamodb', tables=table_names(prefix), endpoint_url=endpoint_url, consistent_read=True)
+        repo.create_tables()
+        try:
+            yield repo
+        finally:
+            repo.drop_tables()
+
+
+def run(backend, args):
+    factory = sqlite_repository() if backend == 'sqlite' else dynamodb_repository(args.endpoint_url)
+    failures = 0
+    print(f"== {backend}")
+    with factory as repo:
+        for check in CHECKS:
+            prefix = f'{check.__name__}_{uuid.uuid4().hex[:6]}'
+            try:
+                print(f"OK    {check.__name__} : {check(repo, prefix)}")
+            except AssertionError as e:
+                failures += 1
+                print(f"ECHEC {check.__name__} : {e}")
+        if args.records:
+            for label, volume, elapsed in throughput(repo, args.records, args.page_size):
+                print(f"      {label:<18} {volume:>7} en {elapsed:7.3f} s  {volume / elapsed:>10.0f} enregistrements/s")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conformité et débit des dépôts SQLite et DynamoDB")
+    parser.add_argument('--backend', choices=BACKENDS + ('all',), default='all')
+    parser.add_argument('--records', type=int, default=5000, help="Enregistrements du test de débit (0 : pas de mesure)")
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--endpoint-url', help="DynamoDB Local (ex. http://localhost:8000) au lieu de moto")
+    args = parser.parse_args()
+
+    failures = 0
+    for backend in BACKENDS if args.backend == 'all' else (args.backend,):
+        try:
+            failures += run(backend, args)
+        except RuntimeError as e:
+            failures += 1
+            print(f"ECHEC {backend} : {e}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+"""Dépôt DynamoDB : une table par collection, clé de partition id (tables de aws-iac/main.tf).
+
+Lectures par ids en BatchGetItem (100 clés par appel), écritures et suppressions via batch_writer
+(25 par BatchWriteItem) ; les clés non traitées sont renvoyées jusqu'à épuisement. Les pages sont
+des Scan bornés par Limit, le curseur porte LastEvaluatedKey. Un export complet lit la table en
+DYNAMODB_SCAN_SEGMENTS segments parallèles. Les commandes récentes viennent de l'index secondaire
+orders_by_timestamp (Query triée, sans Scan ni tri en mémoire).
+
+    DYNAMODB_ENDPOINT_URL=http://localhost:8000 STORAGE_BACKEND=dynamodb ...   # DynamoDB Local
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import boto3
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from .base import (
+    FIELDS, Collection, Page, Repository, decode_cursor, encode_cursor, normalize, page_limit, unique_ids,
+)
+
+# Tables nommées comme dans Terraform : <project_name>-items, <project_name>-orders...
+DYNAMODB_TABLE_PREFIX = os.environ.get('DYNAMODB_TABLE_PREFIX', 'le-projet-de-laurianne')
+DYNAMODB_ENDPOINT_URL = os.environ.get('DYNAMODB_ENDPOINT_URL') or None
+
+BATCH_GET_MAX = 100
+# Nouvelles tentatives des clés non traitées par BatchGetItem (limitation de débit)
+BATCH_RETRIES = 8
+# Scan parallèle des exports ; le pool de connexions du client doit en accepter autant
+DYNAMODB_SCAN_SEGMENTS = int(os.environ.get('DYNAMODB_SCAN_SEGMENTS', 4))
+
+# Index des commandes par date : toutes partagent la même partition (kind = 'order'), triée par timestamp.
+# Une seule partition suffit au volume de commandes d'une boutique (limite : ~1000 écritures/s).
+ORDERS_INDEX = 'orders_by_timestamp'
+ORDERS_INDEX_KEY = 'kind'
+ORDERS_INDEX_VALUE = 'order'
+# Index creux des items par photo (photo_hash) : les photos adressées par contenu peuvent être partagées
+ITEMS_PHOTO_INDEX = 'items_by_photo_hash'
+
+
+def table_names(prefix=DYNAMODB_TABLE_PREFIX):
+    """Nom de la table de chaque collection ; DYNAMODB_<COLLECTION>_TABLE remplace le nom par défaut"""
+    return {name: os.environ.get(f'DYNAMODB_{name.upper()}_TABLE', f'{prefix}-{name}') for name in FIELDS}
+
+
+def to_dynamo(value, nested=False):
+    """Valeur enregistrable : floats en Decimal, attributs None omis (gardés dans les articles de commande)"""
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {key: to_dynamo(item, True) for key, item in value.items() if nested or item is not None}
+    if isinstance(value, list):
+        return [to_dynamo(item, True) for item in value]
+    return value
+
+
+def from_dynamo(value):
+    """Valeur lue : Decimal en int ou float (sérialisable en JSON)"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, dict):
+        return {key: from_dynamo(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [from_dynamo(item) for item in value]
+    return value
+
+
+class DynamoCollection(Collection):
+    def __init__(self, name, table, resource, consistent_read=False):
+        self.name = name
+        self.table = table
+        self.resource = resource
+        self.consistent_read = consistent_read
+
+    def _record(self, item):
+        return normalize(self.name, from_dynamo(item))
+
+    def _index_attributes(self, record):
+        """Attributs ajoutés à l'écriture pour les index secondaires de la table"""
+        return {}
+
+    def get_many(self, ids):
+        found = {}
+        ids = unique_ids(ids)
+        for start in range(0, len(ids), BATCH_GET_MAX):
+            request = {self.table.name: {
+                'Keys': [{'id': id} for id in ids[start:start + BATCH_GET_MAX]],
+                'ConsistentRead': self.consistent_read,
+            }}
+            for attempt in range(BATCH_RETRIES + 1):
+                response = self.resource.batch_get_item(RequestItems=request)
+                for item in response['Responses'].get(self.table.name, []):
+                    found[item['id']] = self._record(item)
+                request = response.get('UnprocessedKeys')
+                if not request:
+                    break
+                time.sleep(min(0.05 * 2 ** attempt, 1))
+            else:
+                raise ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException',
+                                             'Message': f"{self.name}: unprocessed keys after {BATCH_RETRIES} retries"}},
+                                  'BatchGetItem')
+        return found
+
+    def put_many(self, records):
+        records = [normalize(self.name, record) for record in records]
+        # overwrite_by_pkeys : un id présent deux fois dans le lot garde la dernière version
+        with self.table.batch_writer(overwrite_by_pkeys=['id']) as writer:
+            for record in records:
+                writer.put_item(Item=to_dynamo({**record, **self._index_attributes(record)}))
+
+    def update(self, id, changes):
+        changes = self._changes(changes)
+        if 'items' in changes:
+            changes = {**changes, 'items': normalize(self.name, {'id': id, 'items': changes['items']})['items']}
+        changes = {**changes, **self._index_attributes(changes)}
+        names = {f'#f{i}': field for i, field in enumerate(changes)}
+        values = {f':v{i}': to_dynamo(value) for i, value in enumerate(changes.values()) if value is not None}
+        assignments = [f'#f{i} = :v{i}' for i, value in enumerate(changes.values()) if value is not None]
+        removals = [f'#f{i}' for i, value in enumerate(changes.values()) if value is None]
+        expression = ' '.join(part for part in (
+            'SET ' + ', '.join(assignments) if assignments else '',
+            'REMOVE ' + ', '.join(removals) if removals else '',
+        ) if part)
+        if not expression:
+            return self.get(id)
+        options = {'ExpressionAttributeValues': values} if values else {}
+        try:
+            response = self.table.update_item(
+                Key={'id': id},
+                UpdateExpression=expression,
+                ConditionExpression='attribute_exists(id)',
+                ExpressionAttributeNames=names,
+                ReturnValues='ALL_NEW',
+                **options
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return None
+            raise
+        return self._record(response['Attributes'])
+
+    def delete_many(self, ids):
+        with self.table.batch_writer(overwrite_by_pkeys=['id']) as writer:
+            for id in unique_ids(ids):
+                writer.delete_item(Key={'id': id})
+
+    def page(self, limit=None, cursor=None):
+        options = {'Limit': page_limit(limit), 'ConsistentRead': self.consistent_read}
+        position = decode_cursor(cursor)
+        if position is not None:
+            options['ExclusiveStartKey'] = position['key']
+        response = self.table.scan(**options)
+        # Une page peut être plus courte que Limit (1 Mo lu au plus par Scan) : le curseur suffit
+        last_key = response.get('LastEvaluatedKey')
+        return Page([self._record(item) for item in response['Items']],
+                    encode_cursor({'key': last_key}) if last_key else None)
+
+    def export(self, segments=None):
+        segments = segments or DYNAMODB_SCAN_SEGMENTS
+        # Client de la ressource (types Python déjà convertis) : contrairement à la ressource, il peut
+        # servir à plusieurs threads
+        client = self.resource.meta.client
+
+        def read_segment(segment):
+            records = []
+            options = {'TableName': self.table.name, 'Segment': segment, 'TotalSegments': segments,
+                       'ConsistentRead': self.consistent_read}
+            while True:
+                response = client.scan(**options)
+                records.extend(self._record(item) for item in response['Items'])
+                if 'LastEvaluatedKey' not in response:
+                    return records
+                options['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        if segments == 1:
+            return read_segment(0)
+        with ThreadPoolExecutor(max_workers=segments) as executor:
+            return [record for part in executor.map(read_segment, range(segments)) for record in part]
+
+
+class DynamoItems(DynamoCollection):
+    def with_photo(self, digest, limit=None):
+        """Ids des items dont la photo a cette empreinte (index à cohérence différée)"""
+        options = {'IndexName': ITEMS_PHOTO_INDEX, 'KeyConditionExpression': Key('photo_hash').eq(digest)}
+        if limit:
+            options['Limit'] = limit
+        return [item['id'] for item in self.table.query(**options)['Items']]
+
+
+class DynamoOrders(DynamoCollection):
+    def _index_attributes(self, record):
+        # Index creux : une commande sans timestamp n'y figure pas (None retire l'attribut)
+        if 'timestamp' not in record:
+            return {}
+        return {ORDERS_INDEX_KEY: ORDERS_INDEX_VALUE if record['timestamp'] else None}
+
+    def latest(self, limit=None, cursor=None):
+        options = {
+            'IndexName': ORDERS_INDEX,
+            'KeyConditionExpression': Key(ORDERS_INDEX_KEY).eq(ORDERS_INDEX_VALUE),
+            'ScanIndexForward': False,
+            'Limit': page_limit(limit),
+        }
+        position = decode_cursor(cursor)
+        if position is not None:
+            options['ExclusiveStartKey'] = position['key']
+        response = self.table.query(**options)
+        last_key = response.get('LastEvaluatedKey')
+        return Page([self._record(item) for item in response['Items']],
+                    encode_cursor({'key': last_key}) if last_key else None)
+
+    def backfill_index(self):
+        """Ajoute l'attribut d'index aux commandes écrites avant orders_by_timestamp ; renvoie leur nombre"""
+        updated = 0
+        options = {'ProjectionExpression': '#id, #ts, #kind',
+                   'ExpressionAttributeNames': {'#id': 'id', '#ts': 'timestamp', '#kind': ORDERS_INDEX_KEY}}
+        while True:
+            response = self.table.scan(**options)
+            for item in response['Items']:
+                if item.get('timestamp') and ORDERS_INDEX_KEY not in item:
+                    self.table.update_item(
+                        Key={'id': item['id']},
+                        UpdateExpression='SET #kind = :kind',
+                        ExpressionAttributeNames={'#kind': ORDERS_INDEX_KEY},
+                        ExpressionAttributeValues={':kind': ORDERS_INDEX_VALUE},
+                    )
+                    updated += 1
+            if 'LastEvaluatedKey' not in response:
+                return updated
+            options['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+class DynamoRepository(Repository):
+    backend = 'dynamodb'
+
+    def __init__(self, tables=None, resource=None, endpoint_url=DYNAMODB_ENDPOINT_URL, consistent_read=False):
+        self.resource = resource or boto3.resource('dynamodb', endpoint_url=endpoint_url)
+        self.table_names = {**table_names(), **(tables or {})}
+        classes = {'items': DynamoItems, 'orders': DynamoOrders}
+        super().__init__(**{
+            name: classes.get(name, DynamoCollection)(
+                name, self.resource.Table(self.table_names[name]), self.resource, consistent_read)
+            for name in FIELDS
+        })
+
+    def create_tables(self):
+        """Crée les tables manquantes (DynamoDB Local, moto, tests) ; en production : Terraform"""
+        existing = {table.name for table in self.resource.tables.all()}
+        created = []
+        for name in FIELDS:
+            table_name = self.table_names[name]
+            if table_name in existing:
+                continue
+            options = {}
+            attributes = [{'AttributeName': 'id', 'AttributeType': 'S'}]
+            if name == 'orders':
+                # Même index que aws-iac/main.tf
+                attributes += [{'AttributeName': ORDERS_INDEX_KEY, 'AttributeType': 'S'},
+                               {'AttributeName': 'timestamp', 'AttributeType': 'S'}]
+                options['GlobalSecondaryIndexes'] = [{
+                    'IndexName': ORDERS_INDEX,
+                    'KeySchema': [{'AttributeName': ORDERS_INDEX_KEY, 'KeyType': 'HASH'},
+                                  {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}],
+                    'Projection': {'ProjectionType': 'ALL'},
+                }]
+            elif name == 'items':
+                attributes.append({'AttributeName': 'photo_hash', 'AttributeType': 'S'})
+                options['GlobalSecondaryIndexes'] = [{
+                    'IndexName': ITEMS_PHOTO_INDEX,
+                    'KeySchema': [{'AttributeName': 'photo_hash', 'KeyType': 'HASH'}],
+                    'Projection': {'ProjectionType': 'KEYS_ONLY'},
+                }]
+            self.resource.create_table(
+                TableName=table_name,
+                KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+                AttributeDefinitions=attributes,
+                BillingMode='PAY_PER_REQUEST',
+                **options
+            )
+            created.append(table_name)
+        for table_name in created:
+            self.resource.Table(table_name).wait_until_exists()
+        return created
+
+    def drop_tables(self):
+        for name in FIELDS:
+            try:
+                self.resource.Table(self.table_names[name]).delete()
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ResourceNotFoundException':
+                    raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintenance des tables DynamoDB")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('backfill-orders', help=f"Indexe dans {ORDERS_INDEX} les commandes écrites avant sa création")
+    args = parser.parse_args()
+    if args.command == 'backfill-orders':
+        repo = DynamoRepository()
+        print(f"{repo.orders.backfill_index()} commandes indexées dans {repo.table_names['orders']}")
+
+
+if __name__ == '__main__':
+    main()
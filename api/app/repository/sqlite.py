@@ -0,0 +1,178 @@
+"""Dépôt SQLite : les tables de l'API (schéma de migrations.py) via le pool de connexions de db.py.
+
+Les lots passent en une transaction (BEGIN IMMEDIATE) et quelques requêtes : json_each pour les
+lectures par ids, executemany et ON CONFLICT pour les écritures. Les pages suivent l'ordre des ids.
+"""
+import json
+
+from db import get_db
+from relations import load_orders, load_outfits, save_orders_items, save_outfit_items
+
+from .base import (
+    FIELDS, Collection, Page, Repository, decode_cursor, encode_cursor, normalize, page_limit, unique_ids,
+)
+
+IDS_IN = 'IN (SELECT value FROM json_each(?))'
+
+
+class _Transaction:
+    def __init__(self, connect):
+        self.connect = connect
+
+    def __enter__(self):
+        self.conn = self.connect()
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            self.conn.close()
+
+
+class SQLiteCollection(Collection):
+    """Table à colonnes simples (items, cintres)"""
+
+    def __init__(self, name, fields, connect):
+        self.name = name
+        self.fields = fields
+        self.connect = connect
+        self.columns = [field for field in fields if field != 'items']
+
+    def transaction(self):
+        return _Transaction(self.connect)
+
+    def _read(self, where, params):
+        conn = self.connect()
+        try:
+            rows = conn.execute(f"SELECT {', '.join(self.columns)} FROM {self.name} {where}", params).fetchall()
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+
+    def get_many(self, ids):
+        ids = unique_ids(ids)
+        if not ids:
+            return {}
+        return {record['id']: record for record in self._read(f'WHERE id {IDS_IN}', (json.dumps(ids),))}
+
+    def _upsert(self, conn, records):
+        updates = ', '.join(f'{column} = excluded.{column}' for column in self.columns if column != 'id')
+        conn.executemany(
+            f'''INSERT INTO {self.name} ({', '.join(self.columns)}) VALUES ({', '.join('?' * len(self.columns))})
+                ON CONFLICT (id) DO UPDATE SET {updates}''',
+            [tuple(record[column] for column in self.columns) for record in records]
+        )
+
+    def put_many(self, records):
+        records = [normalize(self.name, record) for record in records]
+        if not records:
+            return
+        with self.transaction() as conn:
+            self._upsert(conn, records)
+            self._save_relations(conn, records)
+
+    def _save_relations(self, conn, records):
+        pass
+
+    def update(self, id, changes):
+        changes = self._changes(changes)
+        columns = [field for field in changes if field in self.columns]
+        with self.transaction() as conn:
+            if columns:
+                cur = conn.execute(
+                    f"UPDATE {self.name} SET {', '.join(f'{column} = ?' for column in columns)} WHERE id = ?",
+                    (*(changes[column] for column in columns), id)
+                )
+                found = cur.rowcount > 0
+            else:
+                found = conn.execute(f'SELECT 1 FROM {self.name} WHERE id = ?', (id,)).fetchone() is not None
+            if not found:
+                return None
+            if 'items' in changes:
+                self._save_relations(conn, [normalize(self.name, {'id': id, 'items': changes['items']})])
+        return self.get(id)
+
+    def delete_many(self, ids):
+        ids = unique_ids(ids)
+        if not ids:
+            return
+        # Les tables de liaison suivent (ON DELETE CASCADE)
+        with self.transaction() as conn:
+            conn.execute(f'DELETE FROM {self.name} WHERE id {IDS_IN}', (json.dumps(ids),))
+
+    def page(self, limit=None, cursor=None):
+        limit = page_limit(limit)
+        position = decode_cursor(cursor)
+        where, params = '', []
+        if position is not None:
+            where, params = 'WHERE id > ?', [position['after']]
+        # Une ligne de plus que la page : pas de dernière page vide
+        records = self._read(f'{where} ORDER BY id LIMIT ?', (*params, limit + 1))
+        if len(records) <= limit:
+            return Page(records, None)
+        records = records[:limit]
+        return Page(records, encode_cursor({'after': records[-1]['id']}))
+
+
+class SQLiteOrders(SQLiteCollection):
+    """Commandes, articles dans order_items (copie des champs au moment de la commande)"""
+
+    def _read(self, where, params):
+        conn = self.connect()
+        try:
+            ids = [row[0] for row in conn.execute(f'SELECT id FROM orders {where}', params).fetchall()]
+            orders = {order['id']: order for order in load_orders(conn, f'WHERE orders.id {IDS_IN}', (json.dumps(ids),))}
+        finally:
+            conn.close()
+        return [orders[id] for id in ids]
+
+    def _save_relations(self, conn, records):
+        save_orders_items(conn, [(record['id'], record['items']) for record in records])
+
+    def latest(self, limit=None, cursor=None):
+        # Parcours de idx_orders_timestamp ; à timestamp égal, l'id départage (même ordre que load_orders)
+        limit = page_limit(limit)
+        position = decode_cursor(cursor)
+        where, params = 'WHERE timestamp IS NOT NULL', []
+        if position is not None:
+            where += ' AND (timestamp < ? OR (timestamp = ? AND id > ?))'
+            params = [position['timestamp'], position['timestamp'], position['after']]
+        records = self._read(f'{where} ORDER BY timestamp DESC, id LIMIT ?', (*params, limit + 1))
+        if len(records) <= limit:
+            return Page(records, None)
+        records = records[:limit]
+        return Page(records, encode_cursor({'timestamp': records[-1]['timestamp'], 'after': records[-1]['id']}))
+
+
+class SQLiteOutfits(SQLiteCollection):
+    """Tenues, ids des articles dans outfit_items (dans l'ordre)"""
+
+    def _read(self, where, params):
+        conn = self.connect()
+        try:
+            ids = [row[0] for row in conn.execute(f'SELECT id FROM outfits {where}', params).fetchall()]
+            outfits = {outfit['id']: outfit for outfit in load_outfits(conn, f'WHERE outfits.id {IDS_IN}', (json.dumps(ids),))}
+        finally:
+            conn.close()
+        return [outfits[id] for id in ids]
+
+    def _save_relations(self, conn, records):
+        for record in records:
+            save_outfit_items(conn, record['id'], record['items'])
+
+
+class SQLiteRepository(Repository):
+    backend = 'sqlite'
+
+    def __init__(self, connect=get_db):
+        super().__init__(
+            items=SQLiteCollection('items', FIELDS['items'], connect),
+            orders=SQLiteOrders('orders', FIELDS['orders'], connect),
+            hangers=SQLiteCollection('hangers', FIELDS['hangers'], connect),
+            outfits=SQLiteOutfits('outfits', FIELDS['outfits'], connect),
+        )
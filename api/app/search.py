@@ -0,0 +1,149 @@
+import argparse
+import os
+import random
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from models import item_model_db_init, item_model_db_indexes, item_search_db_init
+
+# Poids BM25 des colonnes indexées (name, category, color) : le nom compte davantage
+BM25_WEIGHTS = (10.0, 2.0, 2.0)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Passe à False si SQLite n'a pas été compilé avec FTS5 : la recherche retombe sur LIKE
+enabled = True
+
+
+def match_query(text):
+    """Traduit une saisie libre en requête FTS5 : chaque mot est cherché comme préfixe"""
+    tokens = TOKEN_RE.findall(text or '')
+    # Les guillemets neutralisent la syntaxe FTS5 (AND, NEAR, *, -) dans la saisie
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def init_search_index(conn):
+    """Crée l'index plein texte et ses triggers ; le remplit s'il vient d'être créé"""
+    global enabled
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'items_fts'"
+    ).fetchone() is not None
+    try:
+        for statement in item_search_db_init:
+            conn.execute(statement)
+    except sqlite3.OperationalError:
+        enabled = False
+        return False
+    if not exists:
+        rebuild(conn)
+    enabled = True
+    return True
+
+
+def rebuild(conn):
+    """Reconstruit l'index depuis la table items (base existante, après un VACUUM...)"""
+    conn.execute("INSERT INTO items_fts (items_fts) VALUES ('rebuild')")
+
+
+def search_items(conn, text, columns, limit):
+    """Items correspondant à la saisie, du plus pertinent au moins pertinent"""
+    query = match_query(text)
+    if not query:
+        return []
+    select = ', '.join(f'items.{column}' for column in columns)
+    weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+    cur = conn.execute(
+        f'''SELECT {select}, bm25(items_fts, {weights}) AS score
+            FROM items_fts JOIN items ON items.rowid = items_fts.rowid
+            WHERE items_fts MATCH ?
+            ORDER BY score
+            LIMIT ?''',
+        (query, limit)
+    )
+    return [dict(row) for row in cur.fetchall()]
+
+
+NAMES = ['Jupe', 'Short', 'Jean', 'Blouse', 'Chemise', 'Robe', 'Pull', 'Veste', 'Manteau', 'Gilet']
+ADJECTIVES = ['évasée', 'plissée', 'crayon', 'longue', 'fleurie', 'délavé', 'slim', 'brut', 'cargo',
+              'estival', 'élégant', 'côtelé', 'ajusté', 'brodée', 'légère', 'rayée', 'imprimée', 'satinée']
+CATEGORIES = ['Jupes', 'Shorts', 'Jeans', 'Blouses', 'Chemises', 'Robes', 'Pulls', 'Vestes']
+COLORS = ['Rouge', 'Bleu', 'Bleu clair', 'Vert', 'Noir', 'Blanc', 'Beige', 'Kaki', 'Marine', 'Multicolore', 'Écru', 'Pêche']
+# Noms de modèles (~4000 combinaisons) pour avoir aussi des recherches sélectives
+SYLLABLES = ['ma', 'ré', 'lo', 'ti', 'sé', 'na', 'vé', 'ro', 'ka', 'li', 'mé', 'po', 'ga', 'dé', 'lu', 'fa']
+
+
+def model_name(rng):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(3)).capitalize()
+
+
+def benchmark(count, runs, terms, limit=50):
+    """Compare un scan LIKE à la recherche FTS5 sur une base temporaire de count items"""
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'bench.sqlite3'))
+        conn.row_factory = sqlite3.Row
+        conn.execute(item_model_db_init)
+        for index in item_model_db_indexes:
+            conn.execute(index)
+        if not init_search_index(conn):
+            sys.exit("FTS5 n'est pas disponible dans ce SQLite")
+        rng = random.Random(42)
+        start = time.perf_counter()
+        conn.executemany(
+            'INSERT INTO items (id, name, category, color, size) VALUES (?, ?, ?, ?, ?)',
+            (
+                (f'item_{i:08d}', f'{rng.choice(NAMES)} {model_name(rng)} {rng.choice(ADJECTIVES)} {rng.choice(ADJECTIVES)}',
+                 rng.choice(CATEGORIES), rng.choice(COLORS), rng.choice(['S', 'M', 'L', '38', '40']))
+                for i in range(count)
+            )
+        )
+        conn.commit()
+        print(f"{count} items insérés (avec index FTS) en {time.perf_counter() - start:.2f} s\n")
+
+        def timed(fn):
+            durations = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                rows = fn()
+                durations.append((time.perf_counter() - start) * 1000)
+            return statistics.median(durations), len(rows)
+
+        # Même taille de page que GET /items/search ; LIKE doit tout lire pour trier, FTS5 classe par BM25
+        print(f"{'terme':<12} {'LIKE (ms)':>10} {'lignes':>7} {'FTS5 (ms)':>10} {'lignes':>7}")
+        for term in terms:
+            like_ms, like_rows = timed(lambda: conn.execute(
+                'SELECT id FROM items WHERE name LIKE ? OR category LIKE ? OR color LIKE ? ORDER BY name LIMIT ?',
+                [f'%{term}%'] * 3 + [limit]
+            ).fetchall())
+            fts_ms, fts_rows = timed(lambda: search_items(conn, term, ['id'], limit))
+            print(f"{term:<12} {like_ms:>10.2f} {like_rows:>7} {fts_ms:>10.2f} {fts_rows:>7}")
+        print("\nLIKE ne trouve pas les variantes sans accent (evasee) ; FTS5 cherche les mots par préfixe.")
+        conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Index de recherche plein texte des items")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('rebuild', help="Reconstruit items_fts depuis la table items")
+    bench = sub.add_parser('bench', help="Compare LIKE et FTS5 sur une base synthétique")
+    bench.add_argument('--items', type=int, default=100000)
+    bench.add_argument('--runs', type=int, default=5)
+    bench.add_argument('terms', nargs='*', default=['évasée', 'evasee', 'jup', 'bleu clair', 'marélo', 'marelo', 'kati'])
+    args = parser.parse_args()
+
+    if args.command == 'rebuild':
+        from db import get_db
+        conn = get_db()
+        if not init_search_index(conn):
+            sys.exit("FTS5 n'est pas disponible dans ce SQLite")
+        start = time.perf_counter()
+        rebuild(conn)
+        conn.commit()
+        count = conn.execute('SELECT count(*) FROM items').fetchone()[0]
+        conn.close()
+        print(f"Index reconstruit pour {count} items en {time.perf_counter() - start:.2f} s")
+    else:
+        benchmark(args.items, args.runs, args.terms)
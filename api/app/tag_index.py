@@ -0,0 +1,252 @@
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# Nombre maximal de tags gardés en mémoire (les moins récemment lus sont évincés)
+TAG_CACHE_SIZE = int(os.environ.get('TAG_CACHE_SIZE', 100000))
+# Durée de vie d'une entrée ; la validité est assurée par le compteur 'tags' de table_versions
+TAG_CACHE_TTL = float(os.environ.get('TAG_CACHE_TTL', 300))
+# Un tag inconnu est revérifié en base après ce délai
+TAG_CACHE_NEGATIVE_TTL = float(os.environ.get('TAG_CACHE_NEGATIVE_TTL', 5))
+
+# Un tag porté à la fois par un item et un cintre désigne l'item (même priorité qu'avant le cache)
+RESOLVE_SQL = '''SELECT kind, id FROM (
+        SELECT 'item' AS kind, id, 0 AS priority FROM items WHERE tag_id = ?
+        UNION ALL
+        SELECT 'hanger', id, 1 FROM hangers WHERE tag_id = ?
+    ) ORDER BY priority LIMIT 1'''
+
+# Incrémenté par des triggers à chaque changement de tag d'un item ou d'un cintre (migration 9)
+VERSION_SQL = "SELECT version FROM table_versions WHERE name = 'tags'"
+
+
+class TagIndex:
+    """Cache LRU tag -> (type, id) des items et des cintres, pour le chemin des lecteurs NFC/RFID.
+
+    Les écritures de l'API invalident les entrées concernées ; les tags inconnus sont aussi
+    gardés (cache négatif) pour qu'une rafale de lectures d'un tag non associé ne touche pas la base.
+    Chaque lecture relit d'abord le compteur 'tags' de table_versions : un tag changé par un autre
+    worker ou hors de l'API vide le cache avant qu'une entrée périmée soit servie.
+    """
+
+    def __init__(self, size=TAG_CACHE_SIZE, ttl=TAG_CACHE_TTL, negative_ttl=TAG_CACHE_NEGATIVE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # (type, id) -> tag, pour retrouver l'ancien tag d'un item ou d'un cintre modifié
+        self._owners = {}
+        # Incrémenté à chaque invalidation : une lecture en base commencée avant est périmée
+        self._generation = 0
+        # Compteur 'tags' de la base au moment où les entrées ont été lues
+        self._version = None
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _store(self, tag_id, owner, now):
+        # Appelé sous le verrou
+        previous = self._entries.pop(tag_id, None)
+        if previous is not None and previous[0] is not None:
+            self._owners.pop(previous[0], None)
+        ttl = self.ttl if owner is not None else self.negative_ttl
+        self._entries[tag_id] = (owner, now + ttl)
+        if owner is not None:
+            self._owners[owner] = tag_id
+        while len(self._entries) > self.size:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            if evicted is not None:
+                self._owners.pop(evicted, None)
+            self.evictions += 1
+
+    def get(self, tag_id):
+        """Entrée en cache : (True, (type, id) ou None) si connue, (False, None) sinon"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(tag_id)
+            if entry is None or entry[1] < now:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(tag_id)
+            if entry[0] is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return True, entry[0]
+
+    def validate(self, version):
+        """Vide le cache si le compteur 'tags' a bougé depuis la lecture des entrées"""
+        with self._lock:
+            if version == self._version:
+                return
+            if self._version is not None:
+                self._generation += 1
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._owners.clear()
+            self._version = version
+
+    def lookup(self, conn_factory, tag_id):
+        """(type, id) du tag ('item' ou 'hanger'), ou None s'il n'est associé à rien.
+
+        En cas de succès, seul le compteur 'tags' (une ligne par clé primaire) est lu en base.
+        """
+        conn = conn_factory()
+        try:
+            self.validate(conn.execute(VERSION_SQL).fetchone()[0])
+            found, owner = self.get(tag_id)
+            if found:
+                return owner
+            with self._lock:
+                generation = self._generation
+            row = conn.execute(RESOLVE_SQL, (tag_id, tag_id)).fetchone()
+        finally:
+            conn.close()
+        owner = (row[0], row[1]) if row else None
+        with self._lock:
+            if generation == self._generation:
+                self._store(tag_id, owner, time.monotonic())
+        return owner
+
+    def warm(self, conn):
+        """Charge les tags existants (dans la limite de la taille du cache) ; renvoie leur nombre"""
+        self.validate(conn.execute(VERSION_SQL).fetchone()[0])
+        rows = conn.execute(
+            '''SELECT 'hanger', id, tag_id FROM hangers WHERE tag_id IS NOT NULL
+               UNION ALL
+               SELECT 'item', id, tag_id FROM items WHERE tag_id IS NOT NULL
+               LIMIT ?''',
+            (self.size,)
+        ).fetchall()
+        now = time.monotonic()
+        with self._lock:
+            # Les items sont chargés après les cintres : ils l'emportent sur un tag partagé
+            for kind, owner_id, tag_id in rows:
+                self._store(tag_id, (kind, owner_id), now)
+            return len(self._entries)
+
+    def invalidate(self, *tag_ids):
+        """Oublie des tags dont l'association vient de changer"""
+        with self._lock:
+            self._generation += 1
+            for tag_id in tag_ids:
+                if tag_id is None:
+                    continue
+                entry = self._entries.pop(tag_id, None)
+                if entry is not None:
+                    self.invalidations += 1
+                    if entry[0] is not None:
+                        self._owners.pop(entry[0], None)
+
+    def forget(self, kind, owner_id, new_tag_id=None):
+        """Un item ou un cintre a été modifié ou supprimé : oublie son ancien tag et le nouveau"""
+        with self._lock:
+            old_tag_id = self._owners.get((kind, owner_id))
+        self.invalidate(old_tag_id, new_tag_id)
+
+    def clear(self):
+        """Après une écriture en lot : tout sera relu à la demande"""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._owners.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.size,
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': round((self.hits + self.negative_hits) / lookups, 4) if lookups else None,
+            }
+
+
+tags = TagIndex()
+
+
+def benchmark(count, reads, known_ratio=0.9):
+    """Latence des résolutions de tags avec et sans cache, sur une base temporaire de count items"""
+    from models import item_model_db_init, hanger_model_db_init, lookup_db_indexes, table_versions_db_init, tag_version_db_init
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.sqlite3')
+        setup = sqlite3.connect(path)
+        setup.execute(item_model_db_init)
+        setup.execute(hanger_model_db_init)
+        # Seuls les index des tags (les deux premiers) concernent ce test
+        for index in lookup_db_indexes[:2]:
+            setup.execute(index)
+        setup.execute(table_versions_db_init[0])
+        for statement in tag_version_db_init:
+            setup.execute(statement)
+        setup.executemany('INSERT INTO items (id, name, tag_id) VALUES (?, ?, ?)',
+                          ((f'item_{i}', f'Item {i}', f'tag-i{i}') for i in range(count)))
+        setup.executemany('INSERT INTO hangers (id, tag_id, mqtt_topic) VALUES (?, ?, ?)',
+                          ((f'hanger_{i}', f'tag-h{i}', f'cintre/{i}') for i in range(count // 10)))
+        setup.commit()
+        setup.close()
+
+        class PooledConnection(sqlite3.Connection):
+            # Comme les connexions du pool : close() la garde ouverte
+            def close(self):
+                pass
+
+        def connect():
+            return sqlite3.connect(path)
+
+        pooled_conn = sqlite3.connect(path, factory=PooledConnection)
+
+        rng = random.Random(42)
+        # Rafales réalistes : un rayon relu plusieurs fois, quelques tags inconnus
+        rack = [f'tag-i{rng.randrange(count)}' for _ in range(200)] + [f'tag-h{rng.randrange(count // 10)}' for _ in range(20)]
+        stream = [rng.choice(rack) if rng.random() < known_ratio else f'inconnu-{rng.randrange(50)}' for _ in range(reads)]
+
+        def timed(resolve):
+            durations = []
+            for tag_id in stream:
+                start = time.perf_counter()
+                resolve(tag_id)
+                durations.append((time.perf_counter() - start) * 1e6)
+            durations.sort()
+            return statistics.median(durations), durations[int(len(durations) * 0.99)], len(stream) / (sum(durations) / 1e6)
+
+        # Référence : même requête sur une connexion déjà ouverte (comme celles du pool)
+        def uncached(tag_id):
+            pooled_conn.execute(RESOLVE_SQL, (tag_id, tag_id)).fetchone()
+
+        index = TagIndex()
+        warm_conn = connect()
+        start = time.perf_counter()
+        warmed = index.warm(warm_conn)
+        warm_conn.close()
+        print(f"{count} items, {count // 10} cintres ; {warmed} tags préchargés en {time.perf_counter() - start:.2f} s\n")
+        print(f"{'':<22} {'médiane (µs)':>13} {'p99 (µs)':>10} {'tags/s':>10}")
+        for label, resolve in (('SQLite (indexé)', uncached), ('cache', lambda tag_id: index.lookup(lambda: pooled_conn, tag_id))):
+            median, p99, rate = timed(resolve)
+            print(f"{label:<22} {median:>13.1f} {p99:>10.1f} {rate:>10.0f}")
+        print(f"\n{index.stats()}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Cache des tags NFC/RFID")
+    sub = parser.add_subparsers(dest='command', required=True)
+    bench = sub.add_parser('bench', help="Mesure la latence de résolution des tags")
+    bench.add_argument('--items', type=int, default=100000)
+    bench.add_argument('--reads', type=int, default=20000)
+    args = parser.parse_args()
+    benchmark(args.items, args.reads)
@@ -0,0 +1,85 @@
+# Configuration gunicorn de l'API : gunicorn -c gunicorn.conf.py (depuis le dossier api/)
+# Chaque valeur peut être surchargée par une variable d'environnement GUNICORN_*.
+
+# Worker gevent : les verrous, conditions et threads créés par l'application préchargée
+# (bus d'événements, associations, pool SQLite) doivent déjà être ceux de gevent.
+from gevent import monkey
+monkey.patch_all()
+
+import multiprocessing
+import os
+import tempfile
+
+cpus = multiprocessing.cpu_count()
+
+wsgi_app = 'main:create_app()'
+pythonpath = 'app'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+# gevent : une greenlet par connexion. Un flux /events ou une attente GET /tag/<id> ne coûte
+# qu'une greenlet endormie, et ne prive pas les autres requêtes d'un thread. Les appels SQLite
+# passent par le pool de vrais threads du hub (db.run_native) et ne bloquent pas la boucle.
+worker_class = 'gevent'
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# 2 x CPU + 1 par défaut : les événements, les associations de tags et les inventaires des lecteurs
+# sont en base, donc partagés par les workers.
+_workers = os.environ.get('GUNICORN_WORKERS', 'auto')
+workers = cpus * 2 + 1 if _workers == 'auto' else int(_workers)
+
+# L'application (et la migration du schéma) est chargée une fois dans le maître avant le fork
+preload_app = True
+
+# Keep-alive entre les requêtes d'un même client (le site fait plusieurs appels par page)
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Sans réponse du worker pendant ce délai, il est redémarré
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+# Arrêt et rechargement (kill -HUP) progressifs : les requêtes en cours ont ce délai pour finir
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+# Recyclage périodique des workers contre les fuites mémoire ; désactivé par défaut car il vide
+# le cache des tags du worker
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+# Derrière un proxy (nginx), pour que l'API voie l'adresse et le schéma d'origine
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+# Totaux des métriques de chaque worker, additionnés par GET /metrics (lu par metrics.py à l'import)
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'api-metrics'))
+
+
+def pre_fork(server, worker):
+    # preload_app : create_app() a ouvert des connexions SQLite dans le maître (migration, cache
+    # des tags). Une connexion SQLite ne survit pas à un fork : on les ferme avant chaque fork.
+    import db
+    db.pool.close_all()
+
+
+def post_fork(server, worker):
+    # Les connexions SQLite se recréent dans chaque worker (pool lié au pid) ; le bus d'événements
+    # repart d'un tampon vide, que son scrutateur remplit depuis la table events
+    import events
+    events.bus.reset()
+
+
+def on_starting(server):
+    import metrics
+    metrics.clear()
+
+
+def worker_exit(server, worker):
+    # Dernière écriture des totaux du worker avant son arrêt
+    import metrics
+    metrics.registry.flush()
+
+
+def child_exit(server, worker):
+    import metrics
+    metrics.merge_dead(worker.pid)
+
+
+def when_ready(server):
+    server.log.info("API prête : %d worker(s) gevent x %d connexions", server.cfg.workers, server.cfg.worker_connections)
@@ -0,0 +1,74 @@
+"""Tests de l'API : base SQLite temporaire, application créée par create_app().
+
+    cd api && python -m pytest -q tests
+"""
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import pytest
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(API_DIR, 'app')
+sys.path.insert(0, APP_DIR)
+
+# Avant tout import de l'application : db.py et metrics.py lisent leur configuration à l'import
+TMP_DIR = tempfile.mkdtemp(prefix='api-tests-')
+os.environ['DB_PATH'] = os.path.join(TMP_DIR, 'database.sqlite3')
+os.environ.pop('METRICS_DIR', None)
+
+
+@pytest.fixture(scope='session')
+def app():
+    import main
+    return main.create_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def gunicorn_server(tmp_path):
+    """Démarre l'API sous gunicorn (gunicorn.conf.py) ; renvoie l'URL de base"""
+    pytest.importorskip('gevent')
+    pytest.importorskip('gunicorn')
+    processes = []
+
+    def start(workers=1):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        env = {
+            **os.environ,
+            'DB_PATH': str(tmp_path / 'database.sqlite3'),
+            'METRICS_DIR': str(tmp_path / 'metrics'),
+            'GUNICORN_BIND': f'127.0.0.1:{port}',
+            'GUNICORN_WORKERS': str(workers),
+            'GUNICORN_ACCESS_LOG': '/dev/null',
+            # Les flux /events ouverts retarderaient l'arrêt
+            'GUNICORN_GRACEFUL_TIMEOUT': '1',
+        }
+        process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+                                   cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        processes.append(process)
+        url = f'http://127.0.0.1:{port}'
+        deadline = time.monotonic() + 20
+        while time.monotonic() < deadline:
+            try:
+                urllib.request.urlopen(f'{url}/health', timeout=1)
+                return url
+            except OSError:
+                assert process.poll() is None, 'gunicorn ne démarre pas'
+                time.sleep(0.1)
+        raise TimeoutError('gunicorn ne répond pas')
+
+    yield start
+    for process in processes:
+        process.terminate()
+        process.wait(10)
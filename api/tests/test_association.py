@@ -0,0 +1,105 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from association import AssociationEngine
+from db import get_db
+
+
+def test_association_completed_by_another_worker(app):
+    # Deux moteurs sur la même base : deux workers gunicorn, sans réveil direct de l'un par l'autre
+    waiting, reading = AssociationEngine(poll_interval=0.05), AssociationEngine()
+    pending = waiting.expect_tag('item_w1', 'reader_w1')
+    result = {}
+    waiter = threading.Thread(target=lambda: result.update(final=waiting.wait(pending, 5)))
+    waiter.start()
+
+    conn = get_db()
+    claimed = reading.claim(conn, 'reader_w1', 'tag_w1')
+    conn.commit()
+    conn.close()
+    waiter.join(5)
+
+    assert claimed.item_id == 'item_w1'
+    assert result['final'].status == 'association_complete'
+    assert result['final'].tag_id == 'tag_w1'
+
+
+def test_resolution_wakes_only_its_own_wait(app):
+    engine = AssociationEngine(poll_interval=30)
+    reads = []
+    get = engine.get
+    engine.get = lambda id: reads.append(id) or get(id)
+    pendings = [engine.expect_tag(f'item_n{i}', f'reader_n{i}') for i in range(20)]
+    waiters = [threading.Thread(target=engine.wait, args=(pending, 10)) for pending in pendings]
+    for waiter in waiters:
+        waiter.start()
+    while len(reads) < len(pendings):
+        time.sleep(0.01)
+
+    engine.cancel(reader_id='reader_n0')
+    waiters[0].join(5)
+    time.sleep(0.1)
+    # Une seule attente réveillée, qui relit une seule fois sa ligne
+    assert reads[len(pendings):] == [pendings[0].id]
+
+    for pending in pendings[1:]:
+        engine.cancel(reader_id=pending.reader_id)
+    for waiter in waiters:
+        waiter.join(5)
+
+
+def test_tag_read_completes_registered_wait(client):
+    client.post('/items:batch', json=[{'id': 'item_t1', 'name': 'Jupe'}])
+
+    response = client.get('/tag/item_t1?reader=reader_t1&timeout=0')
+    assert response.status_code == 202
+    assert [p['item_id'] for p in client.get('/tag/pending').get_json() if p['reader_id'] == 'reader_t1'] == ['item_t1']
+
+    response = client.post('/tag', json={'tag_id': 'tag_t1', 'reader_id': 'reader_t1'})
+    assert response.get_json()['status'] == 'association_complete'
+    assert not [p for p in client.get('/tag/pending').get_json() if p['reader_id'] == 'reader_t1']
+    item = next(item for item in client.get('/items').get_json() if item['id'] == 'item_t1')
+    assert item['tag_id'] == 'tag_t1'
+
+
+def test_wait_times_out(client):
+    start = time.monotonic()
+    response = client.get('/tag/item_t2?reader=reader_t2&timeout=0.3')
+
+    assert response.status_code == 408
+    assert response.get_json()['status'] == 'timeout'
+    assert time.monotonic() - start < 2
+    assert client.delete('/tag/item_t2?reader=reader_t2').status_code == 404
+
+
+def test_wait_and_read_on_any_worker(gunicorn_server):
+    url = gunicorn_server(workers=2)
+    # Chaque requête ouvre sa propre connexion : attente et lecture tombent sur l'un ou l'autre worker
+    for round in range(8):
+        item_id, reader_id = f'item_g{round}', f'reader_g{round}'
+        result = {}
+
+        def wait():
+            try:
+                with urllib.request.urlopen(f'{url}/tag/{item_id}?reader={reader_id}&timeout=10', timeout=15) as response:
+                    result['status'] = response.status
+            except urllib.error.HTTPError as e:
+                result['status'] = e.code
+
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            with urllib.request.urlopen(f'{url}/tag/pending', timeout=5) as response:
+                if any(p['item_id'] == item_id for p in json.loads(response.read())):
+                    break
+            time.sleep(0.02)
+        request = urllib.request.Request(f'{url}/tag', data=json.dumps({'tag_id': f'tag_g{round}', 'reader_id': reader_id}).encode(),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=5) as response:
+            assert json.loads(response.read())['status'] == 'association_complete'
+        waiter.join(15)
+        assert result['status'] == 200
@@ -0,0 +1,67 @@
+def create_order(client, items):
+    response = client.post('/orders:batch', json=[{'items': items}])
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['results'][0]['id']
+
+
+def get_order(client, order_id):
+    return next(order for order in client.get('/orders').get_json() if order['id'] == order_id)
+
+
+def test_upsert_without_items_keeps_order_items(client):
+    order_id = create_order(client, [{'id': 'item_a', 'name': 'Jupe'}, {'id': 'item_b', 'name': 'Jean'}])
+
+    response = client.post('/orders:batch?upsert=1', json=[{'id': order_id, 'status': 'Livrée'}])
+
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['results'][0]['status'] == 'updated'
+    order = get_order(client, order_id)
+    assert order['status'] == 'Livrée'
+    assert [item['id'] for item in order['items']] == ['item_a', 'item_b']
+
+
+def test_upsert_with_items_replaces_only_that_order(client):
+    kept = create_order(client, [{'id': 'item_a', 'name': 'Jupe'}])
+    replaced = create_order(client, [{'id': 'item_b', 'name': 'Jean'}])
+
+    response = client.post('/orders:batch?upsert=1', json=[
+        {'id': kept, 'status': 'Livrée'},
+        {'id': replaced, 'items': [{'id': 'item_c', 'name': 'Short'}]},
+    ])
+
+    assert response.status_code == 200, response.get_json()
+    assert [item['id'] for item in get_order(client, kept)['items']] == ['item_a']
+    assert [item['id'] for item in get_order(client, replaced)['items']] == ['item_c']
+
+
+def test_hanger_upsert_clears_explicit_null_and_keeps_absent_fields(client):
+    client.post('/hangers:batch', json=[{'id': 'hanger_n', 'tag_id': 'tag_n', 'mqtt_topic': 'hanger_n/leds', 'status': 'online'}])
+
+    response = client.post('/hangers:batch?upsert=1', json=[{'id': 'hanger_n', 'tag_id': None}])
+
+    assert response.status_code == 200, response.get_json()
+    hanger = next(h for h in client.get('/hangers').get_json() if h['id'] == 'hanger_n')
+    assert hanger['tag_id'] is None
+    assert hanger['mqtt_topic'] == 'hanger_n/leds'
+    assert hanger['status'] == 'online'
+
+
+def test_order_upsert_clears_explicit_null(client):
+    order_id = create_order(client, [{'id': 'item_a', 'name': 'Jupe'}])
+
+    client.post('/orders:batch?upsert=1', json=[{'id': order_id, 'status': None}])
+
+    order = get_order(client, order_id)
+    assert order['status'] is None
+    assert order['timestamp'] is not None
+
+
+def test_order_items_keep_extra_and_null_fields(client):
+    order_id = create_order(client, [
+        {'id': 'item_a', 'name': 'Jupe', 'color': None, 'price': 12.5},
+        'item_b',
+    ])
+
+    items = get_order(client, order_id)['items']
+    assert items[0] == {'id': 'item_a', 'name': 'Jupe', 'color': None, 'price': 12.5}
+    assert items[1] == 'item_b'
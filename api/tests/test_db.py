@@ -0,0 +1,83 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.request
+
+from db import ConnectionPool
+
+
+def run_in_child(check):
+    """Exécute check() dans un processus forké ; renvoie son code de sortie"""
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            code = 0 if check() else 2
+        finally:
+            os._exit(code)
+    return os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1])
+
+
+def test_child_never_reuses_or_closes_parent_connections(tmp_path):
+    pool = ConnectionPool(path=str(tmp_path / 'pool.sqlite3'))
+    parent = pool.acquire()
+    parent.execute('CREATE TABLE t (x)')
+    parent.commit()
+    parent.close()
+    borrowed = pool.acquire()
+    idle = pool.acquire()
+    idle.close()
+
+    def child():
+        conn = pool.acquire()
+        fresh = conn is not idle and conn.pid == os.getpid()
+        conn.close()
+        borrowed.close()
+        stats = pool.stats()
+        return fresh and stats['inherited'] == 2 and stats['idle'] == 1
+
+    assert run_in_child(child) == 0
+    # Les connexions du parent restent utilisables après la fin de l'enfant
+    assert borrowed.execute('SELECT count(*) FROM t').fetchone()[0] == 0
+    assert idle.execute('SELECT count(*) FROM t').fetchone()[0] == 0
+    borrowed.close()
+    pool.close_all()
+
+
+def test_close_all_before_fork_leaves_nothing_to_inherit(tmp_path):
+    pool = ConnectionPool(path=str(tmp_path / 'pool.sqlite3'))
+    pool.acquire().close()
+    pool.close_all()
+
+    assert run_in_child(lambda: pool.stats()['inherited'] == 0 and pool.acquire().pid == os.getpid()) == 0
+
+
+def test_lock_wait_does_not_block_the_gevent_worker(gunicorn_server, tmp_path):
+    url = gunicorn_server(workers=1)
+    # Un autre processus garde le verrou d'écriture : l'écriture de l'API attend (busy_timeout)
+    holder = sqlite3.connect(tmp_path / 'database.sqlite3', isolation_level=None)
+    holder.execute('BEGIN IMMEDIATE')
+    result = {}
+
+    def write():
+        request = urllib.request.Request(f'{url}/items:batch', data=json.dumps([{'id': 'locked_item', 'name': 'Jupe'}]).encode(),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=10) as response:
+            result['status'] = response.status
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        time.sleep(0.3)
+        start = time.monotonic()
+        with urllib.request.urlopen(f'{url}/health', timeout=10) as response:
+            assert response.status == 200
+        # Servie pendant l'attente du verrou, sur le même worker
+        assert time.monotonic() - start < 1
+    finally:
+        holder.execute('ROLLBACK')
+        holder.close()
+        writer.join(10)
+    assert result['status'] == 200
@@ -0,0 +1,77 @@
+import json
+import socket
+import urllib.parse
+import urllib.request
+
+# Bien plus que les threads d'un ancien worker gthread (8 x CPU, au moins 16)
+STREAMS = 300
+
+
+def open_stream(url):
+    parts = urllib.parse.urlsplit(url)
+    sock = socket.create_connection((parts.hostname, parts.port), timeout=10)
+    sock.sendall(f'GET /events HTTP/1.1\r\nHost: {parts.netloc}\r\nAccept: text/event-stream\r\n\r\n'.encode())
+    return sock
+
+
+def read_until(sock, marker):
+    data = b''
+    while marker not in data:
+        chunk = sock.recv(4096)
+        assert chunk, 'flux fermé'
+        data += chunk
+    return data
+
+
+def get_json(url):
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return response.status, json.loads(response.read())
+
+
+def test_open_streams_do_not_block_requests(gunicorn_server):
+    url = gunicorn_server()
+    streams = [open_stream(url) for _ in range(STREAMS)]
+    try:
+        for sock in streams:
+            read_until(sock, b'retry: 3000')
+
+        status, stats = get_json(f'{url}/events/stats')
+        assert status == 200
+        assert stats['subscribers'] == STREAMS
+
+        request = urllib.request.Request(f'{url}/items:batch', data=json.dumps([{'id': 'stream_item', 'name': 'Jupe'}]).encode(),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=5) as response:
+            assert response.status == 200
+        status, items = get_json(f'{url}/items')
+        assert status == 200
+        assert 'stream_item' in [item['id'] for item in items]
+
+        # Chaque abonné reçoit l'événement de l'item du lot
+        for sock in streams:
+            read_until(sock, b'event: item_created')
+    finally:
+        for sock in streams:
+            sock.close()
+
+
+def test_streams_receive_events_from_every_worker(gunicorn_server):
+    url = gunicorn_server(workers=2)
+    # Chaque flux et chaque écriture ouvrent leur propre connexion : ils tombent sur l'un ou l'autre worker
+    streams = [open_stream(url) for _ in range(8)]
+    try:
+        for sock in streams:
+            read_until(sock, b'retry: 3000')
+        records = [{'id': f'worker_item_{i}', 'name': 'Jupe'} for i in range(3)]
+        for record in records:
+            request = urllib.request.Request(f'{url}/items:batch', data=json.dumps([record]).encode(),
+                                             headers={'Content-Type': 'application/json'})
+            with urllib.request.urlopen(request, timeout=5) as response:
+                assert response.status == 200
+
+        for sock in streams:
+            data = read_until(sock, b'worker_item_2')
+            assert data.count(b'event: item_created') == 3
+    finally:
+        for sock in streams:
+            sock.close()
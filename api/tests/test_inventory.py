@@ -0,0 +1,21 @@
+import inventory
+
+
+def test_inventory_rounds_are_shared_between_workers(client):
+    client.post('/items:batch', json=[
+        {'id': 'inv_a', 'name': 'Jupe', 'tag_id': 'tag_inv_a'},
+        {'id': 'inv_b', 'name': 'Jean', 'tag_id': 'tag_inv_b'},
+    ])
+    client.post('/tags:batch', json=[{'tag_id': 'tag_inv_a', 'reader_id': 'portant_inv'},
+                                     {'tag_id': 'tag_inv_b', 'reader_id': 'portant_inv'}])
+
+    # Le tour précédent est relu en base : un autre worker le compare de la même façon
+    response = client.post('/tags:batch', json=[{'tag_id': 'tag_inv_a', 'reader_id': 'portant_inv'}])
+    reader = response.get_json()['readers'][0]
+    assert reader['first_round'] is False
+    assert reader['disappeared'] == [{'hanger_id': None, 'items': ['inv_b']}]
+
+    snapshot = inventory.InventoryTracker().snapshot('portant_inv')
+    assert snapshot['items'] == [{'hanger_id': None, 'items': ['inv_a']}]
+    assert client.delete('/tags/inventory/portant_inv').status_code in (200, 204)
+    assert 'portant_inv' not in client.get('/tags/inventory').get_json()
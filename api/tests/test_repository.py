@@ -0,0 +1,34 @@
+import uuid
+
+import pytest
+
+from repository import conformance
+
+
+@pytest.fixture(scope='module', params=['sqlite', 'dynamodb'])
+def repo(request):
+    if request.param == 'sqlite':
+        factory = conformance.sqlite_repository()
+    else:
+        pytest.importorskip('boto3')
+        pytest.importorskip('moto')
+        factory = conformance.dynamodb_repository()
+    with factory as repo:
+        yield repo
+
+
+# La suite de conformité (python -m repository.conformance) sur les deux stockages
+@pytest.mark.parametrize('check', conformance.CHECKS, ids=lambda check: check.__name__)
+def test_conformance(repo, check):
+    check(repo, f'{check.__name__}_{uuid.uuid4().hex[:6]}')
+
+
+def test_api_writes_go_through_the_repository(client):
+    created = client.post('/outfits', json={'name': 'Tenue', 'items': ['item_x', 'item_y']}).get_json()
+    assert client.put(f"/outfits/{created['id']}", json={'name': 'Tenue du soir', 'items': ['item_y']}).status_code == 200
+
+    from main import repo
+    outfit = repo.outfits.get(created['id'])
+    assert outfit['name'] == 'Tenue du soir'
+    assert outfit['items'] == ['item_y']
+    assert client.put('/outfits/outfit_inconnue', json={'name': 'X'}).status_code == 404
@@ -0,0 +1,29 @@
+from db import get_db
+from tag_index import TagIndex
+
+
+def test_tag_changed_by_another_worker_is_not_served_from_cache(client):
+    client.post('/items:batch', json=[{'id': 'item_c1', 'name': 'Jupe', 'tag_id': 'tag_c1'}])
+    # Cache d'un autre worker : il ne reçoit aucune invalidation de cette écriture
+    other = TagIndex()
+    assert other.lookup(get_db, 'tag_c1') == ('item', 'item_c1')
+    assert other.lookup(get_db, 'tag_c2') is None
+
+    conn = get_db()
+    conn.execute("UPDATE items SET tag_id = 'tag_c2' WHERE id = 'item_c1'")
+    conn.commit()
+    conn.close()
+
+    assert other.lookup(get_db, 'tag_c1') is None
+    assert other.lookup(get_db, 'tag_c2') == ('item', 'item_c1')
+
+
+def test_untagged_writes_keep_the_cache(client):
+    client.post('/items:batch', json=[{'id': 'item_c3', 'name': 'Jean', 'tag_id': 'tag_c3'}])
+    index = TagIndex()
+    index.lookup(get_db, 'tag_c3')
+
+    client.post('/items:batch?upsert=1', json=[{'id': 'item_c3', 'color': 'Bleu'}])
+
+    assert index.lookup(get_db, 'tag_c3') == ('item', 'item_c3')
+    assert index.stats()['hits'] == 1
@@ -0,0 +1,336 @@
+"""Import des items et des commandes dans l'API, en lots, avec reprise après interruption.
+
+    python api/tools/importer.py items api/tools/db-items-history.json
+    python api/tools/importer.py orders api/tools/db-orders-history.json
+    python api/tools/importer.py items gros-export.ndjson --dry-run
+
+Les enregistrements rejetés par l'API (ou dont la photo n'a pas pu être transférée) sont écrits
+dans <fichier>.rejected.ndjson, qui se réimporte tel quel une fois corrigé :
+
+    python api/tools/importer.py items api/tools/db-items-history.json.rejected.ndjson
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_API = os.environ.get('API_URL', 'http://localhost:5080')
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FILES = {
+    'items': os.path.join(TOOLS_DIR, 'db-items-history.json'),
+    'orders': os.path.join(TOOLS_DIR, 'db-orders-history.json'),
+}
+READ_CHUNK = 64 * 1024
+REJECTED_KEY = '_rejected'
+
+
+def iter_json_array(f):
+    """Éléments d'un tableau JSON lus au fil de l'eau, sans charger tout le fichier"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    started = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = f.read(READ_CHUNK)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    while True:
+        # Saute les blancs, les virgules et le crochet ouvrant
+        while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ',' or (not started and buffer[pos] == '[')):
+            started = started or buffer[pos] == '['
+            pos += 1
+        if pos >= len(buffer):
+            if eof:
+                raise ValueError("Tableau JSON non terminé")
+            fill()
+            continue
+        if not started:
+            raise ValueError("Le fichier doit contenir un tableau JSON")
+        if buffer[pos] == ']':
+            return
+        try:
+            # Les éléments sont des objets : un objet tronqué en fin de tampon échoue toujours
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        pos = end
+        yield record
+
+
+def iter_ndjson(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_records(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith(('.ndjson', '.jsonl')):
+            yield from iter_ndjson(f)
+        else:
+            yield from iter_json_array(f)
+
+
+def batches(records, size, skip=0):
+    """Lots de (index, enregistrement), en sautant les skip premiers enregistrements"""
+    batch = []
+    for index, record in enumerate(records):
+        if index < skip:
+            continue
+        batch.append((index, record))
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def make_session(workers):
+    """Session HTTP partagée : connexions réutilisées (keep-alive) et nouvelles tentatives"""
+    session = requests.Session()
+    retry = Retry(
+        total=5, backoff_factor=0.5, status_forcelist=(429, 502, 503, 504),
+        # Les lots sont en upsert et chaque enregistrement y a son id (Importer.prepare) : un lot
+        # enregistré avant l'expiration de la passerelle se rejoue sans créer de doublon
+        allowed_methods=None,
+    )
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class Checkpoint:
+    """Nombre d'enregistrements déjà importés pour un fichier, écrit de façon atomique"""
+
+    def __init__(self, path, source, kind):
+        self.path = path
+        self.key = {'source': os.path.abspath(source), 'kind': kind}
+        self.done = 0
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if all(state.get(k) == v for k, v in self.key.items()):
+                self.done = state['done']
+
+    def save(self, done):
+        self.done = done
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({**self.key, 'done': done, 'updated_at': time.time()}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class RejectedLog:
+    """Enregistrements à retenter, en NDJSON ; écrits avant que le point de reprise ne les dépasse"""
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.count = 0
+        self._file = None
+        # Nouvel import (pas une reprise) : les rejets d'un import précédent ne sont plus d'actualité
+        if not append and os.path.exists(path):
+            os.remove(path)
+
+    def write(self, index, record, error):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        # Index dans le fichier source et motif du rejet, retirés par Importer.prepare() au réimport
+        line = {**record, REJECTED_KEY: {'index': index, 'error': error}}
+        self._file.write(json.dumps(line, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def remote_photo(record):
+    photo = record.get('photo')
+    if photo and photo.startswith(('http://', 'https://')):
+        return photo
+    return None
+
+
+class Importer:
+    def __init__(self, kind, api, session, workers, dry_run=False, rejected=None, source=None):
+        self.kind = kind
+        self.source = os.path.abspath(source) if source else ''
+        self.api = api.rstrip('/')
+        self.session = session
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.dry_run = dry_run
+        self.rejected = rejected
+        self.stats = {'records': 0, 'batches': 0, 'errors': 0, 'photos': 0, 'photo_errors': 0, 'photo_bytes': 0}
+
+    def prepare(self, index, record):
+        record.pop('mock', None)
+        record.pop(REJECTED_KEY, None)
+        if not record.get('id'):
+            # Id attribué ici plutôt que par l'API : stable d'un envoi à l'autre (nouvelle tentative
+            # HTTP ou reprise au point de reprise), il ne crée jamais deux fois le même enregistrement
+            record['id'] = f"{self.kind[:-1]}_{uuid.uuid5(uuid.NAMESPACE_URL, f'{self.source}#{index}')}"
+        if self.kind == 'orders':
+            for item in record.get('items', []):
+                if isinstance(item, dict):
+                    item.pop('mock', None)
+        return record
+
+    def send_batch(self, batch):
+        records = [self.prepare(index, record) for index, record in batch]
+        self.stats['batches'] += 1
+        self.stats['records'] += len(records)
+        if self.dry_run:
+            return [(position, record.get('id')) for position, record in enumerate(records)]
+        response = self.session.post(f'{self.api}/{self.kind}:batch', params={'upsert': 1}, json=records)
+        if response.status_code not in (200, 207):
+            response.raise_for_status()
+        saved = []
+        for result in response.json()['results']:
+            index = batch[result['index']][0]
+            if result['status'] == 'error':
+                self.stats['errors'] += 1
+                print(f"  #{index} {records[result['index']].get('name', result.get('id', ''))}: {result['error']}", file=sys.stderr)
+                self.reject(index, records[result['index']], result['error'])
+            else:
+                saved.append((result['index'], result['id']))
+        return saved
+
+    def transfer_photo(self, item_id, url):
+        """Télécharge la photo distante et la téléverse en binaire (pas de base64)"""
+        response = self.session.get(url, timeout=30)
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type', 'image/jpeg')
+        if not self.dry_run:
+            upload = self.session.post(
+                f'{self.api}/items/{item_id}/photo', data=response.content,
+                headers={'Content-Type': content_type}, timeout=60
+            )
+            upload.raise_for_status()
+        return len(response.content)
+
+    def photo_jobs(self, batch, saved, fetch_photos):
+        jobs = []
+        if self.kind != 'items' or not fetch_photos:
+            return jobs
+        # L'id peut avoir été attribué par l'API
+        for position, item_id in saved:
+            index, record = batch[position]
+            url = remote_photo(record)
+            if url:
+                jobs.append((index, item_id, record, self.pool.submit(self.transfer_photo, item_id, url)))
+        return jobs
+
+    def wait_photos(self, jobs):
+        for index, item_id, record, future in jobs:
+            try:
+                self.stats['photo_bytes'] += future.result()
+                self.stats['photos'] += 1
+            except Exception as e:
+                self.stats['photo_errors'] += 1
+                print(f"  photo de {record.get('name', record.get('id'))}: {e}", file=sys.stderr)
+                # Avec l'id attribué par l'API : le réimport met à jour l'item au lieu d'en créer un autre
+                self.reject(index, {**record, 'id': item_id}, f"photo: {e}")
+
+    def reject(self, index, record, error):
+        if self.rejected is not None:
+            self.rejected.write(index, record, error)
+
+    def run(self, records, batch_size, checkpoint, fetch_photos=True):
+        pending, pending_end = [], None
+        for batch in batches(records, batch_size, skip=checkpoint.done if checkpoint else 0):
+            saved = self.send_batch(batch)
+            jobs = self.photo_jobs(batch, saved, fetch_photos)
+            # Les photos du lot précédent se sont transférées pendant l'envoi de celui-ci
+            self.wait_photos(pending)
+            if checkpoint and pending_end is not None:
+                checkpoint.save(pending_end)
+            pending, pending_end = jobs, batch[-1][0] + 1
+        self.wait_photos(pending)
+        if checkpoint and pending_end is not None:
+            checkpoint.save(pending_end)
+        self.pool.shutdown()
+        if self.rejected is not None:
+            self.rejected.close()
+
+
+def report(stats, elapsed, dry_run):
+    mode = "simulation (aucune écriture)" if dry_run else "import"
+    rate = stats['records'] / elapsed if elapsed else 0
+    print(f"\n{mode} : {stats['records']} enregistrements en {stats['batches']} lots, {elapsed:.2f} s ({rate:.0f} enr./s)")
+    if stats['errors']:
+        print(f"  {stats['errors']} enregistrements rejetés par l'API")
+    if stats['photos'] or stats['photo_errors']:
+        mb = stats['photo_bytes'] / 1e6
+        print(f"  {stats['photos']} photos : {mb:.1f} Mo à {mb / elapsed:.1f} Mo/s "
+              f"(le base64 aurait ajouté {mb / 3:.1f} Mo), {stats['photo_errors']} en échec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importe des items ou des commandes (JSON ou NDJSON) via les routes batch de l'API")
+    parser.add_argument('kind', choices=['items', 'orders'])
+    parser.add_argument('file', nargs='?', help="Fichier JSON (tableau) ou NDJSON (.ndjson, .jsonl)")
+    parser.add_argument('--api', default=DEFAULT_API, help=f"URL de l'API (défaut : {DEFAULT_API})")
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=8, help="Transferts de photos en parallèle")
+    parser.add_argument('--checkpoint', help="Fichier de reprise (défaut : <fichier>.checkpoint)")
+    parser.add_argument('--restart', action='store_true', help="Ignore le point de reprise existant")
+    parser.add_argument('--rejected', help="Fichier NDJSON des enregistrements à retenter (défaut : <fichier>.rejected.ndjson)")
+    parser.add_argument('--no-photos', action='store_true', help="Garde les liens des photos sans les téléverser")
+    parser.add_argument('--dry-run', action='store_true', help="Lit et prépare les lots sans écrire, puis affiche le débit")
+    parser.add_argument('--probe-photos', action='store_true', help="Avec --dry-run, télécharge aussi les photos pour mesurer le débit")
+    args = parser.parse_args()
+
+    path = args.file or DEFAULT_FILES[args.kind]
+    checkpoint = None
+    rejected = None
+    if not args.dry_run:
+        checkpoint = Checkpoint(args.checkpoint or f'{path}.checkpoint', path, args.kind)
+        if args.restart:
+            checkpoint.clear()
+            checkpoint.done = 0
+        elif checkpoint.done:
+            print(f"Reprise après {checkpoint.done} enregistrements déjà importés")
+        # À la reprise, les rejets des lots déjà passés restent dans le fichier
+        rejected = RejectedLog(args.rejected or f'{path}.rejected.ndjson', append=checkpoint.done > 0)
+
+    importer = Importer(args.kind, args.api, make_session(args.workers), args.workers,
+                        dry_run=args.dry_run, rejected=rejected, source=path)
+    fetch_photos = not args.no_photos and (not args.dry_run or args.probe_photos)
+    start = time.perf_counter()
+    try:
+        importer.run(iter_records(path), args.batch_size, checkpoint, fetch_photos)
+    except (requests.RequestException, ValueError) as e:
+        done = f" ; reprise possible après {checkpoint.done} enregistrements" if checkpoint else ''
+        sys.exit(f"Import interrompu : {e}{done}")
+    report(importer.stats, time.perf_counter() - start, args.dry_run)
+    if checkpoint:
+        checkpoint.clear()
+    if rejected is not None and os.path.exists(rejected.path):
+        print(f"  À retenter : python {sys.argv[0]} {args.kind} {rejected.path}")
+
+
+if __name__ == '__main__':
+    main()
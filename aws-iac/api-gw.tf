@@ -15,6 +15,13 @@ resource "aws_api_gateway_resource" "item" {
   path_part   = "{id}"
 }
 
+# Demande d'envoi direct d'une photo à S3 (URLs présignées)
+resource "aws_api_gateway_resource" "item_photo_upload" {
+  rest_api_id = aws_api_gateway_rest_api.api.id
+  parent_id   = aws_api_gateway_resource.item.id
+  path_part   = "photo-upload"
+}
+
 resource "aws_api_gateway_resource" "orders" {
   rest_api_id = aws_api_gateway_rest_api.api.id
   parent_id   = aws_api_gateway_rest_api.api.root_resource_id
@@ -50,6 +57,13 @@ resource "aws_api_gateway_method" "delete_item" {
   authorization = "NONE"
 }
 
+resource "aws_api_gateway_method" "create_photo_upload" {
+  rest_api_id   = aws_api_gateway_rest_api.api.id
+  resource_id   = aws_api_gateway_resource.item_photo_upload.id
+  http_method   = "POST"
+  authorization = "NONE"
+}
+
 resource "aws_api_gateway_method" "get_orders" {
   rest_api_id   = aws_api_gateway_rest_api.api.id
   resource_id   = aws_api_gateway_resource.orders.id
@@ -101,6 +115,15 @@ resource "aws_api_gateway_integration" "delete_item" {
   uri                     = aws_lambda_function.manage_items.invoke_arn
 }
 
+resource "aws_api_gateway_integration" "create_photo_upload" {
+  rest_api_id             = aws_api_gateway_rest_api.api.id
+  resource_id             = aws_api_gateway_resource.item_photo_upload.id
+  http_method             = aws_api_gateway_method.create_photo_upload.http_method
+  integration_http_method = "POST"
+  type                    = "AWS_PROXY"
+  uri                     = aws_lambda_function.manage_items.invoke_arn
+}
+
 resource "aws_api_gateway_integration" "get_orders" {
   rest_api_id             = aws_api_gateway_rest_api.api.id
   resource_id             = aws_api_gateway_resource.orders.id
@@ -126,10 +149,12 @@ resource "aws_api_gateway_deployment" "api" {
     aws_api_gateway_integration.create_item,
     aws_api_gateway_integration.update_item,
     aws_api_gateway_integration.delete_item,
+    aws_api_gateway_integration.create_photo_upload,
     aws_api_gateway_integration.get_orders,
     aws_api_gateway_integration.create_order,
     aws_api_gateway_integration_response.options_items,
     aws_api_gateway_integration_response.options_item,
+    aws_api_gateway_integration_response.options_item_photo_upload,
     aws_api_gateway_integration_response.options_orders
   ]
   rest_api_id = aws_api_gateway_rest_api.api.id
@@ -4,8 +4,11 @@ set -e
 # Define paths
 LAMBDA_SRC_DIR="lambda"
 LAMBDA_SRC_FINE_NAME="lambda_function.py"
+PHOTOS_SRC_FILE_NAME="photo_processor.py"
+REPOSITORY_SRC_DIR="../api/app/repository"
 BUILD_DIR="lambda_build"
 ZIP_FILE="${BUILD_DIR}/lambda.zip"
+LAYER_DIR="layer_build"
 
 echo "🔧 Cleaning previous build..."
 rm -rf "$BUILD_DIR"
@@ -13,13 +16,26 @@ mkdir -p "$BUILD_DIR"
 sleep 2
 
 echo "📦 Copying Lambda source code..."
-cp "${LAMBDA_SRC_DIR}/${LAMBDA_SRC_FINE_NAME}" "$BUILD_DIR/"
+cp "${LAMBDA_SRC_DIR}/${LAMBDA_SRC_FINE_NAME}" "${LAMBDA_SRC_DIR}/${PHOTOS_SRC_FILE_NAME}" "$BUILD_DIR/"
+
+echo "📦 Copying storage repository (DynamoDB backend)..."
+mkdir -p "$BUILD_DIR/repository"
+cp "${REPOSITORY_SRC_DIR}/__init__.py" "${REPOSITORY_SRC_DIR}/base.py" "${REPOSITORY_SRC_DIR}/dynamodb.py" "$BUILD_DIR/repository/"
 
 echo "🗜️  Creating zip archive..."
 cd "$BUILD_DIR"
 zip -r lambda.zip . > /dev/null
 cd ..
 
+echo "📦 Building Pillow layer (photo processing)..."
+rm -rf "$LAYER_DIR"
+mkdir -p "$LAYER_DIR/python"
+pip install --quiet Pillow --target "$LAYER_DIR/python" \
+    --platform manylinux2014_x86_64 --implementation cp --python-version 3.12 --only-binary=:all:
+cd "$LAYER_DIR"
+zip -r pillow.zip python > /dev/null
+cd ..
+
 echo "🔍 Generating content hash..."
 sha256sum lambda.zip > lambda.zip.sha256
 
@@ -8,9 +8,12 @@ resource "aws_lambda_function" "manage_items" {
   
   environment {
     variables = {
-      TABLE_NAME    = aws_dynamodb_table.items.name
-      ORDERS_TABLE  = aws_dynamodb_table.orders.name
-      BUCKET_NAME   = aws_s3_bucket.images.bucket
+      TABLE_NAME      = aws_dynamodb_table.items.name
+      ORDERS_TABLE    = aws_dynamodb_table.orders.name
+      HANGERS_TABLE   = aws_dynamodb_table.hangers.name
+      OUTFITS_TABLE   = aws_dynamodb_table.outfits.name
+      BUCKET_NAME     = aws_s3_bucket.images.bucket
+      PHOTO_MAX_BYTES = 20971520
     }
   }
   
@@ -18,6 +21,39 @@ resource "aws_lambda_function" "manage_items" {
   source_code_hash = filebase64sha256("lambda_build/lambda.zip")
 }
 
+# Pillow pour le traitement des photos (construit par build.sh, hors de l'archive de l'API)
+resource "aws_lambda_layer_version" "pillow" {
+  filename            = "${path.module}/layer_build/pillow.zip"
+  layer_name          = "${var.project_name}-pillow"
+  compatible_runtimes = ["python3.12"]
+  source_code_hash    = filebase64sha256("layer_build/pillow.zip")
+}
+
+# Déclinaisons des photos envoyées dans uploads/ (notification S3)
+resource "aws_lambda_function" "process_photos" {
+  filename      = "${path.module}/lambda_build/lambda.zip"
+  function_name = "${var.project_name}-process-photos"
+  role          = aws_iam_role.lambda_role.arn
+  handler       = "photo_processor.handler"
+  runtime       = "python3.12"
+  layers        = [aws_lambda_layer_version.pillow.arn]
+  memory_size   = 1024
+  timeout       = 60
+
+  environment {
+    variables = {
+      TABLE_NAME      = aws_dynamodb_table.items.name
+      ORDERS_TABLE    = aws_dynamodb_table.orders.name
+      HANGERS_TABLE   = aws_dynamodb_table.hangers.name
+      OUTFITS_TABLE   = aws_dynamodb_table.outfits.name
+      BUCKET_NAME     = aws_s3_bucket.images.bucket
+      PHOTO_MAX_BYTES = 20971520
+    }
+  }
+
+  source_code_hash = filebase64sha256("lambda_build/lambda.zip")
+}
+
 
 # Lambda permissions
 resource "aws_lambda_permission" "manage_items" {
@@ -27,3 +63,11 @@ resource "aws_lambda_permission" "manage_items" {
   principal     = "apigateway.amazonaws.com"
   source_arn    = "${aws_api_gateway_rest_api.api.execution_arn}/*/*"
 }
+
+resource "aws_lambda_permission" "process_photos" {
+  statement_id  = "AllowExecutionFromS3"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.process_photos.function_name
+  principal     = "s3.amazonaws.com"
+  source_arn    = aws_s3_bucket.images.arn
+}
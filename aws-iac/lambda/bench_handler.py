@@ -0,0 +1,222 @@
+"""Latence du handler Lambda à froid et à chaud, contre un faux DynamoDB / S3 local.
+
+    python bench_handler.py
+    python bench_handler.py --cold 20 --warm 500 --items 200 --latency 2
+
+Un petit serveur HTTP répond aux appels DynamoDB (Scan, BatchWriteItem, UpdateItem...) et S3
+(PutObject, DeleteObject) ; boto3 y est dirigé par AWS_ENDPOINT_URL. Aucun compte AWS n'est
+nécessaire. À froid : un nouvel interpréteur par mesure (import + première invocation, comme un
+nouvel environnement d'exécution). À chaud : invocations successives dans le même processus,
+avec les clients réutilisés, puis recréés à chaque invocation (comportement d'avant, pour comparer).
+Le serveur est en HTTP simple : le coût d'une poignée de main TLS réelle n'apparaît pas.
+"""
+import argparse
+import base64
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Le paquet repository vient de l'API, comme dans l'archive construite par build.sh
+REPOSITORY_DIR = os.path.normpath(os.path.join(HERE, '..', '..', 'api', 'app'))
+
+TABLE_NAME = 'bench-items'
+ORDERS_TABLE = 'bench-orders'
+HANGERS_TABLE = 'bench-hangers'
+OUTFITS_TABLE = 'bench-outfits'
+BUCKET_NAME = 'bench-images'
+
+PHOTO = 'data:image/jpeg;base64,' + base64.b64encode(b'\xff\xd8\xff' + b'\0' * 20000).decode()
+
+
+class StubAws(BaseHTTPRequestHandler):
+    """Réponses minimales et valides de DynamoDB (JSON 1.0) et de S3 (REST)"""
+
+    protocol_version = 'HTTP/1.1'
+    # En-têtes et corps en un seul envoi : sans cela, Nagle et l'ACK retardé ajoutent 40 ms
+    # par réponse sur une connexion gardée ouverte, et fausseraient la comparaison
+    wbufsize = -1
+    disable_nagle_algorithm = True
+    connections = 0
+    requests = 0
+    items = []
+    latency = 0
+
+    def setup(self):
+        super().setup()
+        StubAws.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def handle_expect_100(self):
+        # PutObject attend "100 Continue" avant d'envoyer le corps : il ne doit pas rester en tampon
+        super().handle_expect_100()
+        self.wfile.flush()
+        return True
+
+    def _reply(self, status, body=b'', content_type='application/x-amz-json-1.0', headers=None):
+        StubAws.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        operation = self.headers.get('X-Amz-Target', '').split('.')[-1]
+        if operation == 'Scan':
+            # Scan parallèle : chaque segment reçoit sa part des items
+            items = self.items[request.get('Segment', 0)::request.get('TotalSegments', 1)]
+            response = {'Items': items, 'Count': len(items), 'ScannedCount': len(items)}
+        elif operation == 'BatchWriteItem':
+            response = {'UnprocessedItems': {}}
+        elif operation == 'UpdateItem':
+            response = {'Attributes': {'id': request['Key']['id'], 'name': {'S': 'Jupe'}}}
+        elif operation == 'BatchGetItem':
+            response = {'Responses': {}, 'UnprocessedKeys': {}}
+        else:
+            response = {}
+        self._reply(200, json.dumps(response).encode())
+
+    def do_PUT(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self._reply(200, content_type='application/xml', headers={'ETag': '"bench"'})
+
+    def do_DELETE(self):
+        self._reply(204, content_type='application/xml')
+
+
+def start_stub(items, latency):
+    StubAws.items = [
+        {'id': {'S': f'item_{i}'}, 'name': {'S': f'Jupe {i}'}, 'category': {'S': 'Jupes'},
+         'color': {'S': 'Rouge'}, 'size': {'S': 'M'}}
+        for i in range(items)
+    ]
+    StubAws.latency = latency / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubAws)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def lambda_env(endpoint):
+    return {
+        **os.environ,
+        'PYTHONPATH': os.pathsep.join([HERE, REPOSITORY_DIR]),
+        'AWS_ENDPOINT_URL': endpoint,
+        'AWS_ACCESS_KEY_ID': 'bench',
+        'AWS_SECRET_ACCESS_KEY': 'bench',
+        'AWS_DEFAULT_REGION': 'eu-west-1',
+        'TABLE_NAME': TABLE_NAME,
+        'ORDERS_TABLE': ORDERS_TABLE,
+        'HANGERS_TABLE': HANGERS_TABLE,
+        'OUTFITS_TABLE': OUTFITS_TABLE,
+        'BUCKET_NAME': BUCKET_NAME,
+    }
+
+
+def events():
+    """Invocations mesurées : liste, création sans et avec photo, mise à jour"""
+    return {
+        'GET /items': {'httpMethod': 'GET', 'path': '/items', 'resource': '/items'},
+        'POST /items': {'httpMethod': 'POST', 'path': '/items', 'resource': '/items', 'body': json.dumps(
+            {'name': 'Jupe', 'category': 'Jupes', 'color': 'Rouge', 'size': 'M'})},
+        'POST /items (photo)': {'httpMethod': 'POST', 'path': '/items', 'resource': '/items', 'body': json.dumps(
+            {'name': 'Jupe', 'category': 'Jupes', 'color': 'Rouge', 'size': 'M', 'photo': PHOTO})},
+        'PUT /items/{id}': {'httpMethod': 'PUT', 'path': '/items/item_1', 'resource': '/items/{id}',
+                            'pathParameters': {'id': 'item_1'}, 'body': json.dumps(
+            {'name': 'Jupe', 'category': 'Jupes', 'color': 'Rouge', 'size': 'M'})},
+    }
+
+
+def child():
+    """Un démarrage à froid : import du module puis deux invocations (résultat en JSON)"""
+    start = time.perf_counter()
+    import lambda_function
+    imported = time.perf_counter()
+    event = events()['GET /items']
+    response = lambda_function.handler(event, None)
+    first = time.perf_counter()
+    lambda_function.handler(event, None)
+    second = time.perf_counter()
+    assert response['statusCode'] == 200, response
+    print(json.dumps({'import': imported - start, 'first': first - imported, 'second': second - first}))
+
+
+def cold(endpoint, runs):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, __file__, '--child'], env=lambda_env(endpoint),
+                                check=True, capture_output=True, text=True).stdout
+        samples.append(json.loads(output))
+    return samples
+
+
+def warm(runs, reuse_clients):
+    import lambda_function
+    results = {}
+    for label, event in events().items():
+        durations = []
+        connections = StubAws.connections
+        for _ in range(runs):
+            if not reuse_clients:
+                # Comme avant : session, identifiants et connexions recréés à chaque invocation
+                lambda_function._clients.clear()
+            start = time.perf_counter()
+            response = lambda_function.handler(event, None)
+            durations.append(time.perf_counter() - start)
+            assert response['statusCode'] in (200, 201), (label, response)
+        durations.sort()
+        results[label] = (durations, StubAws.connections - connections)
+    return results
+
+
+def ms(value):
+    return f'{value * 1000:7.2f}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latence à froid et à chaud du handler Lambda (AWS simulé en local)")
+    parser.add_argument('--cold', type=int, default=10, help="Démarrages à froid mesurés")
+    parser.add_argument('--warm', type=int, default=200, help="Invocations à chaud par route")
+    parser.add_argument('--items', type=int, default=100, help="Items renvoyés par le Scan simulé")
+    parser.add_argument('--latency', type=float, default=0, help="Latence ajoutée par appel AWS simulé (ms)")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    server = start_stub(args.items, args.latency)
+    endpoint = f'http://127.0.0.1:{server.server_port}'
+    samples = cold(endpoint, args.cold)
+    print(f"À froid ({args.cold} processus, ms)   médiane    max")
+    for key, label in (('import', 'import du module'), ('first', '1re invocation'), ('second', '2e invocation')):
+        values = [sample[key] for sample in samples]
+        print(f"  {label:<28} {ms(statistics.median(values))} {ms(max(values))}")
+
+    os.environ.update({name: value for name, value in lambda_env(endpoint).items() if name != 'PYTHONPATH'})
+    sys.path[:0] = [HERE, REPOSITORY_DIR]
+    print(f"\nÀ chaud ({args.warm} invocations par route, ms)")
+    print(f"  {'route':<22} {'clients':<10} {'p50':>7} {'p99':>7}  connexions")
+    for reuse in (True, False):
+        for label, (durations, connections) in warm(args.warm, reuse).items():
+            print(f"  {label:<22} {'réutilisés' if reuse else 'recréés':<10} {ms(statistics.median(durations))} "
+                  f"{ms(durations[int(len(durations) * 0.99)])}  {connections}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
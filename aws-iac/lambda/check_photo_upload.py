@@ -0,0 +1,166 @@
+"""Parcours complet d'un envoi de photo direct à S3, sur moto (aucun compte AWS nécessaire).
+
+    pip install boto3 requests pillow "moto[dynamodb,s3]"
+    python check_photo_upload.py
+
+Demande d'envoi (POST /items/{id}/photo-upload), envoi du fichier en POST de formulaire puis en
+PUT sur les URLs présignées, notification S3 simulée (moto ne déclenche pas de Lambda), traitement
+par photo_processor, puis vérification de l'item et des objets S3. Les refus sont vérifiés aussi :
+type non accepté, taille hors limite, item inconnu, fichier qui n'est pas une image. Enfin, la
+suppression des items retire leurs photos de S3, une fois qu'aucun autre item ne les partage.
+"""
+import io
+import json
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Le paquet repository vient de l'API, comme dans l'archive construite par build.sh
+sys.path[:0] = [HERE, os.path.normpath(os.path.join(HERE, '..', '..', 'api', 'app'))]
+
+os.environ.update({
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'AWS_DEFAULT_REGION': 'eu-west-1',
+    'TABLE_NAME': 'check-items',
+    'ORDERS_TABLE': 'check-orders',
+    'HANGERS_TABLE': 'check-hangers',
+    'OUTFITS_TABLE': 'check-outfits',
+    'BUCKET_NAME': 'check-photos',
+})
+
+import boto3
+import requests
+from botocore.stub import Stubber
+from moto import mock_aws
+from PIL import Image
+
+
+def jpeg(width=1200, height=900):
+    output = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 40, 90)).save(output, 'JPEG')
+    return output.getvalue()
+
+
+def s3_event(bucket, key):
+    """Notification ObjectCreated telle que S3 l'envoie (clé encodée comme dans une URL)"""
+    return {'Records': [{
+        'eventName': 'ObjectCreated:Post',
+        's3': {'bucket': {'name': bucket}, 'object': {'key': key.replace(' ', '+')}},
+    }]}
+
+
+def intent(lambda_function, item_id, body):
+    return lambda_function.handler({
+        'httpMethod': 'POST',
+        'path': f'/items/{item_id}/photo-upload',
+        'resource': '/items/{id}/photo-upload',
+        'pathParameters': {'id': item_id},
+        'body': json.dumps(body),
+    }, None)
+
+
+def delete(lambda_function, item_id):
+    return lambda_function.handler({
+        'httpMethod': 'DELETE',
+        'path': f'/items/{item_id}',
+        'resource': '/items/{id}',
+        'pathParameters': {'id': item_id},
+    }, None)
+
+
+def bucket_keys(bucket):
+    return {obj['Key'] for obj in boto3.client('s3').list_objects_v2(Bucket=bucket).get('Contents', [])}
+
+
+def check(label, condition):
+    print(f"{'OK   ' if condition else 'ECHEC'} {label}")
+    return 0 if condition else 1
+
+
+def main():
+    failures = 0
+    with mock_aws():
+        import lambda_function
+        import photo_processor
+        from repository import open_repository
+
+        bucket = os.environ['BUCKET_NAME']
+        boto3.client('s3').create_bucket(Bucket=bucket,
+                                         CreateBucketConfiguration={'LocationConstraint': 'eu-west-1'})
+        open_repository('dynamodb', tables={
+            'items': os.environ['TABLE_NAME'], 'orders': os.environ['ORDERS_TABLE'],
+            'hangers': os.environ['HANGERS_TABLE'], 'outfits': os.environ['OUTFITS_TABLE'],
+        }).create_tables()
+        items = lambda_function.get_repository().items
+        items.put({'id': 'item_post', 'name': 'Jupe', 'category': 'Jupes', 'color': 'Rouge', 'size': 'M'})
+        items.put({'id': 'item_put', 'name': 'Robe', 'category': 'Robes', 'color': 'Bleu', 'size': 'S'})
+        photo = jpeg()
+
+        # Formulaire POST présigné
+        response = intent(lambda_function, 'item_post', {'content_type': 'image/jpeg', 'size': len(photo)})
+        failures += check("demande d'envoi acceptée (201)", response['statusCode'] == 201)
+        upload = json.loads(response['body'])
+        sent = requests.post(upload['post']['url'], data=upload['post']['fields'],
+                             files={'file': ('photo.jpg', photo, 'image/jpeg')})
+        failures += check(f"envoi POST vers S3 ({sent.status_code})", sent.status_code in (200, 204))
+        photo_processor.handler(s3_event(bucket, upload['key']), None)
+        item = items.get('item_post')
+        failures += check("photo et déclinaisons renseignées sur l'item",
+                          all(item[field] for field in ('photo', 'photo_hash', 'photo_thumb', 'photo_medium', 'photo_full')))
+        keys = {obj['Key'] for obj in boto3.client('s3').list_objects_v2(Bucket=bucket).get('Contents', [])}
+        failures += check("original et déclinaisons dans S3, envoi supprimé",
+                          upload['key'] not in keys and len(keys) == 4)
+        thumb = boto3.client('s3').get_object(Bucket=bucket, Key=item['photo_thumb'].split('.com/', 1)[1])
+        with Image.open(io.BytesIO(thumb['Body'].read())) as image:
+            failures += check(f"miniature WebP de {image.size[0]}x{image.size[1]}",
+                              image.format == 'WEBP' and max(image.size) == 160)
+        failures += check("notification rejouée sans effet",
+                          photo_processor.handler(s3_event(bucket, upload['key']), None) == {'processed': 0})
+        # Sans s3:ListBucket, S3 répond 403 (et non 404) sur l'envoi déjà supprimé
+        with Stubber(lambda_function.s3()) as stub:
+            stub.add_client_error('head_object', service_error_code='403', http_status_code=403)
+            failures += check("notification rejouée sans effet, même en 403",
+                              photo_processor.handler(s3_event(bucket, upload['key']), None) == {'processed': 0})
+
+        # URL PUT présignée, même photo : les objets adressés par contenu sont partagés
+        upload = json.loads(intent(lambda_function, 'item_put', {'content_type': 'image/jpeg'})['body'])
+        sent = requests.put(upload['put']['url'], data=photo, headers=upload['put']['headers'])
+        failures += check(f"envoi PUT vers S3 ({sent.status_code})", sent.status_code == 200)
+        photo_processor.handler(s3_event(bucket, upload['key']), None)
+        failures += check("même photo : mêmes URLs", items.get('item_put')['photo_full'] == item['photo_full'])
+
+        # Refus
+        failures += check("type non accepté (400)",
+                          intent(lambda_function, 'item_post', {'content_type': 'image/svg+xml'})['statusCode'] == 400)
+        failures += check("taille hors limite (400)", intent(lambda_function, 'item_post', {
+            'content_type': 'image/jpeg', 'size': lambda_function.PHOTO_MAX_BYTES + 1})['statusCode'] == 400)
+        failures += check("item inconnu (404)",
+                          intent(lambda_function, 'item_unknown', {'content_type': 'image/png'})['statusCode'] == 404)
+        upload = json.loads(intent(lambda_function, 'item_put', {'content_type': 'image/png'})['body'])
+        requests.put(upload['put']['url'], data=b'pas une image', headers=upload['put']['headers'])
+        photo_processor.handler(s3_event(bucket, upload['key']), None)
+        keys = {obj['Key'] for obj in boto3.client('s3').list_objects_v2(Bucket=bucket).get('Contents', [])}
+        failures += check("fichier illisible supprimé, item inchangé",
+                          upload['key'] not in keys and items.get('item_put')['photo_full'] == item['photo_full'])
+
+        # Suppression : la photo partagée reste tant qu'un item l'utilise
+        photos = {key for key in bucket_keys(bucket) if key.startswith(('originals/', 'r/'))}
+        failures += check("item supprimé (200)", delete(lambda_function, 'item_post')['statusCode'] == 200)
+        failures += check("photo partagée gardée pour l'autre item", photos <= bucket_keys(bucket))
+        delete(lambda_function, 'item_put')
+        failures += check("dernier item supprimé : original et déclinaisons supprimés",
+                          not photos & bucket_keys(bucket) and len(photos) == 4)
+
+        # Item supprimé pendant le traitement de son envoi : rien ne reste dans S3
+        items.put({'id': 'item_gone', 'name': 'Short', 'category': 'Shorts', 'color': 'Noir', 'size': 'L'})
+        upload = json.loads(intent(lambda_function, 'item_gone', {'content_type': 'image/jpeg'})['body'])
+        requests.put(upload['put']['url'], data=jpeg(800, 600), headers=upload['put']['headers'])
+        items.delete('item_gone')
+        photo_processor.handler(s3_event(bucket, upload['key']), None)
+        failures += check("item supprimé avant le traitement : aucun objet orphelin", not bucket_keys(bucket))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
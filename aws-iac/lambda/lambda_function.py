@@ -1,80 +1,149 @@
-# GET Items Lambda
+# API serverless des items et commandes (API Gateway -> Lambda -> DynamoDB / S3)
 import json
 import boto3
 import os
-import uuid
 import base64
+import uuid
 from datetime import datetime
 
-def handler(event, context):
-    method = event["httpMethod"]
-    path = event["path"]
-    
-    if "/orders" in path:
-        if method == "GET":
-            return get_orders(event, context)
-        elif method == "POST":
-            return create_order(event, context)
-    else:
-        if method == "POST":
-            return create_item(event, context)
-        elif method == "GET":
-            return get_items(event, context)
-        elif method == "PUT":
-            return update_item(event, context)
-        elif method == "DELETE":
-            return delete_item(event, context)
-    
-    return {"statusCode": 405, "body": "Method Not Allowed"}
+from botocore.config import Config
+
+# Même interface de stockage que l'API Flask (api/app/repository, copié par build.sh)
+from repository import PAGE_MAX, InvalidCursor, new_id, open_repository
+
+# Connexions HTTP gardées ouvertes entre deux invocations d'un même environnement d'exécution
+BOTO_CONFIG = Config(
+    tcp_keepalive=True,
+    max_pool_connections=int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', 10)),
+    connect_timeout=float(os.environ.get('AWS_CONNECT_TIMEOUT', 2)),
+    read_timeout=float(os.environ.get('AWS_READ_TIMEOUT', 5)),
+    retries={'mode': 'standard', 'max_attempts': int(os.environ.get('AWS_MAX_ATTEMPTS', 3))},
+)
+
+# Photos envoyées directement à S3 (URLs présignées) : types acceptés -> extension, taille max
+PHOTO_TYPES = {
+    'image/jpeg': 'jpeg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'image/gif': 'gif',
+}
+PHOTO_MAX_BYTES = int(os.environ.get('PHOTO_MAX_BYTES', 20 * 1024 * 1024))
+UPLOAD_EXPIRES = int(os.environ.get('UPLOAD_EXPIRES', 300))
+# Préfixe surveillé par photo_processor (notification S3)
+UPLOAD_PREFIX = 'uploads/'
+# Objets écrits par photo_processor, adressés par contenu : originals/<hash>.<ext>, r/<hash>/<nom>.webp
+PHOTO_PREFIXES = ('originals/', 'r/')
+PHOTO_FIELDS = ('photo', 'photo_thumb', 'photo_medium', 'photo_full')
+
+CORS_HEADERS = {'Access-Control-Allow-Origin': '*'}
+LIST_HEADERS = {
+    **CORS_HEADERS,
+    'Access-Control-Allow-Headers': 'Content-Type',
+    'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS',
+    # Curseur de la page suivante, lisible par le site (CORS)
+    'Access-Control-Expose-Headers': 'X-Next-Cursor'
+}
+
+# Clients créés à la première invocation qui en a besoin, puis réutilisés par les suivantes :
+# la résolution des identifiants et l'ouverture des connexions ne se paient qu'une fois
+_clients = {}
+
+
+def s3():
+    client = _clients.get('s3')
+    if client is None:
+        client = _clients['s3'] = boto3.client('s3', config=BOTO_CONFIG)
+    return client
+
+
+def get_repository():
+    repo = _clients.get('repository')
+    if repo is None:
+        resource = boto3.resource('dynamodb', config=BOTO_CONFIG)
+        repo = _clients['repository'] = open_repository('dynamodb', resource=resource, tables={
+            'items': os.environ['TABLE_NAME'],
+            'orders': os.environ['ORDERS_TABLE'],
+            'hangers': os.environ['HANGERS_TABLE'],
+            'outfits': os.environ['OUTFITS_TABLE'],
+        })
+    return repo
+
+
+def public_url(bucket, key):
+    return f"https://{bucket}.s3.amazonaws.com/{key}"
+
+
+def photo_keys(bucket, item):
+    """Clés S3 à supprimer avec l'item : l'ancienne photo items/<id>.jpg, l'original et les déclinaisons"""
+    keys = [f"items/{item['id']}.jpg"]
+    digest = item.get('photo_hash')
+    # La même photo envoyée pour deux items donne les mêmes objets : ils restent tant qu'un autre item les utilise
+    if not digest or any(other != item['id'] for other in get_repository().items.with_photo(digest, limit=2)):
+        return keys
+    prefix = public_url(bucket, '')
+    for field in PHOTO_FIELDS:
+        url = item.get(field) or ''
+        if url.startswith(prefix) and url[len(prefix):].startswith(PHOTO_PREFIXES):
+            keys.append(url[len(prefix):])
+    return keys
+
+
+def respond(status, body, headers=CORS_HEADERS):
+    return {'statusCode': status, 'headers': headers, 'body': json.dumps(body)}
+
+
+def error(e):
+    return respond(500, {'error': str(e)})
+
+
+def page_request(event):
+    """Paramètres ?limit=&cursor= ; (None, None) si la requête n'en porte pas"""
+    params = event.get('queryStringParameters') or {}
+    limit = params.get('limit')
+    return (int(limit) if limit else None), (params.get('cursor') or None)
+
+
+def respond_page(page, headers):
+    """Page de résultats ; le curseur opaque de la suite dans X-Next-Cursor (absent à la dernière page)"""
+    if page.cursor:
+        headers = {**headers, 'X-Next-Cursor': page.cursor}
+    return respond(200, page.records, headers)
+
 
 def get_items(event, context):
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table(os.environ['TABLE_NAME'])
-    
     try:
-        response = table.scan()
-        items = response['Items']
-        
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
-            },
-            'body': json.dumps(items)
-        }
+        limit, cursor = page_request(event)
+        items = get_repository().items
+        if limit is None and cursor is None:
+            # Sans pagination demandée : toute la table, lue en segments parallèles
+            return respond(200, items.export(), LIST_HEADERS)
+        return respond_page(items.page(limit, cursor), LIST_HEADERS)
+    except (ValueError, InvalidCursor) as e:
+        return respond(400, {'error': str(e)})
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)})
-        }
+        return error(e)
+
 
 def create_item(event, context):
-    dynamodb = boto3.resource('dynamodb')
-    s3 = boto3.client('s3')
-    table = dynamodb.Table(os.environ['TABLE_NAME'])
     bucket = os.environ['BUCKET_NAME']
-    
     try:
         body = json.loads(event['body'])
-        item_id = str(uuid.uuid4())
-        
+        item_id = new_id('items')
+
         # Handle photo upload to S3
         photo_url = None
         if body.get('photo'):
             photo_data = body['photo'].split(',')[1]  # Remove data:image/jpeg;base64,
             photo_key = f"items/{item_id}.jpg"
-            
-            s3.put_object(
+
+            s3().put_object(
                 Bucket=bucket,
                 Key=photo_key,
                 Body=base64.b64decode(photo_data),
                 ContentType='image/jpeg'
             )
-            photo_url = f"https://{bucket}.s3.amazonaws.com/{photo_key}"
-        
+            photo_url = public_url(bucket, photo_key)
+
         item = {
             'id': item_id,
             'name': body['name'],
@@ -83,127 +152,149 @@ def create_item(event, context):
             'size': body['size'],
             'photo': photo_url
         }
-        
-        table.put_item(Item=item)
-        
-        return {
-            'statusCode': 201,
-            'headers': {'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps(item)
-        }
+        get_repository().items.put(item)
+        return respond(201, item)
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)})
-        }
+        return error(e)
+
 
-# UPDATE Item Lambda
 def update_item(event, context):
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table(os.environ['TABLE_NAME'])
-    
     try:
         item_id = event['pathParameters']['id']
         body = json.loads(event['body'])
-        
-        table.update_item(
-            Key={'id': item_id},
-            UpdateExpression='SET #name = :name, category = :category, color = :color, size = :size',
-            ExpressionAttributeNames={'#name': 'name'},
-            ExpressionAttributeValues={
-                ':name': body['name'],
-                ':category': body['category'],
-                ':color': body['color'],
-                ':size': body['size']
-            }
-        )
-        
-        return {
-            'statusCode': 200,
-            'headers': {'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'message': 'Item updated successfully'})
-        }
+
+        updated = get_repository().items.update(item_id, {
+            'name': body['name'],
+            'category': body['category'],
+            'color': body['color'],
+            'size': body['size']
+        })
+        if updated is None:
+            return respond(404, {'error': 'Item not found'})
+        return respond(200, {'message': 'Item updated successfully'})
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)})
-        }
+        return error(e)
+
 
-# DELETE Item Lambda
 def delete_item(event, context):
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table(os.environ['TABLE_NAME'])
-    s3 = boto3.client('s3')
+    try:
+        item_id = event['pathParameters']['id']
+        bucket = os.environ['BUCKET_NAME']
+        items = get_repository().items
+        item = items.get(item_id)
+        items.delete(item_id)
+        keys = photo_keys(bucket, item) if item is not None else [f"items/{item_id}.jpg"]
+        s3().delete_objects(Bucket=bucket, Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True})
+        return respond(200, {'message': 'Item deleted successfully'})
+    except Exception as e:
+        return error(e)
+
 
+def create_photo_upload(event, context):
+    """Autorisation d'envoi d'une photo directement à S3, sans passer par la Lambda.
+
+    Corps : {"content_type": "image/jpeg", "size": 123456}. Réponse : un formulaire POST présigné
+    (type et taille imposés par S3) et une URL PUT présignée. photo_processor génère ensuite les
+    déclinaisons et renseigne les URLs sur l'item.
+    """
     try:
         item_id = event['pathParameters']['id']
-        
-        table.delete_item(Key={'id': item_id})
-        s3.delete_object(Bucket=os.environ['BUCKET_NAME'], Key=f"items/{item_id}.jpg")
-        return {
-            'statusCode': 200,
-            'headers': {'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'message': 'Item deleted successfully'})
-        }
+        body = json.loads(event.get('body') or '{}')
+        content_type = body.get('content_type')
+        size = body.get('size')
+        if content_type not in PHOTO_TYPES:
+            return respond(400, {'error': f"Unsupported image type: {content_type}"})
+        if size is not None and (not isinstance(size, int) or not 0 < size <= PHOTO_MAX_BYTES):
+            return respond(400, {'error': f"Photo size must be between 1 and {PHOTO_MAX_BYTES} bytes"})
+        if get_repository().items.get(item_id) is None:
+            return respond(404, {'error': 'Item not found'})
+
+        bucket = os.environ['BUCKET_NAME']
+        key = f"{UPLOAD_PREFIX}{item_id}/{uuid.uuid4().hex}.{PHOTO_TYPES[content_type]}"
+        post = s3().generate_presigned_post(
+            Bucket=bucket,
+            Key=key,
+            Fields={'Content-Type': content_type},
+            Conditions=[{'Content-Type': content_type}, ['content-length-range', 1, PHOTO_MAX_BYTES]],
+            ExpiresIn=UPLOAD_EXPIRES,
+        )
+        put_params = {'Bucket': bucket, 'Key': key, 'ContentType': content_type}
+        put_url = s3().generate_presigned_url('put_object', Params=put_params, ExpiresIn=UPLOAD_EXPIRES)
+        return respond(201, {
+            'key': key,
+            'max_bytes': PHOTO_MAX_BYTES,
+            'expires_in': UPLOAD_EXPIRES,
+            'post': post,
+            # En PUT, S3 n'impose pas de taille : photo_processor rejette les fichiers trop gros
+            'put': {'url': put_url, 'headers': {'Content-Type': content_type}},
+        })
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)})
-        }
+        return error(e)
+
 
 def get_orders(event, context):
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table(os.environ['ORDERS_TABLE'])
-    
     try:
-        response = table.scan()
-        orders = response['Items']
-        orders.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-        
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
-            },
-            'body': json.dumps(orders)
-        }
+        limit, cursor = page_request(event)
+        headers = {**LIST_HEADERS, 'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'}
+        # Index orders_by_timestamp : déjà de la plus récente à la plus ancienne
+        orders = get_repository().orders
+        if limit is None and cursor is None:
+            records = []
+            while True:
+                page = orders.latest(PAGE_MAX, cursor)
+                records.extend(page.records)
+                cursor = page.cursor
+                if cursor is None:
+                    return respond(200, records, headers)
+        return respond_page(orders.latest(limit, cursor), headers)
+    except (ValueError, InvalidCursor) as e:
+        return respond(400, {'error': str(e)})
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)})
-        }
+        return error(e)
+
 
 def create_order(event, context):
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table(os.environ['ORDERS_TABLE'])
-    
     try:
         body = json.loads(event['body'])
-        order_id = str(uuid.uuid4())
-        
         order = {
-            'id': order_id,
+            'id': new_id('orders'),
             'items': body['items'],
             'timestamp': datetime.now().isoformat() + 'Z',
             'status': 'En cours'
         }
-        
-        table.put_item(Item=order)
-        
-        return {
-            'statusCode': 201,
-            'headers': {'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps(order)
-        }
+        get_repository().orders.put(order)
+        return respond(201, order)
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)})
-        }
\ No newline at end of file
+        return error(e)
+
+
+# Ressource API Gateway (api-gw.tf) -> méthode HTTP -> fonction
+ROUTES = {
+    '/items': {'GET': get_items, 'POST': create_item},
+    '/items/{id}': {'PUT': update_item, 'DELETE': delete_item},
+    '/items/{id}/photo-upload': {'POST': create_photo_upload},
+    '/orders': {'GET': get_orders, 'POST': create_order},
+}
+
+
+def route(event):
+    """Ressource de la requête : event['resource'] en proxy API Gateway, sinon déduite du chemin"""
+    resource = event.get('resource')
+    if resource in ROUTES:
+        return resource
+    parts = event['path'].rstrip('/').split('/')
+    if len(parts) == 3 and parts[1] == 'items':
+        return '/items/{id}'
+    if len(parts) == 4 and parts[1] == 'items':
+        return '/items/{id}/' + parts[3]
+    return '/' + parts[1] if len(parts) > 1 else '/'
+
+
+def handler(event, context):
+    methods = ROUTES.get(route(event))
+    if methods is None:
+        return {"statusCode": 404, "headers": CORS_HEADERS, "body": "Not Found"}
+    function = methods.get(event["httpMethod"])
+    if function is None:
+        return {"statusCode": 405, "headers": CORS_HEADERS, "body": "Method Not Allowed"}
+    return function(event, context)
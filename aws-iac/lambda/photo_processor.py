@@ -0,0 +1,109 @@
+# Traitement des photos envoyées directement à S3 (notification ObjectCreated sur uploads/)
+#
+# uploads/<item_id>/<uuid>.<ext> -> originals/<hash>.<ext> et r/<hash>/{thumb,medium,full}.webp,
+# puis photo, photo_hash et photo_<déclinaison> renseignés sur l'item. Mêmes déclinaisons et même
+# adressage par contenu que api/app/photos.py. Pillow vient de la couche construite par build.sh.
+import hashlib
+import io
+import logging
+from urllib.parse import unquote_plus
+
+from botocore.exceptions import ClientError
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from lambda_function import PHOTO_MAX_BYTES, PHOTO_TYPES, UPLOAD_PREFIX, get_repository, photo_keys, public_url, s3
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Déclinaisons WebP générées pour chaque photo : nom -> (côté max en px, qualité)
+RENDITIONS = {
+    'thumb': (160, 70),
+    'medium': (640, 80),
+    'full': (2048, 85),
+}
+# Les clés contiennent le hash du contenu : les objets ne changent jamais
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def render(data):
+    """Déclinaisons WebP d'une image : nom -> octets ; ValueError si ce n'est pas une image"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+        image = Image.open(io.BytesIO(data))
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        raise ValueError("Invalid image")
+    with image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+        renditions = {}
+        for name, (max_side, quality) in RENDITIONS.items():
+            rendition = image.copy()
+            rendition.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+            output = io.BytesIO()
+            rendition.save(output, 'WEBP', quality=quality, method=4)
+            renditions[name] = output.getvalue()
+        return renditions
+
+
+def process(bucket, key):
+    """Traite un envoi ; renvoie l'item mis à jour, ou None si l'envoi est rejeté ou déjà traité"""
+    item_id = key[len(UPLOAD_PREFIX):].split('/')[0]
+    try:
+        head = s3().head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        # Notification livrée deux fois : l'envoi a déjà été traité puis supprimé. S3 répond 403
+        # au lieu de 404 sur une clé absente si le rôle n'a pas s3:ListBucket sur le bucket.
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', '403', 'AccessDenied'):
+            logger.info("Envoi déjà traité : %s", key)
+            return None
+        raise
+    ext = PHOTO_TYPES.get(head.get('ContentType', '').split(';')[0].strip().lower())
+    # Une URL PUT présignée ne borne pas la taille : le contrôle se fait ici
+    if ext is None or not 0 < head['ContentLength'] <= PHOTO_MAX_BYTES:
+        logger.warning("Envoi rejeté (%s, %s octets) : %s", head.get('ContentType'), head['ContentLength'], key)
+        s3().delete_object(Bucket=bucket, Key=key)
+        return None
+
+    data = s3().get_object(Bucket=bucket, Key=key)['Body'].read()
+    try:
+        renditions = render(data)
+    except ValueError:
+        logger.warning("Envoi rejeté (image illisible) : %s", key)
+        s3().delete_object(Bucket=bucket, Key=key)
+        return None
+
+    digest = hashlib.sha256(data).hexdigest()
+    original = f"originals/{digest[:2]}/{digest}.{ext}"
+    # Copie côté S3 : l'original n'est pas renvoyé depuis la Lambda
+    s3().copy_object(Bucket=bucket, Key=original, CopySource={'Bucket': bucket, 'Key': key},
+                     MetadataDirective='REPLACE', ContentType=head['ContentType'], CacheControl=IMMUTABLE)
+    columns = {'photo': public_url(bucket, original), 'photo_hash': digest}
+    for name, body in renditions.items():
+        rendition = f"r/{digest[:2]}/{digest}/{name}.webp"
+        s3().put_object(Bucket=bucket, Key=rendition, Body=body, ContentType='image/webp', CacheControl=IMMUTABLE)
+        columns[f'photo_{name}'] = public_url(bucket, rendition)
+
+    item = get_repository().items.update(item_id, columns)
+    keys = [key]
+    if item is None:
+        logger.warning("Item %s supprimé avant la fin du traitement de %s", item_id, key)
+        # Comme delete_item : original et déclinaisons supprimés, sauf si un autre item a la même photo
+        keys += photo_keys(bucket, {'id': item_id, **columns})
+    s3().delete_objects(Bucket=bucket, Delete={'Objects': [{'Key': k} for k in keys], 'Quiet': True})
+    return item
+
+
+def handler(event, context):
+    processed = 0
+    for record in event.get('Records', []):
+        if not record.get('eventName', '').startswith('ObjectCreated'):
+            continue
+        bucket = record['s3']['bucket']['name']
+        # Les clés des notifications S3 sont encodées comme dans une URL (espaces en +)
+        key = unquote_plus(record['s3']['object']['key'])
+        if key.startswith(UPLOAD_PREFIX) and process(bucket, key) is not None:
+            processed += 1
+    return {'processed': processed}
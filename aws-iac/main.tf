@@ -13,6 +13,37 @@ resource "aws_s3_bucket_cors_configuration" "images" {
   }
 }
 
+# Photos envoyées directement par le site (URLs présignées) : traitées par process_photos
+resource "aws_s3_bucket_notification" "images" {
+  bucket = aws_s3_bucket.images.id
+
+  lambda_function {
+    lambda_function_arn = aws_lambda_function.process_photos.arn
+    events              = ["s3:ObjectCreated:*"]
+    filter_prefix       = "uploads/"
+  }
+
+  depends_on = [aws_lambda_permission.process_photos]
+}
+
+# Envois jamais traités (rejetés ou abandonnés)
+resource "aws_s3_bucket_lifecycle_configuration" "images" {
+  bucket = aws_s3_bucket.images.id
+
+  rule {
+    id     = "expire-uploads"
+    status = "Enabled"
+
+    filter {
+      prefix = "uploads/"
+    }
+
+    expiration {
+      days = 1
+    }
+  }
+}
+
 resource "aws_s3_bucket_public_access_block" "images" {
   bucket                  = aws_s3_bucket.images.id
   block_public_acls       = false
@@ -56,6 +87,18 @@ resource "aws_dynamodb_table" "items" {
     name = "id"
     type = "S"
   }
+
+  attribute {
+    name = "photo_hash"
+    type = "S"
+  }
+
+  # Items par photo : une photo adressée par contenu n'est supprimée de S3 qu'avec son dernier item
+  global_secondary_index {
+    name            = "items_by_photo_hash"
+    hash_key        = "photo_hash"
+    projection_type = "KEYS_ONLY"
+  }
 }
 
 # DynamoDB Table for Orders
@@ -68,6 +111,47 @@ resource "aws_dynamodb_table" "orders" {
     name = "id"
     type = "S"
   }
+
+  attribute {
+    name = "kind"
+    type = "S"
+  }
+
+  attribute {
+    name = "timestamp"
+    type = "S"
+  }
+
+  # Commandes de la plus récente à la plus ancienne (kind = "order" sur toutes les commandes datées)
+  global_secondary_index {
+    name            = "orders_by_timestamp"
+    hash_key        = "kind"
+    range_key       = "timestamp"
+    projection_type = "ALL"
+  }
+}
+
+# DynamoDB Tables for Hangers and Outfits (collections hangers et outfits de api/app/repository)
+resource "aws_dynamodb_table" "hangers" {
+  name         = "${var.project_name}-hangers"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "id"
+
+  attribute {
+    name = "id"
+    type = "S"
+  }
+}
+
+resource "aws_dynamodb_table" "outfits" {
+  name         = "${var.project_name}-outfits"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "id"
+
+  attribute {
+    name = "id"
+    type = "S"
+  }
 }
 
 # IAM Role for Lambda
@@ -96,13 +180,19 @@ resource "aws_iam_role_policy" "lambda_policy" {
       },
       {
         Effect   = "Allow"
-        Action   = ["dynamodb:GetItem", "dynamodb:PutItem", "dynamodb:UpdateItem", "dynamodb:DeleteItem", "dynamodb:Scan"]
-        Resource = [aws_dynamodb_table.items.arn, aws_dynamodb_table.orders.arn]
+        Action   = ["dynamodb:GetItem", "dynamodb:PutItem", "dynamodb:UpdateItem", "dynamodb:DeleteItem", "dynamodb:Scan", "dynamodb:Query", "dynamodb:BatchGetItem", "dynamodb:BatchWriteItem"]
+        Resource = [aws_dynamodb_table.items.arn, aws_dynamodb_table.orders.arn, aws_dynamodb_table.hangers.arn, aws_dynamodb_table.outfits.arn, "${aws_dynamodb_table.items.arn}/index/*", "${aws_dynamodb_table.orders.arn}/index/*"]
       },
       {
         Effect   = "Allow"
         Action   = ["s3:GetObject", "s3:PutObject", "s3:DeleteObject"]
         Resource = "${aws_s3_bucket.images.arn}/*"
+      },
+      {
+        # Sans ListBucket, S3 répond 403 au lieu de 404 sur une clé absente (HeadObject de photo_processor)
+        Effect   = "Allow"
+        Action   = ["s3:ListBucket"]
+        Resource = aws_s3_bucket.images.arn
       }
     ]
   })
@@ -0,0 +1,177 @@
+"""Vérification d'intégration du pont LED contre un vrai broker mosquitto.
+
+    python check_led_bridge.py                          # lance mosquitto s'il est installé
+    MQTT_BROKER=localhost python check_led_bridge.py    # broker existant (docker compose up mqtt)
+"""
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import led_bridge
+import ledframe
+from led_bridge import LedBridge, LedPublisher, solid
+
+PREFIX = f'test_bridge_{os.getpid()}'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_broker():
+    """(hôte, port, processus) du broker de test"""
+    if os.environ.get('MQTT_BROKER'):
+        return os.environ['MQTT_BROKER'], int(os.environ.get('MQTT_PORT', 1883)), None
+    if shutil.which('mosquitto') is None:
+        sys.exit("mosquitto introuvable : l'installer, ou lancer `docker compose up mqtt` puis MQTT_BROKER=localhost")
+    port = free_port()
+    process = subprocess.Popen(['mosquitto', '-p', str(port)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return '127.0.0.1', port, process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    sys.exit("mosquitto n'a pas démarré")
+
+
+class Collector:
+    """Abonné qui note tout ce qui est reçu sous le préfixe de test"""
+
+    def __init__(self, host, port):
+        self.messages = []
+        self._cond = threading.Condition()
+        self.client = led_bridge.make_client()
+        self.client.on_message = self._on_message
+        self.client.connect(host, port)
+        self.client.subscribe(f'{PREFIX}/#', qos=1)
+        self.client.loop_start()
+        time.sleep(0.3)
+
+    def _on_message(self, client, userdata, message):
+        with self._cond:
+            self.messages.append((message.topic, message.payload, time.monotonic()))
+            self._cond.notify_all()
+
+    def last(self, topic):
+        for received, payload, _ in reversed(self.messages):
+            if received == topic:
+                return payload
+        return None
+
+    def wait_for(self, topic, payload, timeout=5):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.last(topic) != payload:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise AssertionError(f"{topic} : attendu {payload[:40]!r}, reçu {str(self.last(topic))[:40]!r}")
+                self._cond.wait(remaining)
+
+    def stop(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+
+def check_coalescing(publisher, collector):
+    topic = f'{PREFIX}/coalesce/leds'
+    for i in range(500):
+        publisher.set(topic, str(i))
+    assert publisher.flush(10), "trames non acquittées"
+    collector.wait_for(topic, '499')
+    received = sum(1 for received, _, _ in collector.messages if received == topic)
+    assert received < 500, "aucune trame fusionnée"
+    return f"500 trames demandées sur un topic, {received} publiées, dernière reçue"
+
+
+def check_pipelining(publisher, collector):
+    topics = [f'{PREFIX}/fleet/{i}/leds' for i in range(1000)]
+    payload = ledframe.encode(solid((255, 0, 0), 20))
+    start = time.perf_counter()
+    for topic in topics:
+        publisher.set(topic, payload)
+    assert publisher.flush(30), "trames non acquittées"
+    elapsed = time.perf_counter() - start
+    collector.wait_for(topics[-1], payload)
+    return f"1000 cintres en {elapsed:.2f} s ({len(topics) / elapsed:.0f} trames QoS 1/s), {publisher.stats['max_unacked']} en attente d'acquittement au maximum"
+
+
+def check_bridge(publisher, collector):
+    bridge = LedBridge(publisher, api_url='http://api.invalid', flash=0.3)
+    topic = f'{PREFIX}/hanger_a/leds'
+    bridge.hangers = {'hanger_a': topic, 'hanger_b': f'{PREFIX}/hanger_b/leds'}
+    bridge.items = {'item_1': 'hanger_a', 'item_2': None}
+    order = {'id': 'order_1', 'status': 'En cours', 'items': [{'id': 'item_1'}, {'id': 'item_2'}]}
+
+    bridge.handle('order_created', {'order': order})
+    collector.wait_for(topic, bridge.encode(solid(led_bridge.ORDER_COLOR)))
+    # L'article change de cintre : la lumière le suit
+    bridge.handle('item_updated', {'item': {'id': 'item_1', 'hanger_id': 'hanger_b'}})
+    collector.wait_for(f'{PREFIX}/hanger_b/leds', bridge.encode(solid(led_bridge.ORDER_COLOR)))
+    collector.wait_for(topic, bridge.encode(solid(led_bridge.OFF)))
+    bridge.handle('order_updated', {'order': {**order, 'status': 'Livrée'}})
+    collector.wait_for(f'{PREFIX}/hanger_b/leds', bridge.encode(solid(led_bridge.OFF)))
+    # Cintre scanné : signal bref puis retour à l'état normal
+    bridge.handle('wait_item', {'hanger_id': 'hanger_a'})
+    collector.wait_for(topic, bridge.encode(solid(led_bridge.WAIT_COLOR)))
+    collector.wait_for(topic, bridge.encode(solid(led_bridge.OFF)))
+    # Les cintres au firmware d'avant les trames binaires reçoivent du texte
+    bridge.frame_format = 'text'
+    bridge.handle('order_created', {'order': {**order, 'id': 'order_2'}})
+    collector.wait_for(f'{PREFIX}/hanger_b/leds', ledframe.format_text(solid(led_bridge.ORDER_COLOR)))
+    return "commande, déplacement d'article, livraison, signal de scan et trames texte"
+
+
+def check_retained(host, port, collector):
+    # Un cintre qui (re)démarre reçoit son dernier état sans attendre d'événement
+    late = Collector(host, port)
+    try:
+        late.wait_for(f'{PREFIX}/coalesce/leds', '499')
+    finally:
+        late.stop()
+    return "état retenu renvoyé à un nouvel abonné"
+
+
+def main():
+    host, port, process = start_broker()
+    collector = Collector(host, port)
+    publisher = LedPublisher(broker=host, port=port)
+    publisher.start()
+    failures = 0
+    try:
+        publisher.connected.wait(5)
+        for check in (check_coalescing, check_pipelining, check_bridge):
+            try:
+                print(f"OK    {check.__name__} : {check(publisher, collector)}")
+            except AssertionError as e:
+                failures += 1
+                print(f"ECHEC {check.__name__} : {e}")
+        try:
+            print(f"OK    check_retained : {check_retained(host, port, collector)}")
+        except AssertionError as e:
+            failures += 1
+            print(f"ECHEC check_retained : {e}")
+    finally:
+        # Nettoie les messages retenus laissés sur le broker
+        for topic in {received for received, _, _ in collector.messages}:
+            publisher.set(topic, b'')
+        publisher.stop()
+        collector.stop()
+        if process is not None:
+            process.terminate()
+    print(f"\n{publisher.stats}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
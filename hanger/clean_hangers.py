@@ -1,7 +1,4 @@
-import json
 import requests
-import os
-import base64
 
 API_URL = "http://10.42.0.1:5080/hangers"
 
@@ -9,10 +6,9 @@ response = requests.get(API_URL)
 response.raise_for_status()
 hangers = response.json()
 
-for hanger in hangers:
-    hanger_id = hanger.get('id')
-    if hanger_id is not None:
-        delete_url = f"{API_URL}/{hanger_id}"
-        del_response = requests.delete(delete_url)
-        del_response.raise_for_status()
-        print(f"Deleted hanger with id {hanger_id}")
\ No newline at end of file
+# Une seule requête et une seule transaction pour tous les cintres
+hanger_ids = [hanger['id'] for hanger in hangers if hanger.get('id') is not None]
+del_response = requests.delete(f"{API_URL}:batch", json=hanger_ids)
+del_response.raise_for_status()
+for result in del_response.json()['results']:
+    print(f"Deleted hanger with id {result['id']}: {result['status']}")
@@ -0,0 +1,290 @@
+"""Simulateur de flotte de cintres et banc de charge MQTT.
+
+    python fleet_sim.py --hangers 1000 --rate 2000 --rounds 3
+    python fleet_sim.py --hangers 200 --rounds 0 --hold 60      # annonces "Create" seulement
+
+Chaque cintre virtuel se comporte comme hanger.ino : il s'abonne à hanger_<mac>/leds,
+y annonce "Create", puis décode les trames reçues. Le pilote rejoue un script au format
+de test_publish.txt sur tous les cintres au débit demandé et mesure, pour chaque trame,
+le délai entre la publication et la réception par le cintre (même processus, même horloge).
+Tous les clients MQTT tournent dans une seule boucle asyncio.
+"""
+import argparse
+import asyncio
+import collections
+import os
+import resource
+import statistics
+import time
+
+import paho.mqtt.client as mqtt
+
+import ledframe
+from led_bridge import make_client
+
+MQTT_BROKER = os.environ.get('MQTT_BROKER', 'localhost')
+MQTT_PORT = int(os.environ.get('MQTT_PORT', 1883))
+
+
+class AsyncioHelper:
+    """Fait tourner un client paho dans la boucle asyncio (sans thread par client)"""
+
+    def __init__(self, loop, client):
+        self.loop = loop
+        self.client = client
+        self.misc = None
+        client.on_socket_open = self.on_socket_open
+        client.on_socket_close = self.on_socket_close
+        client.on_socket_register_write = self.on_socket_register_write
+        client.on_socket_unregister_write = self.on_socket_unregister_write
+
+    def on_socket_open(self, client, userdata, sock):
+        self.loop.add_reader(sock, client.loop_read)
+        self.misc = self.loop.create_task(self.misc_loop())
+
+    def on_socket_close(self, client, userdata, sock):
+        self.loop.remove_reader(sock)
+        if self.misc is not None:
+            self.misc.cancel()
+
+    def on_socket_register_write(self, client, userdata, sock):
+        self.loop.add_writer(sock, client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self.loop.remove_writer(sock)
+
+    async def misc_loop(self):
+        # Keep-alive et nouvelles tentatives QoS 1
+        while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                break
+
+
+class Expected:
+    """Trames publiées et pas encore reçues, par topic, dans l'ordre d'envoi"""
+
+    def __init__(self):
+        self.pending = collections.defaultdict(collections.deque)
+        self.latencies = []
+        self.skipped = 0
+        self.unexpected = 0
+
+    def sent(self, topic, payload):
+        self.pending[topic].append((payload, time.perf_counter()))
+
+    def received(self, topic, payload, at):
+        # MQTT garde l'ordre par topic : les trames sautées avant celle-ci sont perdues
+        queue = self.pending.get(topic)
+        while queue:
+            sent_payload, sent_at = queue.popleft()
+            if sent_payload == payload:
+                self.latencies.append(at - sent_at)
+                return
+            self.skipped += 1
+        self.unexpected += 1
+
+    def outstanding(self):
+        return sum(len(queue) for queue in self.pending.values())
+
+
+class VirtualHanger:
+    def __init__(self, index, fleet):
+        self.mac = f'5e{index:010x}'
+        self.topic = f'hanger_{self.mac}/leds'
+        self.fleet = fleet
+        self.frames = 0
+        self.errors = 0
+        self.led_count = 0
+        self.client = make_client(f'sim_{self.mac}')
+        self.client.on_connect = self.on_connect
+        self.client.on_subscribe = self.on_subscribe
+        self.client.on_message = self.on_message
+        AsyncioHelper(fleet.loop, self.client)
+
+    def connect(self):
+        self.client.connect(self.fleet.broker, self.fleet.port, keepalive=60)
+
+    def on_connect(self, client, userdata, flags, reason_code, *args):
+        # Comme le firmware : abonnement au topic du cintre puis annonce
+        client.subscribe(self.topic, qos=self.fleet.qos)
+
+    def on_subscribe(self, client, userdata, mid, *args):
+        client.publish(self.topic, 'Create', qos=1)
+        self.fleet.subscribed(self)
+
+    def on_message(self, client, userdata, message):
+        at = time.perf_counter()
+        payload = message.payload
+        if payload in (b'Create', b'Alive') or not payload:
+            return
+        try:
+            self.led_count = len(ledframe.to_colors(payload))
+        except (ledframe.FrameError, UnicodeDecodeError):
+            self.errors += 1
+            return
+        self.frames += 1
+        self.fleet.expected.received(self.topic, payload, at)
+
+
+class Fleet:
+    def __init__(self, loop, broker, port, size, qos):
+        self.loop = loop
+        self.broker = broker
+        self.port = port
+        self.qos = qos
+        self.expected = Expected()
+        self.hangers = [VirtualHanger(index, self) for index in range(size)]
+        self._ready = 0
+        self._all_ready = asyncio.Event()
+
+    def subscribed(self, hanger):
+        self._ready += 1
+        if self._ready == len(self.hangers):
+            self._all_ready.set()
+
+    async def start(self, connect_rate):
+        """Connecte tous les cintres, au plus connect_rate par seconde ; renvoie la durée"""
+        start = time.perf_counter()
+        for count, hanger in enumerate(self.hangers, 1):
+            hanger.connect()
+            delay = start + count / connect_rate - time.perf_counter()
+            # Rend la main à la boucle pour traiter CONNACK et SUBACK au fil de l'eau
+            await asyncio.sleep(max(delay, 0))
+        await asyncio.wait_for(self._all_ready.wait(), timeout=60)
+        return time.perf_counter() - start
+
+    async def heartbeats(self, interval):
+        """Envoie "Alive" pour chaque cintre toutes les interval secondes, réparti sur l'intervalle"""
+        while True:
+            for hanger in self.hangers:
+                hanger.client.publish(hanger.topic, 'Alive', qos=1)
+                await asyncio.sleep(interval / len(self.hangers))
+
+    async def stop(self):
+        for hanger in self.hangers:
+            hanger.client.disconnect()
+        await asyncio.sleep(0.1)
+
+
+class Driver:
+    """Rejoue un script de trames sur tous les cintres au débit demandé"""
+
+    def __init__(self, loop, fleet, qos, frame_format):
+        self.fleet = fleet
+        self.qos = qos
+        self.frame_format = frame_format
+        self.client = make_client(f'sim_driver_{os.getpid()}')
+        self.client.max_inflight_messages_set(1000)
+        self.client.max_queued_messages_set(0)
+        self._connected = asyncio.Event()
+        self.client.on_connect = lambda *args: self._connected.set()
+        AsyncioHelper(loop, self.client)
+        self.sent = 0
+        self.bytes = 0
+
+    async def connect(self):
+        self.client.connect(self.fleet.broker, self.fleet.port, keepalive=60)
+        await asyncio.wait_for(self._connected.wait(), timeout=10)
+
+    def payloads(self, lines):
+        for line in lines:
+            colors = ledframe.parse_text(line)
+            yield ledframe.encode(colors) if self.frame_format == 'binary' else ledframe.format_text(colors).encode()
+
+    async def run(self, lines, rounds, rate):
+        payloads = list(self.payloads(lines))
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for payload in payloads:
+                for hanger in self.fleet.hangers:
+                    self.fleet.expected.sent(hanger.topic, payload)
+                    self.client.publish(hanger.topic, payload, qos=self.qos)
+                    self.sent += 1
+                    self.bytes += len(payload)
+                    delay = start + self.sent / rate - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    elif self.sent % 100 == 0:
+                        # En retard sur le débit visé : on laisse quand même la boucle lire les sockets
+                        await asyncio.sleep(0)
+        return time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def report(args, fleet, driver, connect_time, send_time):
+    expected = fleet.expected
+    lost = expected.skipped + expected.outstanding()
+    print(f"Flotte : {len(fleet.hangers)} cintres connectés et annoncés en {connect_time:.2f} s "
+          f"({len(fleet.hangers) / connect_time:.0f} connexions/s)")
+    if not driver.sent:
+        return
+    print(f"Envoi : {driver.sent} trames {args.format} en {send_time:.2f} s ({driver.sent / send_time:.0f} trames/s, "
+          f"visé {args.rate:.0f}), {driver.bytes / driver.sent:.0f} octets en moyenne, QoS {args.qos}")
+    print(f"Reçues : {len(expected.latencies)} ; perdues : {lost} ({lost / driver.sent:.2%}) ; "
+          f"inattendues : {expected.unexpected} ; erreurs de décodage : {sum(h.errors for h in fleet.hangers)}")
+    if expected.latencies:
+        latencies = sorted(latency * 1000 for latency in expected.latencies)
+        print(f"Latence bout à bout (ms) : p50 {statistics.median(latencies):.2f}  p90 {percentile(latencies, 0.9):.2f}  "
+              f"p99 {percentile(latencies, 0.99):.2f}  max {latencies[-1]:.2f}")
+
+
+def raise_file_limit(needed):
+    # Un descripteur par cintre virtuel
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+
+
+async def simulate(args):
+    loop = asyncio.get_running_loop()
+    raise_file_limit(args.hangers + 100)
+    with open(args.script, 'r') as f:
+        lines = [line.strip() for line in f if line.strip()]
+
+    fleet = Fleet(loop, args.broker, args.port, args.hangers, args.qos)
+    driver = Driver(loop, fleet, args.qos, args.format)
+    connect_time = await fleet.start(args.connect_rate)
+    send_time = 0
+    heartbeats = loop.create_task(fleet.heartbeats(args.heartbeat)) if args.heartbeat else None
+    if args.rounds:
+        await driver.connect()
+        send_time = await driver.run(lines, args.rounds, args.rate)
+        # Laisse arriver les dernières trames
+        deadline = time.perf_counter() + args.drain
+        while fleet.expected.outstanding() and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+    if args.hold:
+        print(f"Cintres connectés pendant {args.hold:.0f} s...")
+        await asyncio.sleep(args.hold)
+    if heartbeats is not None:
+        heartbeats.cancel()
+    report(args, fleet, driver, connect_time, send_time)
+    driver.client.disconnect()
+    await fleet.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simule une flotte de cintres MQTT et mesure la latence des trames LED")
+    parser.add_argument('--hangers', type=int, default=100, help="Nombre de cintres virtuels")
+    parser.add_argument('--script', default='test_publish.txt', help="Trames texte à rejouer, une par ligne")
+    parser.add_argument('--rounds', type=int, default=1, help="Nombre de passages du script (0 : annonces seulement)")
+    parser.add_argument('--rate', type=float, default=1000, help="Trames publiées par seconde, toute la flotte confondue")
+    parser.add_argument('--qos', type=int, choices=(0, 1), default=1)
+    parser.add_argument('--format', choices=('binary', 'text'), default='binary')
+    parser.add_argument('--connect-rate', type=float, default=500, help="Connexions de cintres par seconde")
+    parser.add_argument('--drain', type=float, default=5, help="Attente des dernières trames (s)")
+    parser.add_argument('--hold', type=float, default=0, help="Garde les cintres connectés après le script (s)")
+    parser.add_argument('--heartbeat', type=float, default=0, help="Intervalle des messages Alive, comme hanger.ino (s, 0 : aucun)")
+    parser.add_argument('--broker', default=MQTT_BROKER)
+    parser.add_argument('--port', type=int, default=MQTT_PORT)
+    args = parser.parse_args()
+    asyncio.run(simulate(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -10,8 +10,26 @@
 #define AIO_KEY ""
 
 
+// Nombre maximal de LEDs sur un cintre
+#define MAX_LEDS 300
+
+// Trame binaire (voir ledframe.py) : 'L', version, encodage, nombre de LEDs (uint16 big-endian), données.
+// Adafruit_MQTT ne garde que SUBSCRIPTIONDATALEN octets d'un message (100 sur ESP32) : une trame
+// tronquée est rejetée. Pour de longues bandes multicolores, augmenter SUBSCRIPTIONDATALEN dans Adafruit_MQTT.h.
+#define FRAME_MAGIC 'L'
+#define FRAME_VERSION 1
+#define FRAME_HEADER_LEN 5
+#define FRAME_RAW 0
+#define FRAME_RLE 1
+#define FRAME_PALETTE4 2
+
+// Signe de vie pour hanger/registrar.py, qui marque offline un cintre silencieux
+#define HEARTBEAT_INTERVAL_MS 30000
+
 char mac[25];
 char topic[40];
+uint8_t leds[MAX_LEDS][3];
+uint16_t ledCount = 0;
 WiFiClient client;
 Adafruit_MQTT_Client mqtt(&client, AIO_SERVER, AIO_SERVERPORT, AIO_USERNAME, AIO_KEY);
 Adafruit_MQTT_Publish* leds_pub;
@@ -69,47 +87,117 @@ void setup() {
   }
 }
 
+// Décode une trame binaire dans leds[] ; false si elle est invalide ou tronquée (leds[] peut alors être modifié)
+bool parseBinaryFrame(const uint8_t *data, uint16_t len) {
+  if (len < FRAME_HEADER_LEN || data[0] != FRAME_MAGIC || data[1] != FRAME_VERSION) return false;
+  uint8_t encoding = data[2];
+  uint16_t count = ((uint16_t)data[3] << 8) | data[4];
+  if (count > MAX_LEDS) return false;
+  const uint8_t *p = data + FRAME_HEADER_LEN;
+  uint16_t remaining = len - FRAME_HEADER_LEN;
+
+  if (encoding == FRAME_RAW) {
+    if (remaining < count * 3) return false;
+    memcpy(leds, p, count * 3);
+  } else if (encoding == FRAME_RLE) {
+    uint16_t i = 0;
+    while (i < count) {
+      if (remaining < 4) return false;
+      for (uint8_t run = p[0]; run > 0 && i < count; run--, i++) {
+        memcpy(leds[i], p + 1, 3);
+      }
+      p += 4;
+      remaining -= 4;
+    }
+  } else if (encoding == FRAME_PALETTE4) {
+    if (remaining < 1) return false;
+    uint8_t paletteSize = p[0];
+    if (paletteSize == 0 || paletteSize > 16 || remaining < 1 + paletteSize * 3 + (count + 1) / 2) return false;
+    const uint8_t *palette = p + 1;
+    const uint8_t *indexes = palette + paletteSize * 3;
+    for (uint16_t i = 0; i < count; i++) {
+      uint8_t index = (i & 1) ? (indexes[i >> 1] & 0x0F) : (indexes[i >> 1] >> 4);
+      if (index >= paletteSize) return false;
+      memcpy(leds[i], palette + index * 3, 3);
+    }
+  } else {
+    return false;
+  }
+  ledCount = count;
+  return true;
+}
+
+// Ancien format texte (r,g,b);(r,g,b)... lu en une seule passe
+uint16_t parseTextFrame(const char *s, uint16_t len) {
+  uint16_t count = 0;
+  int channel = -1;
+  int value = 0;
+  for (uint16_t i = 0; i < len && count < MAX_LEDS; i++) {
+    char c = s[i];
+    if (c == '(') {
+      channel = 0;
+      value = 0;
+    } else if (channel < 0) {
+      continue;
+    } else if (c >= '0' && c <= '9') {
+      value = value * 10 + (c - '0');
+      if (value > 255) value = 255;
+    } else if (c == ',' || c == ')') {
+      leds[count][channel] = value;
+      value = 0;
+      if (c == ')') {
+        if (channel == 2) count++;
+        channel = -1;
+      } else if (++channel > 2) {
+        channel = -1;
+      }
+    }
+  }
+  return count;
+}
+
 uint32_t x = 0;
+uint32_t lastHeartbeat = 0;
 void loop() {
   MQTT_connect();
+  if (millis() - lastHeartbeat >= HEARTBEAT_INTERVAL_MS) {
+    lastHeartbeat = millis();
+    if (!leds_pub->publish("Alive")) {
+      Serial.println(F("Heartbeat failed"));
+    }
+  }
   Adafruit_MQTT_Subscribe *subscription;
   while ((subscription = mqtt.readSubscription(5000))) {
     if (subscription == leds_sub) {
-    Serial.print(F("Got: "));
-    Serial.println((char *)leds_sub->lastread);
-
-    // Parse the received string into an array of colors
-    const char* payload = (char*)leds_sub->lastread;
-    const int maxColors = 10; // adjust as needed
-    int colors[maxColors][3];
-    int colorCount = 0;
-
-    const char* ptr = payload;
-    while (*ptr && colorCount < maxColors) {
-      int r, g, b;
-      if (sscanf(ptr, " (%d,%d,%d)", &r, &g, &b) == 3 ||
-        sscanf(ptr, "(%d,%d,%d)", &r, &g, &b) == 3) {
-        colors[colorCount][0] = r;
-        colors[colorCount][1] = g;
-        colors[colorCount][2] = b;
-        colorCount++;
+    const uint8_t* payload = leds_sub->lastread;
+    uint16_t len = leds_sub->datalen;
+    if (len == 0) continue;
+
+    if (payload[0] == FRAME_MAGIC) {
+      if (!parseBinaryFrame(payload, len)) {
+        Serial.println(F("Invalid binary frame"));
+        continue;
       }
-      // Move ptr to next '(' or end
-      ptr = strchr(ptr, ')');
-      if (ptr) ptr++;
-      while (*ptr && *ptr != '(') ptr++;
+    } else if (payload[0] == '(') {
+      ledCount = parseTextFrame((const char*)payload, len);
+    } else {
+      // Nos propres messages ("Create") reviennent aussi sur le topic
+      continue;
     }
 
     // Debug: print parsed colors
-    for (int i = 0; i < colorCount; ++i) {
+    Serial.print(F("Frame: "));
+    Serial.print(ledCount);
+    Serial.println(F(" LEDs"));
+    for (uint16_t i = 0; i < ledCount && i < 10; ++i) {
       Serial.print("Color ");
       Serial.print(i);
       Serial.print(": (");
-      Serial.print(colors[i][0]);
+      Serial.print(leds[i][0]);
       Serial.print(",");
-      Serial.print(colors[i][1]);
+      Serial.print(leds[i][1]);
       Serial.print(",");
-      Serial.print(colors[i][2]);
+      Serial.print(leds[i][2]);
       Serial.println(")");
     }
     }
@@ -0,0 +1,413 @@
+"""Pont entre le flux d'événements de l'API et les LEDs des cintres (MQTT).
+
+    python led_bridge.py
+    API_URL=http://localhost:5080 MQTT_BROKER=localhost python led_bridge.py
+
+Le cintre qui porte un article d'une commande en cours s'allume ; un cintre scanné
+ou associé à un item clignote brièvement. Une seule connexion MQTT est gardée ouverte.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+import requests
+
+import ledframe
+
+API_URL = os.environ.get('API_URL', 'http://10.42.0.1:5080')
+MQTT_BROKER = os.environ.get('MQTT_BROKER', '10.42.0.1')
+MQTT_PORT = int(os.environ.get('MQTT_PORT', 1883))
+# Nombre de LEDs par cintre
+LED_COUNT = int(os.environ.get('LED_COUNT', 20))
+# QoS 1 : le broker acquitte chaque commande, un cintre ne reste pas dans un état périmé
+LED_QOS = int(os.environ.get('LED_QOS', 1))
+# Messages QoS 1 en vol en même temps, tous topics confondus (pipelining)
+LED_MAX_INFLIGHT = int(os.environ.get('LED_MAX_INFLIGHT', 100))
+# Format des trames : 'binary' (ledframe.py), ou 'text' pour les cintres au firmware d'avant les trames binaires
+LED_FORMAT = os.environ.get('LED_FORMAT', 'binary')
+# Durée d'un signal bref (scan, association), en secondes
+LED_FLASH = float(os.environ.get('LED_FLASH', 5))
+# Commandes en cours : leurs cintres restent allumés
+ACTIVE_ORDER_STATUSES = set(os.environ.get('ACTIVE_ORDER_STATUSES', 'En cours').split(','))
+
+OFF = (0, 0, 0)
+ORDER_COLOR = (255, 120, 0)
+PAIRED_COLOR = (0, 255, 0)
+WAIT_COLOR = (0, 0, 255)
+
+EVENT_TYPES = (
+    'item_created', 'item_updated', 'item_deleted', 'items_batch',
+    'order_created', 'order_updated', 'orders_batch',
+    'association_complete', 'wait_item',
+)
+
+logger = logging.getLogger('led_bridge')
+
+
+def solid(color, count=LED_COUNT):
+    return [color] * count
+
+
+def make_client(client_id=''):
+    """Client paho compatible 1.x et 2.x"""
+    if hasattr(mqtt, 'CallbackAPIVersion'):
+        return mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
+    return mqtt.Client(client_id=client_id)
+
+
+class LedPublisher:
+    """Connexion MQTT persistante qui publie les trames LED des cintres.
+
+    Au plus un message par topic est en vol : une trame arrivée pendant ce temps remplace
+    la précédente non envoyée (seul le dernier état d'un cintre compte). Les topics
+    différents, eux, partent sans attendre les acquittements les uns des autres.
+    Tout l'état est tenu par un seul thread d'envoi, alimenté par une file.
+    """
+
+    def __init__(self, broker=MQTT_BROKER, port=MQTT_PORT, qos=LED_QOS, max_inflight=LED_MAX_INFLIGHT,
+                 retain=True, client_id=''):
+        self.broker = broker
+        self.port = port
+        self.qos = qos
+        # Message retenu : un cintre qui redémarre reçoit son état dès son abonnement
+        self.retain = retain
+        self.client = make_client(client_id)
+        self.client.max_inflight_messages_set(max_inflight)
+        self.client.max_queued_messages_set(0)
+        self.client.reconnect_delay_set(1, 30)
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_publish = self._on_publish
+        self.connected = threading.Event()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='led-publisher', daemon=True)
+        # État du thread d'envoi
+        self._mids = {}
+        self._inflight = set()
+        self._pending = {}
+        self._waiters = []
+        self.stats = {'requested': 0, 'sent': 0, 'acked': 0, 'coalesced': 0, 'max_unacked': 0}
+
+    def start(self):
+        # connect_async : le pont démarre même si le broker n'est pas encore joignable
+        self.client.connect_async(self.broker, self.port, keepalive=60)
+        self.client.loop_start()
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self.flush(timeout)
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self.client.disconnect()
+        self.client.loop_stop()
+
+    def set(self, topic, payload):
+        """Demande l'affichage d'une trame sur un cintre (non bloquant)"""
+        self._queue.put(('set', topic, payload))
+
+    def flush(self, timeout=None):
+        """Attend que toutes les trames demandées soient acquittées ; False à l'expiration du délai"""
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        return done.wait(timeout)
+
+    # Callbacks paho (thread réseau) : ils ne font que remplir la file
+    def _on_connect(self, client, userdata, flags, reason_code, *args):
+        logger.info("Connecté au broker %s:%d (%s)", self.broker, self.port, reason_code)
+        self.connected.set()
+
+    def _on_disconnect(self, client, userdata, *args):
+        logger.warning("Déconnecté du broker, reconnexion automatique")
+        self.connected.clear()
+
+    def _on_publish(self, client, userdata, mid, *args):
+        self._queue.put(('ack', mid))
+
+    def _send(self, topic, payload):
+        info = self.client.publish(topic, payload, qos=self.qos, retain=self.retain)
+        self.stats['sent'] += 1
+        # Hors connexion, paho garde les messages QoS > 0 et les envoie à la reconnexion
+        if self.qos == 0 or info.rc not in (mqtt.MQTT_ERR_SUCCESS, mqtt.MQTT_ERR_NO_CONN):
+            if info.rc not in (mqtt.MQTT_ERR_SUCCESS, mqtt.MQTT_ERR_NO_CONN):
+                logger.error("Publication sur %s refusée : %s", topic, mqtt.error_string(info.rc))
+            return
+        self._mids[info.mid] = topic
+        self._inflight.add(topic)
+        self.stats['max_unacked'] = max(self.stats['max_unacked'], len(self._inflight))
+
+    def _release_waiters(self):
+        if not self._inflight and not self._pending:
+            for done in self._waiters:
+                done.set()
+            self._waiters.clear()
+
+    def _run(self):
+        while True:
+            message = self._queue.get()
+            if message is None:
+                return
+            kind = message[0]
+            if kind == 'set':
+                _, topic, payload = message
+                self.stats['requested'] += 1
+                if topic in self._inflight:
+                    if topic in self._pending:
+                        self.stats['coalesced'] += 1
+                    self._pending[topic] = payload
+                else:
+                    self._send(topic, payload)
+            elif kind == 'ack':
+                topic = self._mids.pop(message[1], None)
+                if topic is None:
+                    continue
+                self.stats['acked'] += 1
+                self._inflight.discard(topic)
+                payload = self._pending.pop(topic, None)
+                if payload is not None:
+                    self._send(topic, payload)
+            elif kind == 'flush':
+                self._waiters.append(message[1])
+            self._release_waiters()
+
+
+def iter_sse(response):
+    """Événements (id, type, data) d'une réponse Server-Sent Events"""
+    event_id, event_type, data = None, None, []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if not line:
+            if data:
+                yield event_id, event_type, json.loads('\n'.join(data))
+            event_type, data = None, []
+            continue
+        if line.startswith(':'):
+            continue
+        field, _, value = line.partition(':')
+        value = value[1:] if value.startswith(' ') else value
+        if field == 'id':
+            event_id = value
+        elif field == 'event':
+            event_type = value
+        elif field == 'data':
+            data.append(value)
+
+
+class LedBridge:
+    """Calcule l'état voulu de chaque cintre à partir des événements de l'API et le publie.
+
+    Le pont garde un miroir minimal de l'API (cintres, cintre de chaque item, commandes
+    en cours), mis à jour par les événements et rechargé entièrement après un 'reset'.
+    """
+
+    def __init__(self, publisher, api_url=API_URL, session=None, led_count=LED_COUNT, flash=LED_FLASH,
+                 frame_format=LED_FORMAT):
+        self.publisher = publisher
+        self.frame_format = frame_format
+        self.api_url = api_url.rstrip('/')
+        self.session = session or requests.Session()
+        self.led_count = led_count
+        self.flash = flash
+        self._lock = threading.Lock()
+        self.hangers = {}
+        self.items = {}
+        self.orders = {}
+        self._flashes = {}
+        self._shown = {}
+        self._unknown_hangers = {}
+
+    # --- Miroir de l'API
+    def resync(self):
+        """Recharge cintres, items et commandes depuis l'API puis republie tous les cintres"""
+        hangers = self.session.get(f'{self.api_url}/hangers', timeout=30)
+        items = self.session.get(f'{self.api_url}/items', params={'fields': 'id,hanger_id'}, timeout=60)
+        orders = self.session.get(f'{self.api_url}/orders', timeout=60)
+        for response in (hangers, items, orders):
+            response.raise_for_status()
+        with self._lock:
+            self.hangers = {hanger['id']: hanger['mqtt_topic'] for hanger in hangers.json() if hanger.get('mqtt_topic')}
+            self.items = {item['id']: item.get('hanger_id') for item in items.json()}
+            self.orders = {}
+            for order in orders.json():
+                self._set_order(order)
+            self._shown.clear()
+            hanger_ids = list(self.hangers)
+        self.refresh(hanger_ids)
+        logger.info("Synchronisé : %d cintres, %d items, %d commandes en cours",
+                    len(self.hangers), len(self.items), len(self.orders))
+
+    def _reload_hangers(self, hanger_ids):
+        """Recharge les cintres si l'un d'eux est inconnu.
+
+        Les créations de cintres ne sont pas publiées dans le flux : un cintre inconnu
+        déclenche un rechargement, au plus une fois toutes les 10 s pour un même id.
+        """
+        now = time.monotonic()
+        with self._lock:
+            unknown = [hanger_id for hanger_id in hanger_ids
+                       if hanger_id not in self.hangers and now - self._unknown_hangers.get(hanger_id, -10) >= 10]
+            for hanger_id in unknown:
+                self._unknown_hangers[hanger_id] = now
+        if not unknown:
+            return
+        response = self.session.get(f'{self.api_url}/hangers', timeout=30)
+        response.raise_for_status()
+        with self._lock:
+            self.hangers = {hanger['id']: hanger['mqtt_topic'] for hanger in response.json() if hanger.get('mqtt_topic')}
+
+    def _item_hanger(self, item_id, ordered_hanger_id):
+        # Emplacement actuel de l'article s'il est connu, sinon celui noté dans la commande
+        return self.items[item_id] if item_id in self.items else ordered_hanger_id
+
+    def _order_hangers(self, order_items):
+        return {self._item_hanger(item_id, hanger_id) for item_id, hanger_id in order_items} - {None}
+
+    def _set_order(self, order):
+        # Appelé sous le verrou ; renvoie les cintres concernés avant et après
+        before = self._order_hangers(self.orders.pop(order['id'], ()))
+        if order.get('status') not in ACTIVE_ORDER_STATUSES:
+            return before
+        order_items = []
+        for item in order.get('items') or []:
+            if isinstance(item, dict):
+                order_items.append((item.get('id'), item.get('hanger_id')))
+            else:
+                order_items.append((item, None))
+        self.orders[order['id']] = order_items
+        return before | self._order_hangers(order_items)
+
+    def _lit_hangers(self):
+        # Appelé sous le verrou
+        lit = set()
+        for order_items in self.orders.values():
+            lit |= self._order_hangers(order_items)
+        return lit
+
+    # --- État voulu des cintres
+    def colors(self, hanger_id, lit):
+        flash = self._flashes.get(hanger_id)
+        if flash is not None and flash[1] > time.monotonic():
+            return solid(flash[0], self.led_count)
+        if hanger_id in lit:
+            return solid(ORDER_COLOR, self.led_count)
+        return solid(OFF, self.led_count)
+
+    def encode(self, colors):
+        if self.frame_format == 'text':
+            return ledframe.format_text(colors)
+        return ledframe.encode(colors)
+
+    def refresh(self, hanger_ids):
+        """Publie la trame des cintres dont l'état voulu a changé"""
+        frames = []
+        with self._lock:
+            lit = self._lit_hangers()
+            for hanger_id in hanger_ids:
+                topic = self.hangers.get(hanger_id)
+                if topic is None:
+                    continue
+                payload = self.encode(self.colors(hanger_id, lit))
+                if self._shown.get(topic) != payload:
+                    self._shown[topic] = payload
+                    frames.append((topic, payload))
+        for topic, payload in frames:
+            self.publisher.set(topic, payload)
+
+    def flash_hanger(self, hanger_id, color):
+        with self._lock:
+            self._flashes[hanger_id] = (color, time.monotonic() + self.flash)
+        self._reload_hangers([hanger_id])
+        self.refresh([hanger_id])
+        # Retour à l'état normal à la fin du signal
+        timer = threading.Timer(self.flash + 0.05, self._end_flash, (hanger_id,))
+        timer.daemon = True
+        timer.start()
+
+    def _end_flash(self, hanger_id):
+        with self._lock:
+            flash = self._flashes.get(hanger_id)
+            if flash is not None and flash[1] <= time.monotonic():
+                del self._flashes[hanger_id]
+        self.refresh([hanger_id])
+
+    # --- Événements
+    def handle(self, event_type, data):
+        if event_type in ('reset', 'items_batch', 'orders_batch'):
+            self.resync()
+        elif event_type in ('item_created', 'item_updated'):
+            item = data['item']
+            with self._lock:
+                previous = self.items.get(item['id'])
+                self.items[item['id']] = item.get('hanger_id')
+            if previous != item.get('hanger_id'):
+                self._item_moved(item['id'], previous)
+        elif event_type == 'item_deleted':
+            with self._lock:
+                previous = self.items.pop(data['item_id'], None)
+            self._item_moved(data['item_id'], previous)
+        elif event_type in ('order_created', 'order_updated'):
+            with self._lock:
+                hanger_ids = self._set_order(data['order'])
+            self._reload_hangers(hanger_ids)
+            self.refresh(hanger_ids)
+        elif event_type == 'association_complete' and data.get('hanger_id'):
+            with self._lock:
+                previous = self.items.get(data['item_id'])
+                self.items[data['item_id']] = data['hanger_id']
+            self._item_moved(data['item_id'], previous)
+            self.flash_hanger(data['hanger_id'], PAIRED_COLOR)
+        elif event_type == 'wait_item':
+            self.flash_hanger(data['hanger_id'], WAIT_COLOR)
+
+    def _item_moved(self, item_id, previous_hanger_id):
+        # Un article d'une commande en cours a changé de cintre : la lumière le suit
+        with self._lock:
+            ordered = any(item_id == ordered_id for order_items in self.orders.values() for ordered_id, _ in order_items)
+            touched = {previous_hanger_id, self.items.get(item_id)} - {None}
+        if ordered and touched:
+            self._reload_hangers(touched)
+            self.refresh(touched)
+
+    def run(self):
+        """Suit le flux /events indéfiniment, en reprenant après le dernier événement reçu"""
+        last_event_id = None
+        backoff = 1
+        while True:
+            try:
+                if last_event_id is None:
+                    self.resync()
+                headers = {'Last-Event-ID': last_event_id} if last_event_id else {}
+                with self.session.get(f'{self.api_url}/events', params={'types': ','.join(EVENT_TYPES)},
+                                      headers=headers, stream=True, timeout=(10, 90)) as response:
+                    response.raise_for_status()
+                    backoff = 1
+                    for event_id, event_type, event in iter_sse(response):
+                        if event_id:
+                            last_event_id = event_id
+                        self.handle(event_type, event.get('data', {}))
+            except (requests.RequestException, ValueError) as e:
+                logger.warning("Flux d'événements interrompu (%s), nouvel essai dans %d s", e, backoff)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    publisher = LedPublisher()
+    publisher.start()
+    bridge = LedBridge(publisher)
+    try:
+        bridge.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        publisher.stop()
+        logger.info("Arrêt : %s", publisher.stats)
+
+
+if __name__ == '__main__':
+    main()
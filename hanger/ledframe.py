@@ -0,0 +1,205 @@
+"""Trames LED binaires des cintres, et conversion depuis/vers le format texte (r,g,b);(r,g,b)...
+
+En-tête de 5 octets, puis les données selon l'encodage :
+
+    'L' | version (1) | encodage | nombre de LEDs (uint16 big-endian)
+
+    RAW       r g b par LED
+    RLE       suites de [longueur (1-255), r, g, b]
+    PALETTE4  taille de la palette (1-16), r g b par couleur, puis un index de 4 bits
+              par LED (deux LEDs par octet, la première dans les bits de poids fort)
+
+    python ledframe.py stats test_publish.txt
+    python ledframe.py to-binary "(255,0,0);(0,255,0)"
+    python ledframe.py to-text 4c0100000...
+"""
+import argparse
+import re
+import struct
+import sys
+
+MAGIC = b'L'
+VERSION = 1
+HEADER = struct.Struct('>cBBH')
+
+RAW = 0
+RLE = 1
+PALETTE4 = 2
+ENCODINGS = {'raw': RAW, 'rle': RLE, 'palette': PALETTE4}
+
+MAX_LEDS = 0xFFFF
+MAX_RUN = 255
+MAX_PALETTE = 16
+
+TEXT_COLOR = re.compile(r'\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\)')
+
+
+class FrameError(ValueError):
+    pass
+
+
+def parse_text(text):
+    """Couleurs d'une trame texte (r,g,b);(r,g,b)..."""
+    colors = [tuple(min(int(value), 255) for value in match) for match in TEXT_COLOR.findall(text)]
+    if not colors and text.strip():
+        raise FrameError("No (r,g,b) color in text frame")
+    return colors
+
+
+def format_text(colors):
+    return ';'.join(f'({r},{g},{b})' for r, g, b in colors)
+
+
+def _raw(colors):
+    return b''.join(bytes(color) for color in colors)
+
+
+def _rle(colors):
+    out = bytearray()
+    i = 0
+    while i < len(colors):
+        color = colors[i]
+        run = 1
+        while i + run < len(colors) and run < MAX_RUN and colors[i + run] == color:
+            run += 1
+        out.append(run)
+        out.extend(color)
+        i += run
+    return bytes(out)
+
+
+def _palette4(colors):
+    palette = list(dict.fromkeys(colors))
+    if not 1 <= len(palette) <= MAX_PALETTE:
+        return None
+    index = {color: i for i, color in enumerate(palette)}
+    out = bytearray([len(palette)])
+    for color in palette:
+        out.extend(color)
+    for i in range(0, len(colors), 2):
+        high = index[colors[i]]
+        low = index[colors[i + 1]] if i + 1 < len(colors) else 0
+        out.append(high << 4 | low)
+    return bytes(out)
+
+
+_ENCODERS = {RAW: _raw, RLE: _rle, PALETTE4: _palette4}
+
+
+def encode(colors, encoding=None):
+    """Trame binaire ; sans encodage imposé, le plus compact des trois est choisi"""
+    if len(colors) > MAX_LEDS:
+        raise FrameError(f"More than {MAX_LEDS} LEDs")
+    for color in colors:
+        if len(color) != 3 or not all(0 <= value <= 255 for value in color):
+            raise FrameError(f"Invalid color {color!r}")
+    if encoding is not None:
+        candidates = [(encoding, _ENCODERS[encoding](colors))]
+    else:
+        candidates = [(name, encoder(colors)) for name, encoder in _ENCODERS.items()]
+    candidates = [(name, body) for name, body in candidates if body is not None]
+    if not candidates:
+        raise FrameError(f"A palette frame needs 1 to {MAX_PALETTE} colors")
+    name, body = min(candidates, key=lambda candidate: len(candidate[1]))
+    return HEADER.pack(MAGIC, VERSION, name, len(colors)) + body
+
+
+def decode(frame):
+    """Couleurs d'une trame binaire"""
+    if len(frame) < HEADER.size:
+        raise FrameError("Frame shorter than its header")
+    magic, version, encoding, count = HEADER.unpack_from(frame)
+    if magic != MAGIC:
+        raise FrameError("Not a binary LED frame")
+    if version != VERSION:
+        raise FrameError(f"Unsupported frame version {version}")
+    body = memoryview(frame)[HEADER.size:]
+    if count == 0:
+        return []
+    if encoding == RAW:
+        if len(body) < count * 3:
+            raise FrameError("Truncated RAW frame")
+        return [tuple(body[i:i + 3]) for i in range(0, count * 3, 3)]
+    if encoding == RLE:
+        colors = []
+        for i in range(0, len(body) - 3, 4):
+            colors.extend([tuple(body[i + 1:i + 4])] * body[i])
+            if len(colors) >= count:
+                return colors[:count]
+        raise FrameError("Truncated RLE frame")
+    if encoding == PALETTE4:
+        if not body:
+            raise FrameError("Truncated PALETTE4 frame")
+        size = body[0]
+        if not 1 <= size <= MAX_PALETTE or len(body) < 1 + size * 3 + (count + 1) // 2:
+            raise FrameError("Invalid or truncated PALETTE4 frame")
+        palette = [tuple(body[1 + i * 3:4 + i * 3]) for i in range(size)]
+        indexes = body[1 + size * 3:]
+        colors = []
+        for i in range(count):
+            index = indexes[i >> 1] >> 4 if i % 2 == 0 else indexes[i >> 1] & 0x0F
+            if index >= size:
+                raise FrameError("Palette index out of range")
+            colors.append(palette[index])
+        return colors
+    raise FrameError(f"Unknown frame encoding {encoding}")
+
+
+def is_binary(payload):
+    return isinstance(payload, (bytes, bytearray)) and payload[:1] == MAGIC
+
+
+def to_colors(payload):
+    """Couleurs d'une trame binaire ou texte (telle que reçue sur le topic)"""
+    if is_binary(payload):
+        return decode(bytes(payload))
+    if isinstance(payload, (bytes, bytearray)):
+        payload = payload.decode('ascii')
+    return parse_text(payload)
+
+
+def stats(lines):
+    print(f"{'LEDs':>5} {'texte':>7} {'raw':>5} {'rle':>5} {'palette':>8} {'choisi':>7} {'gain':>6}")
+    total_text = total_binary = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        colors = parse_text(line)
+        sizes = [len(encode(colors, encoding)) if encoding != PALETTE4 or len(set(colors)) <= MAX_PALETTE else None
+                 for encoding in (RAW, RLE, PALETTE4)]
+        best = len(encode(colors))
+        total_text += len(line)
+        total_binary += best
+        palette = sizes[2] if sizes[2] is not None else '-'
+        print(f"{len(colors):>5} {len(line):>7} {sizes[0]:>5} {sizes[1]:>5} {palette:>8} {best:>7} {len(line) / best:>5.1f}x")
+    if total_binary:
+        print(f"\nTotal : {total_text} octets en texte, {total_binary} en binaire ({total_text / total_binary:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trames LED binaires des cintres")
+    sub = parser.add_subparsers(dest='command', required=True)
+    to_binary = sub.add_parser('to-binary', help="Trame texte -> trame binaire (hexadécimal)")
+    to_binary.add_argument('text')
+    to_binary.add_argument('--encoding', choices=sorted(ENCODINGS), help="Encodage imposé (défaut : le plus compact)")
+    to_text = sub.add_parser('to-text', help="Trame binaire (hexadécimal) -> trame texte")
+    to_text.add_argument('hex')
+    stats_parser = sub.add_parser('stats', help="Tailles texte et binaire des trames d'un fichier (une par ligne)")
+    stats_parser.add_argument('file', nargs='?', default='test_publish.txt')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'to-binary':
+            print(encode(parse_text(args.text), ENCODINGS.get(args.encoding)).hex())
+        elif args.command == 'to-text':
+            print(format_text(decode(bytes.fromhex(args.hex))))
+        else:
+            with open(args.file, 'r') as f:
+                stats(f)
+    except FrameError as e:
+        sys.exit(f"Trame invalide : {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""Enregistrement automatique des cintres à partir de leurs annonces MQTT.
+
+    python registrar.py
+    API_URL=http://localhost:5080 MQTT_BROKER=localhost python registrar.py
+
+Au démarrage, hanger.ino publie "Create" sur hanger_<mac>/leds, puis "Alive" à intervalle
+régulier. Le registre écoute +/leds, regroupe les annonces reçues pendant REGISTRAR_FLUSH
+secondes et les envoie en un seul POST /hangers:batch?upsert=1 (une transaction) : un rayon
+de 200 cintres qui s'allume donne quelques lots, pas 200 appels. Un cintre en ligne qui ne
+s'annonce plus depuis HANGER_OFFLINE_AFTER secondes est marqué offline.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+from led_bridge import API_URL, MQTT_BROKER, MQTT_PORT, make_client
+
+REGISTRAR_TOPIC = os.environ.get('REGISTRAR_TOPIC', '+/leds')
+# Fenêtre de regroupement des annonces (secondes) : absorbe les tempêtes de reconnexion
+REGISTRAR_FLUSH = float(os.environ.get('REGISTRAR_FLUSH', 2))
+REGISTRAR_BATCH_MAX = int(os.environ.get('REGISTRAR_BATCH_MAX', 500))
+# Trois battements manqués (hanger.ino envoie "Alive" toutes les 30 s)
+HANGER_OFFLINE_AFTER = float(os.environ.get('HANGER_OFFLINE_AFTER', 90))
+
+ANNOUNCEMENTS = (b'Create', b'Alive')
+
+logger = logging.getLogger('registrar')
+
+
+def to_iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def from_iso(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+def hanger_id_for(topic):
+    """Id d'un cintre enregistré automatiquement : dérivé de son adresse MAC (hanger_<mac>/leds)"""
+    name = topic.split('/')[0]
+    return name if name.startswith('hanger_') else f'hanger_{name}'
+
+
+class Registrar:
+    def __init__(self, api_url=API_URL, session=None, flush_interval=REGISTRAR_FLUSH,
+                 offline_after=HANGER_OFFLINE_AFTER, batch_max=REGISTRAR_BATCH_MAX):
+        self.api_url = api_url.rstrip('/')
+        self.session = session or requests.Session()
+        self.flush_interval = flush_interval
+        self.offline_after = offline_after
+        self.batch_max = batch_max
+        self._lock = threading.Lock()
+        # Annonces reçues depuis le dernier envoi : topic -> heure de la dernière
+        self._seen = {}
+        # Cintres connus : topic -> {'id', 'status', 'last_seen'}
+        self.hangers = {}
+        # Sans écoute continue du broker, un silence ne prouve rien : pas de passage offline
+        self.connected_since = None
+        self.stats = {'announcements': 0, 'batches': 0, 'created': 0, 'updated': 0, 'offline': 0, 'errors': 0}
+
+    def load(self):
+        """Cintres déjà enregistrés : leur id est réutilisé et leur présence reprise"""
+        response = self.session.get(f'{self.api_url}/hangers', timeout=30)
+        response.raise_for_status()
+        now = time.time()
+        with self._lock:
+            for hanger in response.json():
+                if not hanger.get('mqtt_topic'):
+                    continue
+                last_seen = hanger.get('last_seen')
+                self.hangers[hanger['mqtt_topic']] = {
+                    'id': hanger['id'],
+                    'status': hanger.get('status'),
+                    'last_seen': from_iso(last_seen) if last_seen else now,
+                }
+        logger.info("%d cintres connus", len(self.hangers))
+
+    def on_message(self, client, userdata, message):
+        # Les trames LED retenues et les commandes du pont passent aussi sur ces topics
+        if message.retain or message.payload not in ANNOUNCEMENTS:
+            return
+        with self._lock:
+            self._seen[message.topic] = time.time()
+            self.stats['announcements'] += 1
+
+    def on_connect(self, client, userdata, flags, reason_code, *args):
+        logger.info("Connecté au broker, abonnement à %s", REGISTRAR_TOPIC)
+        client.subscribe(REGISTRAR_TOPIC, qos=1)
+        self.connected_since = time.time()
+
+    def on_disconnect(self, client, userdata, *args):
+        logger.warning("Déconnecté du broker, reconnexion automatique")
+        self.connected_since = None
+
+    def pending_records(self, now=None):
+        """Enregistrements du prochain lot : cintres annoncés et cintres devenus silencieux"""
+        now = time.time() if now is None else now
+        with self._lock:
+            seen, self._seen = self._seen, {}
+            records = []
+            for topic, seen_at in seen.items():
+                known = self.hangers.get(topic)
+                records.append({
+                    'id': known['id'] if known else hanger_id_for(topic),
+                    'mqtt_topic': topic,
+                    'last_seen': to_iso(seen_at),
+                    'status': 'online',
+                })
+            listening = self.connected_since is not None and now - self.connected_since > self.offline_after
+            for topic, hanger in self.hangers.items():
+                if (listening and hanger['status'] == 'online' and topic not in seen
+                        and now - hanger['last_seen'] > self.offline_after):
+                    records.append({'id': hanger['id'], 'mqtt_topic': topic, 'status': 'offline'})
+        return seen, records
+
+    def flush(self, now=None):
+        """Envoie les annonces regroupées ; renvoie le nombre de cintres écrits"""
+        seen, records = self.pending_records(now)
+        written = 0
+        counts = {'created': 0, 'updated': 0, 'offline': 0}
+        for start in range(0, len(records), self.batch_max):
+            chunk = records[start:start + self.batch_max]
+            try:
+                response = self.session.post(f'{self.api_url}/hangers:batch', params={'upsert': 1}, json=chunk, timeout=30)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                logger.warning("Lot de %d cintres non envoyé (%s), nouvel essai au prochain cycle", len(chunk), e)
+                self._retry([record for record in records[start:] if 'last_seen' in record], seen)
+                return written
+            self.stats['batches'] += 1
+            with self._lock:
+                for result in response.json()['results']:
+                    record = chunk[result['index']]
+                    if result['status'] == 'error':
+                        self.stats['errors'] += 1
+                        logger.error("Cintre %s refusé : %s", record['mqtt_topic'], result['error'])
+                        continue
+                    written += 1
+                    hanger = self.hangers.setdefault(record['mqtt_topic'], {'id': record['id']})
+                    hanger['status'] = record['status']
+                    if record['status'] == 'offline':
+                        counts['offline'] += 1
+                    else:
+                        hanger['last_seen'] = seen[record['mqtt_topic']]
+                        counts[result['status']] += 1
+        for name, count in counts.items():
+            self.stats[name] += count
+        if counts['created'] or counts['offline']:
+            logger.info("%d nouveaux cintres, %d en ligne, %d hors ligne", counts['created'], counts['updated'], counts['offline'])
+        return written
+
+    def _retry(self, records, seen):
+        # Les annonces non envoyées repartent dans le prochain lot, sauf si une plus récente est arrivée
+        with self._lock:
+            for record in records:
+                self._seen.setdefault(record['mqtt_topic'], seen[record['mqtt_topic']])
+
+    def run(self, broker=MQTT_BROKER, port=MQTT_PORT):
+        backoff = 1
+        while True:
+            try:
+                self.load()
+                break
+            except requests.RequestException as e:
+                logger.warning("API injoignable (%s), nouvel essai dans %d s", e, backoff)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+        client = make_client()
+        client.on_connect = self.on_connect
+        client.on_message = self.on_message
+        client.on_disconnect = self.on_disconnect
+        client.reconnect_delay_set(1, 30)
+        client.connect_async(broker, port, keepalive=60)
+        client.loop_start()
+        try:
+            while True:
+                time.sleep(self.flush_interval)
+                self.flush()
+        finally:
+            client.disconnect()
+            client.loop_stop()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    registrar = Registrar()
+    try:
+        registrar.run()
+    except KeyboardInterrupt:
+        pass
+    logger.info("Arrêt : %s", registrar.stats)
+
+
+if __name__ == '__main__':
+    main()
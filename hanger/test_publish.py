@@ -1,9 +1,15 @@
+import os
+
 import paho.mqtt.client as mqtt
 import time
 
+from ledframe import encode, parse_text
+
 MQTT_BROKER = "10.42.0.1"
 MQTT_TOPIC = "hanger_a085e3e834c8/leds"
 FILENAME = "test_publish.txt"
+# 'text' pour un cintre au firmware d'avant les trames binaires
+BINARY = os.environ.get('LED_FORMAT', 'binary') == 'binary'
 
 client = mqtt.Client()
 client.connect(MQTT_BROKER, 1883, 60)
@@ -12,8 +18,9 @@ with open(FILENAME, "r") as f:
     for line in f:
         line = line.strip()
         if line:
-            print(f"Publishing: {line}")
-            client.publish(MQTT_TOPIC, line)
+            payload = encode(parse_text(line)) if BINARY else line
+            print(f"Publishing: {line} ({len(payload)} octets)")
+            client.publish(MQTT_TOPIC, payload)
             time.sleep(3)  # attendre 1 seconde entre chaque envoi
 
-client.disconnect()
\ No newline at end of file
+client.disconnect()
@@ -1,57 +1,38 @@
-import boto3
-import json
-
-def delete_all_mock_data():
-    # Initialize AWS clients with profile
-    session = boto3.Session(profile_name='soper')
-    dynamodb = session.resource('dynamodb')
-    s3 = session.client('s3')
-
-    project_name = 'le-projet-de-laurianne-'
-
-    # Find S3 bucket
-    bucket_name = None
-    for bucket in s3.list_buckets()['Buckets']:
-        if project_name in bucket['Name'].lower():
-            bucket_name = bucket['Name']
-            break
-    
+import argparse
+import time
+
+from seeding import PROFILE, PROJECT_NAME, REGION, WORKERS, WRITERS, Seeder, report
+
+
+def delete_all_mock_data(seeder):
+    """Empty the images bucket and the items table (all pages of both)"""
+    bucket_name = seeder.bucket_name()
     if not bucket_name:
         print("No clothing bucket found")
         return
-    
+
     print(f"Found bucket: {bucket_name}")
-    
-    # Delete all objects from S3
-    objects = s3.list_objects_v2(Bucket=bucket_name)
-    if 'Contents' in objects:
-        for obj in objects['Contents']:
-            s3.delete_object(Bucket=bucket_name, Key=obj['Key'])
-            print(f"Deleted S3 object: {obj['Key']}")
-
-    # Find DynamoDB table
-    table_name = None
-    for table in dynamodb.tables.all():
-        if project_name in table.name.lower():
-            table_name = table.name
-            break
-    
+    start = time.perf_counter()
+    report("Deleted S3 objects", seeder.delete_objects(bucket_name), start)
+
+    table_name = seeder.table_name()
     if not table_name:
         print("No clothing table found")
         return
-    
-    table = dynamodb.Table(table_name)
+
     print(f"Found table: {table_name}")
-    
-    # Delete all items from DynamoDB
-    response = table.scan()
-    items = response['Items']
-    
-    for item in items:
-        table.delete_item(Key={'id': item['id']})
-        print(f"Deleted item: {item['name']}")
-    
+    start = time.perf_counter()
+    report("Deleted items", seeder.delete_items(table_name), start)
+
     print("All mock data deleted successfully!")
 
+
 if __name__ == "__main__":
-    delete_all_mock_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Delete every S3 photo and DynamoDB item of the project")
+    parser.add_argument('--profile', default=PROFILE)
+    parser.add_argument('--region', default=REGION)
+    parser.add_argument('--project', default=PROJECT_NAME)
+    parser.add_argument('--workers', type=int, default=WORKERS, help="S3 delete threads")
+    parser.add_argument('--writers', type=int, default=WRITERS, help="DynamoDB scan segments / writer threads")
+    args = parser.parse_args()
+    delete_all_mock_data(Seeder(args.profile, args.region, args.project, args.workers, args.writers))
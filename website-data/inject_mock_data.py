@@ -1,102 +1,77 @@
 #!/usr/bin/env python3
-import boto3
-import uuid
-import requests
-import random
+import argparse
 import os
+import time
+import uuid
 
-# Configuration
-PROJECT_NAME = "le-projet-de-laurianne"
-REGION = "eu-west-1"
-PROFILE = "soper"
+from seeding import (
+    IMG_DIR, MOCK_ITEMS, PROFILE, PROJECT_NAME, REGION, SHARED_PHOTOS_PREFIX, WORKERS, WRITERS,
+    Seeder, report, synthetic_items,
+)
 
-# Mock data
-CATEGORIES = ["Jupes", "Shorts", "Jeans", "Blouses", "Chemises"]
 
-MOCK_ITEMS = [
-    {"name": "Jean vert délavé", "category": "Jeans", "color": "Vert", "size": "38", "image_url": "jean1.jpg"},
-    {"name": "Jean bleu classique", "category": "Jeans", "color": "Bleu", "size": "40", "image_url": "jean2.jpg"},
-    {"name": "Jean noir slim", "category": "Jeans", "color": "Noir", "size": "36", "image_url": "jean3.jpg"},
-    {"name": "Jean brut indigo", "category": "Jeans", "color": "Indigo", "size": "42", "image_url": "jean4.jpg"},
-    {"name": "Jupe plissée marine", "category": "Jupes", "color": "Marine", "size": "S", "image_url": "jupe1.jpg"},
-    {"name": "Jupe évasée rouge", "category": "Jupes", "color": "Rouge", "size": "M", "image_url": "jupe2.jpg"},
-    {"name": "Jupe crayon beige", "category": "Jupes", "color": "Beige", "size": "L", "image_url": "jupe3.jpg"},
-    {"name": "Jupe longue fleurie", "category": "Jupes", "color": "Multicolore", "size": "M", "image_url": "jupe4.jpg"},
-    {"name": "Short denim clair", "category": "Shorts", "color": "Bleu clair", "size": "34", "image_url": "short1.jpg"},
-    {"name": "Short cargo kaki", "category": "Shorts", "color": "Kaki", "size": "36", "image_url": "short2.jpg"},
-    {"name": "Short blanc estival", "category": "Shorts", "color": "Blanc", "size": "38", "image_url": "short3.jpg"},
-    {"name": "Short noir élégant", "category": "Shorts", "color": "Noir", "size": "40", "image_url": "short4.jpg"}
-]
+def mock_item(item_data, item_id, photo_url):
+    return {
+        'id': item_id,
+        'name': item_data['name'],
+        'category': item_data['category'],
+        'color': item_data['color'],
+        'size': item_data['size'],
+        'photo': photo_url,
+        'mock': True
+    }
 
-def get_bucket_name():
-    """Get the S3 bucket name from Terraform state"""
-    try:
-        session = boto3.Session(profile_name=PROFILE)
-        s3 = session.client('s3', region_name=REGION)
-        buckets = s3.list_buckets()['Buckets']
-        for bucket in buckets:
-            if PROJECT_NAME in bucket['Name'] and 'images' in bucket['Name']:
-                return bucket['Name']
-    except Exception as e:
-        print(f"Error finding bucket: {e}")
-    return None
 
-def upload_image_to_s3(image_path, bucket_name, key):
-    """Read local image and upload to S3"""
-    try:
-        with open(image_path, 'rb') as f:
-            image_data = f.read()
-        session = boto3.Session(profile_name=PROFILE)
-        s3 = session.client('s3', region_name=REGION)
-        s3.put_object(
-            Bucket=bucket_name,
-            Key=key,
-            Body=image_data,
-            ContentType='image/jpeg'
-        )
-        return f"https://{bucket_name}.s3.amazonaws.com/{key}"
-    except Exception as e:
-        print(f"Error uploading image: {e}")
-        return None
+def inject_mock_data(seeder, count=0, seed=0):
+    """Inject mock data into DynamoDB and S3.
 
-def inject_mock_data():
-    """Inject mock data into DynamoDB and S3"""
-    session = boto3.Session(profile_name=PROFILE)
-    dynamodb = session.resource('dynamodb', region_name=REGION)
-    table_name = f"{PROJECT_NAME}-items"
-    table = dynamodb.Table(table_name)
-    
-    bucket_name = get_bucket_name()
-    if not bucket_name:
-        print("Could not find S3 bucket. Make sure Terraform has been applied.")
+    count=0: the curated MOCK_ITEMS, one photo copy per item (items/<id>.jpg, as the API does).
+    count>0: `count` synthetic items for load tests, sharing the sample photos uploaded once.
+    """
+    table_name = seeder.table_name()
+    bucket_name = seeder.bucket_name()
+    if not bucket_name or not table_name:
+        print("Could not find S3 bucket or DynamoDB table. Make sure Terraform has been applied.")
         return
-    
+
     print(f"Using table: {table_name}")
     print(f"Using bucket: {bucket_name}")
-    
-    for item_data in MOCK_ITEMS:
-        item_id = str(uuid.uuid4())
-        photo_key = f"items/{item_id}.jpg"
-        
-        # Upload image to S3
-        img_path = os.path.join(os.path.dirname(__file__), 'img', item_data['image_url'])
-        photo_url = upload_image_to_s3(img_path, bucket_name, photo_key)
-        
-        # Create DynamoDB item
-        item = {
-            'id': item_id,
-            'name': item_data['name'],
-            'category': item_data['category'],
-            'color': item_data['color'],
-            'size': item_data['size'],
-            'photo': photo_url,
-            'mock': True
-        }
-        
-        table.put_item(Item=item)
-        print(f"✓ Added: {item_data['name']}")
-    
-    print(f"\n🎉 Successfully injected {len(MOCK_ITEMS)} items!")
+
+    start = time.perf_counter()
+    if count:
+        images = sorted({item['image_url'] for item in MOCK_ITEMS})
+        urls = seeder.upload_photos(bucket_name, [
+            (os.path.join(IMG_DIR, image), f"{SHARED_PHOTOS_PREFIX}{image}") for image in images])
+        report("Uploaded shared photos", len(urls), start)
+        items = (
+            mock_item(item_data, item_data['id'], urls.get(f"{SHARED_PHOTOS_PREFIX}{item_data['image_url']}"))
+            for item_data in synthetic_items(count, seed)
+        )
+    else:
+        ids = [str(uuid.uuid4()) for _ in MOCK_ITEMS]
+        urls = seeder.upload_photos(bucket_name, [
+            (os.path.join(IMG_DIR, item_data['image_url']), f"items/{item_id}.jpg")
+            for item_data, item_id in zip(MOCK_ITEMS, ids)])
+        report("Uploaded photos", len(urls), start)
+        items = [mock_item(item_data, item_id, urls.get(f"items/{item_id}.jpg"))
+                 for item_data, item_id in zip(MOCK_ITEMS, ids)]
+
+    start = time.perf_counter()
+    written = seeder.put_items(table_name, items)
+    report("Added items", written, start)
+    print(f"\n🎉 Successfully injected {written} items!")
+
 
 if __name__ == "__main__":
-    inject_mock_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Inject mock items into DynamoDB and their photos into S3")
+    parser.add_argument('--count', type=int, default=0,
+                        help="Synthetic items to generate (e.g. 100000); default: the curated mock items")
+    parser.add_argument('--seed', type=int, default=0, help="Synthetic generator seed (same seed, same ids)")
+    parser.add_argument('--profile', default=PROFILE)
+    parser.add_argument('--region', default=REGION)
+    parser.add_argument('--project', default=PROJECT_NAME)
+    parser.add_argument('--workers', type=int, default=WORKERS, help="S3 upload threads")
+    parser.add_argument('--writers', type=int, default=WRITERS, help="DynamoDB batch writer threads")
+    args = parser.parse_args()
+    inject_mock_data(Seeder(args.profile, args.region, args.project, args.workers, args.writers),
+                     args.count, args.seed)
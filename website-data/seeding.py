@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""Seeding engine for the serverless stack: mock items in DynamoDB, their photos in S3.
+
+One boto3 session for the whole run. S3 uploads and deletions run on a thread pool through a
+single (thread-safe) client; DynamoDB writes go through batch_writer (25 items per
+BatchWriteItem), one Table resource per writer thread since resources are not thread-safe.
+Every listing (buckets, objects, scan) follows its pagination to the end.
+"""
+import os
+import queue
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import boto3
+from botocore.config import Config
+
+# Configuration
+PROJECT_NAME = "le-projet-de-laurianne"
+REGION = "eu-west-1"
+PROFILE = os.environ.get("AWS_PROFILE", "soper")
+
+IMG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'img')
+# Photos shared by synthetic items (uploaded once, not once per item)
+SHARED_PHOTOS_PREFIX = "mock/"
+
+WORKERS = 16
+WRITERS = 4
+# Items handed to a writer thread at a time
+CHUNK_SIZE = 1000
+# S3 DeleteObjects limit
+DELETE_BATCH = 1000
+
+MOCK_ITEMS = [
+    {"name": "Jean vert délavé", "category": "Jeans", "color": "Vert", "size": "38", "image_url": "jean1.jpg"},
+    {"name": "Jean bleu classique", "category": "Jeans", "color": "Bleu", "size": "40", "image_url": "jean2.jpg"},
+    {"name": "Jean noir slim", "category": "Jeans", "color": "Noir", "size": "36", "image_url": "jean3.jpg"},
+    {"name": "Jean brut indigo", "category": "Jeans", "color": "Indigo", "size": "42", "image_url": "jean4.jpg"},
+    {"name": "Jupe plissée marine", "category": "Jupes", "color": "Marine", "size": "S", "image_url": "jupe1.jpg"},
+    {"name": "Jupe évasée rouge", "category": "Jupes", "color": "Rouge", "size": "M", "image_url": "jupe2.jpg"},
+    {"name": "Jupe crayon beige", "category": "Jupes", "color": "Beige", "size": "L", "image_url": "jupe3.jpg"},
+    {"name": "Jupe longue fleurie", "category": "Jupes", "color": "Multicolore", "size": "M", "image_url": "jupe4.jpg"},
+    {"name": "Short denim clair", "category": "Shorts", "color": "Bleu clair", "size": "34", "image_url": "short1.jpg"},
+    {"name": "Short cargo kaki", "category": "Shorts", "color": "Kaki", "size": "36", "image_url": "short2.jpg"},
+    {"name": "Short blanc estival", "category": "Shorts", "color": "Blanc", "size": "38", "image_url": "short3.jpg"},
+    {"name": "Short noir élégant", "category": "Shorts", "color": "Noir", "size": "40", "image_url": "short4.jpg"}
+]
+
+# Vocabulary of the synthetic generator
+SYNTHETIC = {
+    "Jeans": (["Jean"], ["slim", "droit", "large", "délavé", "brut", "taille haute"], ["34", "36", "38", "40", "42"]),
+    "Jupes": (["Jupe"], ["plissée", "évasée", "crayon", "longue", "portefeuille"], ["XS", "S", "M", "L", "XL"]),
+    "Shorts": (["Short"], ["denim", "cargo", "estival", "élégant", "en lin"], ["34", "36", "38", "40"]),
+}
+COLORS = ["Bleu", "Noir", "Blanc", "Rouge", "Vert", "Beige", "Kaki", "Marine", "Indigo", "Multicolore"]
+
+
+def chunks(iterable, size):
+    chunk = []
+    for value in iterable:
+        chunk.append(value)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_chunks(function, chunks_iter, workers):
+    """Sum of `function(chunk)` over the chunks, on `workers` threads, with at most 2 chunks waiting per
+    thread: a lazy source (generator, paginated listing) is never loaded whole in memory"""
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for chunk in chunks_iter:
+            pending.add(executor.submit(function, chunk))
+            if len(pending) >= workers * 2:
+                finished = next(as_completed(pending))
+                pending.remove(finished)
+                done += finished.result()
+        for future in pending:
+            done += future.result()
+    return done
+
+
+def synthetic_items(count, seed=0):
+    """Generate `count` plausible items lazily; the same seed gives the same ids (re-seeding overwrites)"""
+    rng = random.Random(seed)
+    photos = {}
+    for item in MOCK_ITEMS:
+        photos.setdefault(item['category'], []).append(item['image_url'])
+    for i in range(count):
+        category = rng.choice(list(SYNTHETIC))
+        nouns, styles, sizes = SYNTHETIC[category]
+        color = rng.choice(COLORS)
+        yield {
+            'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'name': f"{rng.choice(nouns)} {rng.choice(styles)} {color.lower()} #{i}",
+            'category': category,
+            'color': color,
+            'size': rng.choice(sizes),
+            'image_url': rng.choice(photos[category]),
+        }
+
+
+class Seeder:
+    """Shared session and clients for one seeding or teardown run"""
+
+    def __init__(self, profile=PROFILE, region=REGION, project=PROJECT_NAME, workers=WORKERS, writers=WRITERS):
+        self.session = boto3.Session(profile_name=profile or None, region_name=region)
+        self.project = project
+        self.workers = workers
+        self.writers = writers
+        # One connection per upload thread, instead of the default pool of 10
+        self.s3 = self.session.client('s3', config=Config(max_pool_connections=workers,
+                                                          retries={'mode': 'standard'}))
+        self.dynamodb = self.session.resource('dynamodb')
+
+    # --- Discovery
+
+    def bucket_name(self):
+        """The project's images bucket (its name ends with a random suffix from Terraform)"""
+        # ListBuckets is only paginated by recent botocore versions
+        if self.s3.can_paginate('list_buckets'):
+            pages = self.s3.get_paginator('list_buckets').paginate()
+        else:
+            pages = [self.s3.list_buckets()]
+        for page in pages:
+            for bucket in page['Buckets']:
+                if self.project in bucket['Name'] and 'images' in bucket['Name']:
+                    return bucket['Name']
+        return None
+
+    def table_name(self):
+        name = f"{self.project}-items"
+        # tables.all() follows ListTables pagination
+        return name if any(table.name == name for table in self.dynamodb.tables.all()) else None
+
+    # --- S3
+
+    def upload_photos(self, bucket, uploads):
+        """Upload (local path, key) pairs on the thread pool; returns {key: public url} of the successful ones"""
+        def upload(path, key):
+            with open(path, 'rb') as f:
+                self.s3.put_object(Bucket=bucket, Key=key, Body=f, ContentType='image/jpeg')
+            return key
+
+        urls = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(upload, path, key): key for path, key in uploads}
+            for future in as_completed(futures):
+                try:
+                    key = future.result()
+                except Exception as e:
+                    print(f"Error uploading {futures[future]}: {e}")
+                    continue
+                urls[key] = f"https://{bucket}.s3.amazonaws.com/{key}"
+        return urls
+
+    def delete_objects(self, bucket, prefix=''):
+        """Delete every object under `prefix`, 1000 keys per DeleteObjects call; returns the count deleted"""
+        def delete(keys):
+            response = self.s3.delete_objects(Bucket=bucket, Delete={
+                'Objects': [{'Key': key} for key in keys], 'Quiet': True})
+            for failure in response.get('Errors', []):
+                print(f"Error deleting {failure['Key']}: {failure['Message']}")
+            return len(keys) - len(response.get('Errors', []))
+
+        # Deletions start while the listing is still paginating
+        pages = self.s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix)
+        keys = (obj['Key'] for page in pages for obj in page.get('Contents', []))
+        return run_chunks(delete, chunks(keys, DELETE_BATCH), self.workers)
+
+    # --- DynamoDB
+
+    def _tables(self, table_name):
+        # Created here, on the calling thread, then lent to one writer thread at a time
+        tables = queue.Queue()
+        for _ in range(self.writers):
+            tables.put(self.session.resource('dynamodb').Table(table_name))
+        return tables
+
+    def put_items(self, table_name, items):
+        """Write items (any iterable, consumed lazily) with batch_writer on `writers` threads"""
+        tables = self._tables(table_name)
+
+        def write(chunk):
+            table = tables.get()
+            try:
+                # overwrite_by_pkeys: a duplicated id in a batch would otherwise be rejected
+                with table.batch_writer(overwrite_by_pkeys=['id']) as writer:
+                    for item in chunk:
+                        writer.put_item(Item=item)
+            finally:
+                tables.put(table)
+            return len(chunk)
+
+        return run_chunks(write, chunks(items, CHUNK_SIZE), self.writers)
+
+    def delete_items(self, table_name):
+        """Delete every item of the table, reading it in parallel scan segments (one per writer)"""
+        tables = self._tables(table_name)
+        options = {'ProjectionExpression': '#id', 'ExpressionAttributeNames': {'#id': 'id'}}
+        client = self.dynamodb.meta.client
+
+        def delete_segment(segment):
+            table = tables.get()
+            deleted = 0
+            try:
+                pages = client.get_paginator('scan').paginate(
+                    TableName=table_name, Segment=segment, TotalSegments=self.writers, **options)
+                with table.batch_writer(overwrite_by_pkeys=['id']) as writer:
+                    for page in pages:
+                        for item in page['Items']:
+                            writer.delete_item(Key={'id': item['id']})
+                            deleted += 1
+            finally:
+                tables.put(table)
+            return deleted
+
+        with ThreadPoolExecutor(max_workers=self.writers) as executor:
+            return sum(executor.map(delete_segment, range(self.writers)))
+
+
+def report(label, count, start):
+    elapsed = time.perf_counter() - start
+    print(f"✓ {label}: {count} in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.0f}/s)")
@@ -11,6 +11,7 @@ API_CONFIG.ordersUrl = `http://${host}:5080/orders`;
 API_CONFIG.planifierUrl = `http://${host}:5080/outfits`;
 API_CONFIG.tagUrl = `http://${host}:5080/tag`;
 API_CONFIG.photoUrl = `http://${host}:5080/`;
+API_CONFIG.eventsUrl = `http://${host}:5080/events`;
 
 // State Management
 let clothingItems = [];
@@ -18,11 +19,14 @@ let cart = [];
 let activeFilters = {
     categories: [],
     colors: [],
-    search: ''
+    search: '',
+    searchIds: null
 };
+let searchTimer = null;
 let editMode = false;
 let deleteMode = false;
 let editingItemId = null;
+let eventSource = null;
 
 // Home Assistant Token Management
 function getHomeAssistantToken() {
@@ -66,6 +70,78 @@ async function init() {
     displayItems();
     updateCartDisplay();
     hideLoading();
+    subscribeToEvents();
+}
+
+/* =========================================================
+ * EVENTS (Server-Sent Events)
+ * =========================================================
+ */
+
+// Le flux /events pousse les changements : plus besoin de recharger /items après chaque action
+function subscribeToEvents() {
+    if (!window.EventSource) return;
+
+    eventSource = new EventSource(API_CONFIG.eventsUrl);
+    // EventSource se reconnecte seul et renvoie Last-Event-ID pour reprendre là où il s'était arrêté
+
+    eventSource.addEventListener('item_created', (e) => {
+        const { item } = JSON.parse(e.data).data;
+        if (!clothingItems.some(i => i.id === item.id)) {
+            clothingItems.push(item);
+        }
+        refreshItemViews();
+    });
+
+    eventSource.addEventListener('item_updated', (e) => {
+        const { item } = JSON.parse(e.data).data;
+        patchItem(item.id, item);
+    });
+
+    eventSource.addEventListener('item_deleted', (e) => {
+        const { item_id } = JSON.parse(e.data).data;
+        clothingItems = clothingItems.filter(i => i.id !== item_id);
+        cart = cart.filter(i => i.id !== item_id);
+        updateCartDisplay();
+        updateCartBadge();
+        refreshItemViews();
+    });
+
+    eventSource.addEventListener('association_complete', (e) => {
+        const { item_id, tag_id, hanger_id } = JSON.parse(e.data).data;
+        const changes = {};
+        if (tag_id !== undefined) changes.tag_id = tag_id;
+        if (hanger_id !== undefined) changes.hanger_id = hanger_id;
+        patchItem(item_id, changes);
+    });
+
+    // Reprise impossible (redémarrage de l'API, historique dépassé) : on recharge tout
+    eventSource.addEventListener('reset', async () => {
+        await loadItems();
+        refreshItemViews();
+    });
+}
+
+function isLive() {
+    return eventSource !== null && eventSource.readyState === EventSource.OPEN;
+}
+
+function patchItem(itemId, changes) {
+    const index = clothingItems.findIndex(i => i.id === itemId);
+    if (index === -1) return;
+    clothingItems[index] = { ...clothingItems[index], ...changes };
+
+    const cartIndex = cart.findIndex(i => i.id === itemId);
+    if (cartIndex > -1) {
+        cart[cartIndex] = { ...cart[cartIndex], ...changes };
+        updateCartDisplay();
+    }
+    refreshItemViews();
+}
+
+function refreshItemViews() {
+    buildFilterOptions();
+    displayItems();
 }
 
 /* =========================================================
@@ -132,6 +208,28 @@ function toggleMenu() {
 function handleSearch() {
     const searchTerm = document.getElementById('search-input').value.toLowerCase();
     activeFilters.search = searchTerm;
+    activeFilters.searchIds = null;
+    clearTimeout(searchTimer);
+    if (!searchTerm) {
+        displayItems();
+        return;
+    }
+    // La recherche plein texte (sans accents, par préfixe) est faite par l'API
+    searchTimer = setTimeout(() => searchItems(searchTerm), 150);
+}
+
+async function searchItems(searchTerm) {
+    try {
+        const response = await fetch(`${API_CONFIG.baseUrl}/search?q=${encodeURIComponent(searchTerm)}&fields=id&limit=1000`);
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        const results = await response.json();
+        // Ignore une réponse arrivée après une nouvelle saisie
+        if (searchTerm !== activeFilters.search) return;
+        activeFilters.searchIds = results.map(result => result.id);
+    } catch (error) {
+        // Repli sur le filtrage local
+        activeFilters.searchIds = null;
+    }
     displayItems();
 }
 
@@ -206,7 +304,7 @@ function applyFilters() {
 }
 
 function resetFilters() {
-    activeFilters = { categories: [], colors: [], search: '' };
+    activeFilters = { categories: [], colors: [], search: '', searchIds: null };
     document.getElementById('search-input').value = '';
     buildFilterOptions();
     displayItems();
@@ -232,6 +330,11 @@ function getColorHex(colorName) {
     return colorMap[colorName] || '#DDD';
 }
 
+// URL de la déclinaison demandée (thumb, medium, full), ou de l'original tant qu'elle n'est pas prête
+function photoSrc(item, size = 'thumb') {
+    return `${API_CONFIG.photoUrl}${item[`photo_${size}`] || item.photo}`;
+}
+
 function getEmojiForCategory(category) {
     const emojiMap = {
         'Jupes': '👗',
@@ -251,7 +354,11 @@ function displayItems() {
         let filteredItems = clothingItems;
         
         // Apply search filter
-        if (activeFilters.search) {
+        if (activeFilters.search && activeFilters.searchIds) {
+            // Résultats de l'API, dans l'ordre de pertinence
+            const byId = new Map(filteredItems.map(item => [item.id, item]));
+            filteredItems = activeFilters.searchIds.map(id => byId.get(id)).filter(Boolean);
+        } else if (activeFilters.search) {
             filteredItems = filteredItems.filter(item => 
                 item.name.toLowerCase().includes(activeFilters.search) ||
                 item.category.toLowerCase().includes(activeFilters.search) ||
@@ -287,7 +394,7 @@ function displayItems() {
         grid.innerHTML = filteredItems.map(item => {
             const inCart = isInCart(item.id);
             const imageContent = item.photo 
-                ? `<img src="${API_CONFIG.photoUrl}${item.photo}" alt="${item.name}">`
+                ? `<img src="${photoSrc(item, 'medium')}" alt="${item.name}" loading="lazy">`
                 : `<div class="item-placeholder">${item.category.charAt(0)}</div>`;
             
             const cardClass = editMode ? 'item-card edit-mode' : deleteMode ? 'item-card delete-mode' : 'item-card';
@@ -386,7 +493,7 @@ function updateCartDisplay() {
         
         cartItems.innerHTML = cart.map(item => {
             const imageContent = item.photo 
-                ? `<img src="${API_CONFIG.photoUrl}${item.photo}" alt="${item.name}" style="width: 100%; height: 100%; object-fit: cover; border-radius: 16px;">`
+                ? `<img src="${photoSrc(item)}" alt="${item.name}" style="width: 100%; height: 100%; object-fit: cover; border-radius: 16px;">`
                 : `<div class="item-placeholder">${item.category.charAt(0)}</div>`;
             
             return `
@@ -511,7 +618,7 @@ function editItem(itemId) {
         
         const preview = document.getElementById('edit-photo-preview');
         if (item.photo) {
-            preview.innerHTML = `<img src="${API_CONFIG.photoUrl}${item.photo}" alt="Preview" style="max-width: 100px; border-radius: 8px;">`;
+            preview.innerHTML = `<img src="${photoSrc(item)}" alt="Preview" style="max-width: 100px; border-radius: 8px;">`;
         } else {
             preview.innerHTML = '';
         }
@@ -537,6 +644,8 @@ async function tagMode() {
         
         if (response.ok) {
             closeEditItemModal();
+        } else if (response.status === 408) {
+            showToast('Aucun tag lu, réessayez');
         } else {
             showToast('Erreur lors du tagging');
         }
@@ -560,7 +669,7 @@ async function deleteItem(itemId) {
             
             if (response.ok) {
                 showToast(`${item.name} supprimé`);
-                await loadItems();
+                if (!isLive()) await loadItems();
                 buildFilterOptions();
                 
                 // Remove from cart if present
@@ -594,7 +703,7 @@ async function addNewItem(event) {
         category: category,
         emoji: getEmojiForCategory(category),
         color: color,
-        photo: photoFile ? await fileToBase64(photoFile) : null
+        photo: null
     };
     
     try {
@@ -604,8 +713,13 @@ async function addNewItem(event) {
             body: JSON.stringify(newItem)
         });
         
+        if (response.ok && photoFile) {
+            const created = await response.json();
+            await uploadPhoto(created.id, photoFile);
+        }
+
         if (response.ok) {
-            await loadItems();
+            if (!isLive()) await loadItems();
             buildFilterOptions();
             closeAddItemModal();
             displayItems();
@@ -628,12 +742,14 @@ async function updateItem(event) {
     const color = document.getElementById('edit-item-color').value;
     const photoFile = document.getElementById('edit-item-photo').files[0];
     
+    const currentItem = clothingItems.find(i => i.id === editingItemId);
     const updatedItem = {
         name: name,
         category: category,
         emoji: getEmojiForCategory(category),
         color: color,
-        photo: photoFile ? await fileToBase64(photoFile) : null
+        // La nouvelle photo éventuelle est envoyée à part, en binaire
+        photo: currentItem ? currentItem.photo : null
     };
     
     try {
@@ -643,8 +759,12 @@ async function updateItem(event) {
             body: JSON.stringify(updatedItem)
         });
         
+        if (response.ok && photoFile) {
+            await uploadPhoto(editingItemId, photoFile);
+        }
+
         if (response.ok) {
-            await loadItems();
+            if (!isLive()) await loadItems();
             buildFilterOptions();
             
             // Update cart item if present
@@ -666,6 +786,20 @@ async function updateItem(event) {
     }
 }
 
+// Envoi multipart de la photo : pas d'encodage base64, les déclinaisons WebP sont générées par l'API
+async function uploadPhoto(itemId, file) {
+    const formData = new FormData();
+    formData.append('photo', file);
+    const response = await fetch(`${API_CONFIG.baseUrl}/${itemId}/photo`, {
+        method: 'POST',
+        body: formData
+    });
+    if (!response.ok) {
+        showToast('Erreur lors de l\'envoi de la photo');
+    }
+    return response;
+}
+
 function fileToBase64(file) {
     return new Promise((resolve) => {
         const reader = new FileReader();
@@ -768,7 +902,7 @@ function displayOrderHistory(orders) {
             
             const itemsHtml = order.items.map(item => {
                 const imageContent = item.photo 
-                    ? `<img src="${API_CONFIG.photoUrl}${item.photo}" alt="${item.name}" style="width: 100%; height: 100%; object-fit: cover; border-radius: 4px;">`
+                    ? `<img src="${photoSrc(item)}" alt="${item.name}" style="width: 100%; height: 100%; object-fit: cover; border-radius: 4px;">`
                     : `<div class="item-placeholder">${item.category.charAt(0)}</div>`;
                 
                 return `
@@ -967,17 +1101,21 @@ let editingPlanifierId = null;
 async function getPlanifierEvents() {
     
     try {
-        const response = await fetch(API_CONFIG.planifierUrl);
+        // Les articles sont résolus par l'API : pas besoin du catalogue complet pour afficher les tenues
+        const response = await fetch(`${API_CONFIG.planifierUrl}?expand=items&item_fields=id,name,category,photo,photo_thumb`);
         if (response.ok) {
             planifierEvents = [];
             const outfits = await response.json();
             outfits.forEach(outfit => {
+                const details = outfit.items || [];
                 planifierEvents.push({
                     id: outfit.id,
                     nom: outfit.name,
                     desc: outfit.description || '',
                     date: outfit.date || '',
-                    items: outfit.items || [],
+                    items: details.map(item => item.id).concat(outfit.missing_items || []),
+                    itemDetails: details,
+                    missingItems: outfit.missing_items || [],
                 });
             });
         }
@@ -1078,11 +1216,12 @@ function renderPlanifier() {
                 if(tenue.items.length===0){
                     html += `<div style='color:#6c757d;'>Aucun vêtement sélectionné</div>`;
                 }else{
-                    html += tenue.items.map(itemId=>{
-                        const item = clothingItems.find(i=>i.id===itemId);
-                        if(!item) return '';
-                        return `<div class='planifier-item'>${item.name} <button onclick='removeItemFromEvent(${tenue.id},"${itemId}");event.stopPropagation();' style='margin-left:8px;'>×</button></div>`;
+                    html += (tenue.itemDetails || []).map(item=>{
+                        return `<div class='planifier-item'>${item.name} <button onclick='removeItemFromEvent(${tenue.id},"${item.id}");event.stopPropagation();' style='margin-left:8px;'>×</button></div>`;
                     }).join('');
+                    if((tenue.missingItems || []).length){
+                        html += `<div style='color:#6c757d;'>${tenue.missingItems.length} vêtement(s) supprimé(s) du catalogue</div>`;
+                    }
                 }
                 html += `<button class='btn-primary' style='margin-top:10px;' onclick='event.stopPropagation();showCatalogueForEvent(${tenue.id})'>Ajouter/modifier les vêtements</button></div>`;
             }
@@ -1129,7 +1268,7 @@ function openPlanifierForm(id=null){
                 html += `
                     <label style='display:flex;flex-direction:column;align-items:center;width:90px;cursor:pointer;'>
                         <input type='checkbox' name='planifier-items' value='${item.id}' ${selectedItems.includes(item.id)?'checked':''} style='margin-bottom:4px;'>
-                        ${item.photo ? `<img src='${API_CONFIG.photoUrl}${item.photo}' alt='${item.name}' style='width:70px;height:70px;object-fit:cover;border-radius:8px;margin-bottom:4px;'>` : `<div style='width:70px;height:70px;background:#eee;border-radius:8px;margin-bottom:4px;display:flex;align-items:center;justify-content:center;'>${item.category.charAt(0)}</div>`}
+                        ${item.photo ? `<img src='${photoSrc(item)}' alt='${item.name}' loading='lazy' style='width:70px;height:70px;object-fit:cover;border-radius:8px;margin-bottom:4px;'>` : `<div style='width:70px;height:70px;background:#eee;border-radius:8px;margin-bottom:4px;display:flex;align-items:center;justify-content:center;'>${item.category.charAt(0)}</div>`}
                         <span style='font-size:13px;text-align:center;'>${item.name}</span>
                     </label>
                 `;